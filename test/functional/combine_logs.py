@@ -4,13 +4,22 @@
 This streams the combined log output to stdout. Use combine_logs.py > outputfile
 to write to an outputfile.
 
+The log files are indexed in parallel, so large logs can be filtered by time
+window, node, category and regular expression and output in pages, e.g.
+combine_logs.py --node 0 --since +30 --grep "ERROR" --page-size 500 --json
+
 If no argument is provided, the most recent test directory will be used."""
 
 import argparse
+from array import array
+import calendar
 from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import glob
 import heapq
 import itertools
+import json
+import mmap
 import os
 import pathlib
 import re
@@ -25,12 +34,21 @@ TMPDIR_PREFIX = "defi_func_test_"
 
 # Matches on the date format at the start of the log event
 TIMESTAMP_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d{6})?Z")
+# The same without the anchor, for matching at offsets of memory-mapped files
+TIMESTAMP_PATTERN_BYTES = re.compile(rb"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d{6})?Z")
+# The category of an event follows its timestamp: the thread name of node
+# events ("[msghand] ...") and the logger name of test framework events
+# ("TestFramework.node0 (DEBUG): ...")
+CATEGORY_PATTERN = re.compile(rb" (?:\[([^\]\s]+)\]|([\w.]+) \(\w+\):)")
+
+# Prefix of continuation lines, aligning them with the first line of the event
+CONTINUATION_PREFIX = " " * 35
 
-LogEvent = namedtuple("LogEvent", ["timestamp", "source", "event"])
+LogEvent = namedtuple("LogEvent", ["timestamp", "source", "event", "category"])
 
 
 def main():
-    """Main function. Parses args, reads the log files and renders them as text or html."""
+    """Main function. Parses args, reads the log files and renders them as text, html or json."""
     parser = argparse.ArgumentParser(
         description=__doc__, formatter_class=argparse.RawTextHelpFormatter
     )
@@ -56,10 +74,56 @@ def main():
         action="store_true",
         help="outputs the combined log as html. Requires jinja2. pip install jinja2",
     )
+    parser.add_argument(
+        "--json",
+        dest="json",
+        action="store_true",
+        help="outputs the combined log as a json object with a list of events",
+    )
+    parser.add_argument(
+        "--since",
+        help="only events at or after this time: a UTC timestamp such as 2023-06-01T12:00:05 or +SECONDS from the first event",
+    )
+    parser.add_argument(
+        "--until",
+        help="only events at or before this time, in the same formats as --since",
+    )
+    parser.add_argument(
+        "--node",
+        help="only events of these comma-separated sources: node indexes or 'test'",
+    )
+    parser.add_argument(
+        "--category",
+        help="only events of these comma-separated categories: node thread names (e.g. msghand) or test logger names",
+    )
+    parser.add_argument(
+        "--grep",
+        help="only events matching this regular expression",
+    )
+    parser.add_argument(
+        "--page-size",
+        dest="page_size",
+        type=int,
+        default=0,
+        help="number of events per page, all events if 0 (default)",
+    )
+    parser.add_argument(
+        "--page",
+        type=int,
+        default=1,
+        help="page of events to output, starting at 1 (default)",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count(),
+        help="number of log files to index in parallel (default: %(default)s)",
+    )
     args = parser.parse_args()
 
-    if args.html and args.color:
-        print("Only one out of --color or --html should be specified")
+    if sum([args.html, args.color, args.json]) > 1:
+        print("Only one out of --color, --html or --json should be specified")
         sys.exit(1)
 
     testdir = args.testdir or find_latest_test_dir()
@@ -80,20 +144,48 @@ def main():
         colors["node3"] = "\033[0;33m"  # YELLOW
         colors["reset"] = "\033[0m"  # Reset font color
 
-    log_events = read_logs(testdir)
+    sources = None
+    if args.node:
+        sources = {
+            source if source == "test" else "node" + source
+            for source in args.node.split(",")
+        }
+    log_events = read_logs(
+        testdir,
+        since=args.since,
+        until=args.until,
+        sources=sources,
+        categories=set(args.category.split(",")) if args.category else None,
+        pattern=args.grep,
+        jobs=args.jobs,
+    )
+
+    page = None
+    if args.page_size:
+        # Read one more event to tell whether there is a next page
+        first = (args.page - 1) * args.page_size
+        log_events = list(
+            itertools.islice(log_events, first, first + args.page_size + 1)
+        )
+        page = {
+            "page": args.page,
+            "page_size": args.page_size,
+            "first": first,
+            "more": len(log_events) > args.page_size,
+        }
+        log_events = log_events[: args.page_size]
 
     if args.html:
-        print_logs_html(log_events)
+        print_logs_html(log_events, page)
+    elif args.json:
+        print_logs_json(log_events, page)
     else:
         print_logs_plain(log_events, colors)
         print_node_warnings(testdir, colors)
 
 
-def read_logs(tmp_dir):
-    """Reads log files.
-
-    Delegates to generator function get_log_events() to provide individual log events
-    for each of the input log files."""
+def find_log_files(tmp_dir):
+    """Returns (source, path) of the test framework log and the node logs"""
 
     # Find out what the folder is called that holds the debug.log file
     chain = glob.glob("{}/node0/*/debug.log".format(tmp_dir))
@@ -113,8 +205,201 @@ def read_logs(tmp_dir):
         if not os.path.isfile(logfile):
             break
         files.append(("node%d" % i, logfile))
+    return files
+
+
+def read_logs(
+    tmp_dir,
+    *,
+    since=None,
+    until=None,
+    sources=None,
+    categories=None,
+    pattern=None,
+    jobs=1
+):
+    """Reads log files.
+
+    Indexes the log files in parallel, then merges the events of the index
+    that pass the time, source and category filters by timestamp. Only those
+    events are read from the memory-mapped files and matched against the
+    pattern, so filtering a large log does not load all of it."""
+
+    files = [(s, f) for s, f in find_log_files(tmp_dir) if not sources or s in sources]
+    if jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(min(jobs, len(files))) as executor:
+            indexes = list(executor.map(index_log, *zip(*files)))
+    else:
+        indexes = [index_log(source, f) for source, f in files]
 
-    return heapq.merge(*[get_log_events(source, f) for source, f in files])
+    # The first event has no timestamp if a log starts with untimed lines
+    start = min((t for index in indexes for t in index.timestamps[:2] if t), default=0)
+    since = parse_time(since, start) if since else 0
+    until = parse_time(until, start) if until else float("inf")
+
+    events = heapq.merge(
+        *[index.select(n, since, until, categories) for n, index in enumerate(indexes)]
+    )
+    return filter_events(indexes, events, re.compile(pattern) if pattern else None)
+
+
+def filter_events(indexes, events, pattern):
+    """Generator function that returns the log events of (timestamp, index
+    number, event number) tuples that match the pattern"""
+    logs = [index.open() for index in indexes]
+    try:
+        for _, n, i in events:
+            event = indexes[n].read(logs[n], i)
+            if pattern is None or pattern.search(event.event):
+                yield event
+    finally:
+        for log in logs:
+            if log is not None:
+                log.close()
+
+
+def parse_time(value, start):
+    """Returns microseconds since the epoch of a UTC timestamp, or of +SECONDS
+    after start"""
+    if value.startswith("+"):
+        return start + int(float(value[1:]) * 1e6)
+    match = re.match(
+        r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(\.\d+)?Z?$", value
+    )
+    if not match:
+        print("Invalid time {}".format(value))
+        sys.exit(1)
+    fields = [int(field) for field in match.groups()[:6]]
+    fraction = float(match.group(7)) if match.group(7) else 0
+    return (calendar.timegm(fields) + fraction) * 1e6
+
+
+class LogIndex:
+    """Compact index of the events of one log file.
+
+    Stores the start and end offset, timestamp in microseconds and category
+    of each event in arrays, i.e. a few dozen bytes per event, not the events
+    themselves."""
+
+    def __init__(self, source, path):
+        self.source = source
+        self.path = path
+        self.starts = array("Q")
+        self.ends = array("Q")
+        self.timestamps = array("q")
+        self.categories = array("H")
+        self.category_names = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def select(self, n, since, until, categories):
+        """Generator function that returns (timestamp, n, event number) of
+        the events in the time window and categories"""
+        allowed = None
+        if categories is not None:
+            allowed = {
+                i for i, name in enumerate(self.category_names) if name in categories
+            }
+        for i, timestamp in enumerate(self.timestamps):
+            if timestamp < since or timestamp > until:
+                continue
+            if allowed is not None and self.categories[i] not in allowed:
+                continue
+            yield timestamp, n, i
+
+    def open(self):
+        if not self:
+            return None
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, log, i):
+        """Returns event i of the memory-mapped log as a LogEvent"""
+        text = log[self.starts[i] : self.ends[i]].decode("utf-8", errors="replace")
+        lines = [line for line in text.splitlines() if line]
+        timestamp = ""
+        time_match = TIMESTAMP_PATTERN.match(lines[0])
+        if time_match:
+            timestamp = time_match.group()
+            if time_match.group(1) is None:
+                # timestamp does not have microseconds. Add zeroes.
+                timestamp_micro = timestamp.replace("Z", ".000000Z")
+                lines[0] = lines[0].replace(timestamp, timestamp_micro)
+                timestamp = timestamp_micro
+        # Prefix with space equivalent to the source + timestamp so log lines
+        # are aligned. Untimed lines at the start of a log are all continued.
+        first = 1 if time_match else 0
+        event = "\n".join(
+            lines[:first] + [CONTINUATION_PREFIX + line for line in lines[first:]]
+        )
+        return LogEvent(
+            timestamp=timestamp,
+            source=self.source,
+            event=event.rstrip(),
+            category=self.category_names[self.categories[i]],
+        )
+
+
+def index_log(source, logfile):
+    """Returns the LogIndex of a log file.
+
+    Log events may be split over multiple lines. We use the timestamp
+    regex match as the marker for a new log event."""
+    index = LogIndex(source, logfile)
+    try:
+        infile = open(logfile, "rb")
+    except FileNotFoundError:
+        print(
+            "File %s could not be opened. Continuing without it." % logfile,
+            file=sys.stderr,
+        )
+        return index
+    with infile:
+        size = os.fstat(infile.fileno()).st_size
+        if not size:
+            return index
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            category_ids = {}
+            seconds = {}
+            pos = 0
+            while pos < size:
+                end = log.find(b"\n", pos)
+                end = size if end == -1 else end + 1
+                time_match = TIMESTAMP_PATTERN_BYTES.match(log, pos, end)
+                # Lines before the first timestamp make up an event of their own
+                if time_match or (not index.starts and log[pos:end].strip()):
+                    if index.starts:
+                        index.ends.append(pos)
+                    index.starts.append(pos)
+                    timestamp = 0
+                    category = ""
+                    if time_match:
+                        # Most events share their second with the previous one
+                        second = time_match.group()[:19]
+                        if second not in seconds:
+                            seconds[second] = calendar.timegm(
+                                [int(f) for f in re.split(rb"[-T:]", second)]
+                            )
+                        micros = time_match.group(1)
+                        timestamp = seconds[second] * 1000000 + (
+                            int(micros[1:]) if micros else 0
+                        )
+                        category_match = CATEGORY_PATTERN.match(
+                            log, time_match.end(), end
+                        )
+                        if category_match:
+                            category = (
+                                category_match.group(1) or category_match.group(2)
+                            ).decode("utf-8", errors="replace")
+                    if category not in category_ids:
+                        category_ids[category] = len(index.category_names)
+                        index.category_names.append(category)
+                    index.timestamps.append(timestamp)
+                    index.categories.append(category_ids[category])
+                pos = end
+            index.ends.append(size)
+    return index
 
 
 def print_node_warnings(tmp_dir, colors):
@@ -163,46 +448,6 @@ def find_latest_test_dir():
     return max(testdir_paths, key=os.path.getmtime) if testdir_paths else None
 
 
-def get_log_events(source, logfile):
-    """Generator function that returns individual log events.
-
-    Log events may be split over multiple lines. We use the timestamp
-    regex match as the marker for a new log event."""
-    try:
-        with open(logfile, "r", encoding="utf-8") as infile:
-            event = ""
-            timestamp = ""
-            for line in infile:
-                # skip blank lines
-                if line == "\n":
-                    continue
-                # if this line has a timestamp, it's the start of a new log event.
-                time_match = TIMESTAMP_PATTERN.match(line)
-                if time_match:
-                    if event:
-                        yield LogEvent(
-                            timestamp=timestamp, source=source, event=event.rstrip()
-                        )
-                    timestamp = time_match.group()
-                    if time_match.group(1) is None:
-                        # timestamp does not have microseconds. Add zeroes.
-                        timestamp_micro = timestamp.replace("Z", ".000000Z")
-                        line = line.replace(timestamp, timestamp_micro)
-                        timestamp = timestamp_micro
-                    event = line
-                # if it doesn't have a timestamp, it's a continuation line of the previous log.
-                else:
-                    # Add the line. Prefix with space equivalent to the source + timestamp so log lines are aligned
-                    event += "                                   " + line
-            # Flush the final event
-            yield LogEvent(timestamp=timestamp, source=source, event=event.rstrip())
-    except FileNotFoundError:
-        print(
-            "File %s could not be opened. Continuing without it." % logfile,
-            file=sys.stderr,
-        )
-
-
 def print_logs_plain(log_events, colors):
     """Renders the iterator of log events into text."""
     for event in log_events:
@@ -221,7 +466,7 @@ def print_logs_plain(log_events, colors):
                 )
 
 
-def print_logs_html(log_events):
+def print_logs_html(log_events, page=None):
     """Renders the iterator of log events into html."""
     try:
         import jinja2
@@ -234,9 +479,24 @@ def print_logs_html(log_events):
         .render(
             title="Combined Logs from testcase",
             log_events=[event._asdict() for event in log_events],
+            page=page,
         )
     )
 
 
+def print_logs_json(log_events, page=None):
+    """Renders the iterator of log events into json, one event per line."""
+    print("{")
+    if page:
+        for key, value in page.items():
+            print("{}: {},".format(json.dumps(key), json.dumps(value)))
+    print('"events": [')
+    separator = ""
+    for event in log_events:
+        print(separator + json.dumps(event._asdict()), end="")
+        separator = ",\n"
+    print("\n]}")
+
+
 if __name__ == "__main__":
     main()
@@ -11,6 +11,8 @@ tests are being run in parallel.
 
 from test_framework.test_framework import DefiTestFramework
 
+EVM_KEY_POOL_SIZE = 1024
+
 
 class CreateCache(DefiTestFramework):
     # Test network and test nodes are not required:
@@ -23,7 +25,28 @@ class CreateCache(DefiTestFramework):
         pass
 
     def run_test(self):
-        pass
+        self.prewarm_contracts()
+        self.prewarm_key_pool()
+
+    def prewarm_contracts(self):
+        # Compile the EVM test contracts once for all parallel tests
+        try:
+            from test_framework.evm_contract import EVMContract
+        except ImportError:
+            self.log.info("solcx not available, skipping contract compile cache")
+            return
+        failed = EVMContract.prewarm_cache()
+        if failed:
+            self.log.warning("Could not precompile contracts: %s" % ", ".join(failed))
+
+    def prewarm_key_pool(self):
+        # Derive the default EVM key pool once for all parallel tests
+        try:
+            from test_framework.evm_key_pair import EvmKeyPool
+        except ImportError:
+            self.log.info("eth_account not available, skipping EVM key pool")
+            return
+        EvmKeyPool().load(EVM_KEY_POOL_SIZE)
 
 
 if __name__ == "__main__":
@@ -241,6 +241,12 @@ class ChainstateWriteCrashTest(DefiTestFramework):
 
         # Start by creating a lot of utxos on node3
         initial_height = self.nodes[3].getblockcount()
+        # The other nodes crash while syncing these blocks, mine as many as
+        # create_confirmed_utxos used to for funding the utxos
+        to_generate = int(0.5 * 5000) + 101
+        while to_generate > 0:
+            self.nodes[3].generate(min(25, to_generate))
+            to_generate -= 25
         utxo_list = create_confirmed_utxos(
             self.nodes[3].getnetworkinfo()["relayfee"], self.nodes[3], 5000
         )
@@ -9,6 +9,7 @@ from test_framework.util import assert_equal
 from test_framework.test_framework import DefiTestFramework
 from test_framework.evm_contract import EVMContract
 from test_framework.evm_key_pair import EvmKeyPair
+from test_framework.evm_state_diff import EvmStateDiff
 from test_framework.test_node import TestNode
 from test_framework.util import assert_raises_web3_error
 
@@ -158,14 +159,19 @@ class EVMTest(DefiTestFramework):
         signed = self.node.w3.eth.account.sign_transaction(
             tx, self.evm_key_pair.privkey
         )
-        hash = self.node.w3.eth.send_raw_transaction(signed.rawTransaction)
-
-        self.node.generate(1)
+        state = EvmStateDiff(self.node)
+        state.watch(self.evm_key_pair.address)
+        state.watch(self.contract.address, slots=[0])
+        with state.capture() as changes:
+            hash = self.node.w3.eth.send_raw_transaction(signed.rawTransaction)
+            self.node.generate(1)
 
         self.node.w3.eth.wait_for_transaction_receipt(hash)
 
         # get variable
         assert_equal(self.contract.functions.retrieve().call(), 10)
+        assert_equal(changes[self.contract.address], {"storage": {0: (0, 10)}})
+        assert_equal(changes[self.evm_key_pair.address]["nonce"][1], tx["nonce"] + 1)
 
     def failed_tx_should_increment_nonce(self):
         self.rollback_to(self.start_height)
@@ -406,31 +412,29 @@ class EVMTest(DefiTestFramework):
             address=receipt["contractAddress"], abi=abi
         )
 
-        balance_before = self.node.w3.eth.get_balance(self.evm_key_pair.address)
-        call_tx = self.node.w3.eth.send_transaction(
-            {
-                "to": self.proxy_contract.address,
-                "from": self.evm_key_pair.address,
-                "data": "0xffffffffffffffff",
-                "value": self.node.w3.to_hex(self.node.w3.to_wei("1", "ether")),
-            }
-        )
-        self.node.generate(1)
+        state = EvmStateDiff(self.node)
+        state.watch(self.evm_key_pair.address)
+        state.watch(self.proxy_contract.address, slots=[0])
+        state.watch(impl_address, slots=[0])
+        with state.capture() as changes:
+            call_tx = self.node.w3.eth.send_transaction(
+                {
+                    "to": self.proxy_contract.address,
+                    "from": self.evm_key_pair.address,
+                    "data": "0xffffffffffffffff",
+                    "value": self.node.w3.to_hex(self.node.w3.to_wei("1", "ether")),
+                }
+            )
+            self.node.generate(1)
 
         receipt = self.node.w3.eth.wait_for_transaction_receipt(call_tx)
 
         assert_equal(receipt["status"], 0)  # tx should have failed
-        assert_equal(
-            self.proxy_contract.functions.getCount().call(), 0
-        )  # fallback function should not have been called
-        assert_equal(
-            self.node.w3.eth.get_balance(self.proxy_contract.address), 0
-        )  # proxy balance should be 0
-        assert_equal(
-            self.node.w3.eth.get_balance(impl_address), 0
-        )  # implementation balance should be 0
+        # fallback function should not have been called, and neither proxy nor
+        # implementation should have received a balance
+        assert_equal(list(changes), [self.evm_key_pair.address])
 
-        balance_after = self.node.w3.eth.get_balance(self.evm_key_pair.address)
+        balance_before, balance_after = changes[self.evm_key_pair.address]["balance"]
         assert_equal(
             balance_before - balance_after,
             receipt["gasUsed"] * receipt["effectiveGasPrice"],
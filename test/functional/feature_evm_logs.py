@@ -9,7 +9,7 @@ from test_framework.util import assert_equal
 from test_framework.test_framework import DefiTestFramework
 from test_framework.evm_contract import EVMContract
 from test_framework.evm_key_pair import EvmKeyPair
-from web3._utils.events import get_event_data
+from test_framework.evm_log_indexer import EvmLogIndexer
 
 
 class EVMTestLogs(DefiTestFramework):
@@ -84,7 +84,8 @@ class EVMTestLogs(DefiTestFramework):
         abi, bytecode, _ = self.contract.compile()
         compiled = node.w3.eth.contract(abi=abi, bytecode=bytecode)
         self.abi = abi
-        self.event_abi = compiled._find_matching_event_abi("NumberStored")
+        self.indexer = EvmLogIndexer(node)
+        self.indexer.add_abi(abi)
 
         tx = compiled.constructor().build_transaction(
             {
@@ -105,10 +106,10 @@ class EVMTestLogs(DefiTestFramework):
             address=receipt["contractAddress"], abi=abi
         )
 
-    def should_contract_store_and_emit_logs(self):
-        # store
+    def store(self, number):
+        """Stores number in a new block, returns the block's DVM height"""
         node = self.nodes[0]
-        tx = self.contract.functions.store(10).build_transaction(
+        tx = self.contract.functions.store(number).build_transaction(
             {
                 "chainId": node.w3.eth.chain_id,
                 "nonce": node.w3.eth.get_transaction_count(self.evm_key_pair.address),
@@ -121,6 +122,10 @@ class EVMTestLogs(DefiTestFramework):
         node.generate(1)
 
         node.w3.eth.wait_for_transaction_receipt(hash)
+        return node.getblockcount()
+
+    def should_contract_store_and_emit_logs(self):
+        self.store(10)
 
         block = self.nodes[0].eth_getBlockByNumber("latest")
         receipt = self.nodes[0].eth_getTransactionReceipt(block["transactions"][0])
@@ -136,9 +141,29 @@ class EVMTestLogs(DefiTestFramework):
         assert_equal(logs[0]["data"], "0x")
         assert_equal(len(logs[0]["topics"]), 3)
 
-        logs = node.w3.eth.get_logs({"fromBlock": "latest"})
-        event_data = get_event_data(node.w3.codec, self.event_abi, logs[0])
-        assert_equal(event_data["event"], "NumberStored")
+        new_logs = self.indexer.sync()
+        assert_equal(len(new_logs), 1)
+        assert_equal(new_logs[0].event, "NumberStored")
+        assert_equal(new_logs[0].transaction_hash, block["transactions"][0])
+        events = self.indexer.get_events(
+            "NumberStored",
+            address=self.contract.address,
+            block=int(block["number"], 16),
+        )
+        assert_equal(len(events), 1)
+        assert_equal(events[0]["_number"], 10)
+        assert_equal(events[0]["_caller"].lower(), self.evm_key_pair.address.lower())
+
+        # Logs of disconnected blocks are dropped, those of earlier blocks kept
+        height = self.store(20)
+        assert_equal(len(self.indexer.sync()), 1)
+        self.rollback_to(height - 1)
+        assert_equal(
+            self.nodes[0].eth_getBlockByNumber("latest")["hash"], block["hash"]
+        )
+        assert_equal(self.indexer.sync(), [])
+        events = self.indexer.get_events("NumberStored", address=self.contract.address)
+        assert_equal([event["_number"] for event in events], [10])
 
     def run_test(self):
         self.setup()
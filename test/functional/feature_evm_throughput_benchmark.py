@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Benchmark EVM block throughput.
+
+Fills blocks with a mix of EVM transactions and transferdomain bridges and
+writes txs per block, gas per second, block connect time and mempool
+acceptance latency to evm_throughput_benchmark.json in the test tmpdir."""
+
+from test_framework.test_framework import DefiTestFramework
+from test_framework.benchmark_util import write_results
+from test_framework.evm_benchmark import (
+    DEFAULT_MIX,
+    EvmThroughputBenchmark,
+    parse_mix,
+)
+from test_framework.evm_key_pair import EvmKeyPool
+from test_framework.evm_tx_util import MAX_TXS_PER_SENDER
+from test_framework.util import assert_equal, get_id_token
+
+
+class EVMThroughputBenchmark(DefiTestFramework):
+    def add_options(self, parser):
+        parser.add_argument(
+            "--mix",
+            dest="mix",
+            default=DEFAULT_MIX,
+            help="Weights of transfer, storage, loop, events and dst20 transactions (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--blocks",
+            dest="blocks",
+            default=5,
+            type=int,
+            help="Number of benchmark blocks (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--txs-per-block",
+            dest="txs_per_block",
+            default=500,
+            type=int,
+            help="EVM transactions per block, their gas limits must fit in a block (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--bridges",
+            dest="bridges",
+            default=10,
+            type=int,
+            help="transferdomain bridges per block, at most 20 (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--seed",
+            dest="seed",
+            default=0,
+            type=int,
+            help="Seed of the transaction mix (default: %(default)s)",
+        )
+
+    def set_test_params(self):
+        self.num_nodes = 1
+        self.setup_clean_chain = True
+        self.rpc_timeout = 600
+        self.extra_args = [
+            [
+                "-dummypos=0",
+                "-txnotokens=0",
+                "-amkheight=50",
+                "-bayfrontheight=51",
+                "-dakotaheight=51",
+                "-eunosheight=80",
+                "-fortcanningheight=82",
+                "-fortcanninghillheight=84",
+                "-fortcanningroadheight=86",
+                "-fortcanningcrunchheight=88",
+                "-fortcanningspringheight=90",
+                "-fortcanninggreatworldheight=94",
+                "-fortcanningepilogueheight=96",
+                "-grandcentralheight=101",
+                "-nextnetworkupgradeheight=105",
+                "-subsidytest=1",
+                "-txindex=1",
+            ],
+        ]
+
+    def run_test(self):
+        self.node = self.nodes[0]
+        self.mix = parse_mix(self.options.mix)
+        self.setup_chain()
+        self.setup_benchmark()
+
+        results = self.benchmark.run(
+            self.mix,
+            self.options.blocks,
+            self.options.txs_per_block,
+            self.options.bridges,
+        )
+        for block in results["blocks"]:
+            self.log.info(
+                "Block {height}: {evm_txs} EVM txs, {bridges} bridges, "
+                "{gas_used} gas, connect {connect_ms} ms, "
+                "accept {accept_ms:.0f} ms".format(**block)
+            )
+            assert_equal(block["rejected"], 0)
+            assert_equal(block["evm_txs"], self.options.txs_per_block)
+            assert_equal(block["bridges"], self.options.bridges)
+
+        results.update(
+            {
+                "mix": self.mix,
+                "txs_per_block": self.options.txs_per_block,
+                "bridges": self.options.bridges,
+                "seed": self.options.seed,
+            }
+        )
+        write_results(self, "evm_throughput_benchmark", results)
+
+    def setup_chain(self):
+        self.address = self.node.get_genesis_keys().ownerAuthAddress
+        self.node.generate(105)
+        self.node.utxostoaccount({self.address: "500@DFI"})
+        self.node.setgov(
+            {
+                "ATTRIBUTES": {
+                    "v0/params/feature/evm": "true",
+                    "v0/params/feature/transferdomain": "true",
+                    "v0/transferdomain/dvm-evm/enabled": "true",
+                    "v0/transferdomain/dvm-evm/dat-enabled": "true",
+                    "v0/transferdomain/dvm-evm/src-formats": ["p2pkh", "bech32"],
+                    "v0/transferdomain/dvm-evm/dest-formats": ["erc55"],
+                }
+            }
+        )
+        self.node.generate(2)
+
+        self.node.createtoken(
+            {
+                "symbol": "BTC",
+                "name": "BTC token",
+                "isDAT": True,
+                "collateralAddress": self.address,
+            }
+        )
+        self.node.generate(1)
+        self.node.minttokens("1000@BTC")
+        self.node.generate(1)
+
+    def setup_benchmark(self):
+        senders = -(-self.options.txs_per_block // MAX_TXS_PER_SENDER)
+        key_pairs = EvmKeyPool(self.options.seed).take(senders)
+        self.benchmark = EvmThroughputBenchmark(
+            self.node, self.address, key_pairs, seed=self.options.seed
+        )
+
+        amounts = ["10@DFI"]
+        if "dst20" in self.mix:
+            amounts.append("10@BTC")
+            self.benchmark.set_dst20_token(get_id_token(self.node, "BTC"))
+        self.benchmark.fund_senders(amounts)
+        self.benchmark.deploy_contracts()
+
+
+if __name__ == "__main__":
+    EVMThroughputBenchmark().main()
@@ -13,6 +13,7 @@ from test_framework.util import (
 )
 from test_framework.evm_contract import EVMContract
 from test_framework.evm_key_pair import EvmKeyPair
+from test_framework.transferdomain_util import BulkBridge, DVM, EVM
 
 from decimal import Decimal
 
@@ -728,6 +729,35 @@ class EVMTest(DefiTestFramework):
             attributes["v0/live/economy/evm/block/fee_priority"], Decimal("0E-8")
         )
 
+    def valid_bulk_transfers(self):
+        self.rollback_to(self.start_height)
+
+        key_pairs = [EvmKeyPair.from_node(self.nodes[0]) for _ in range(12)]
+        bridge = BulkBridge(self.nodes[0])
+
+        # DVM->EVM transfers of one source are packed 20 per block
+        bridge.add_many(
+            [(self.address, key_pair.address) for key_pair in key_pairs],
+            ["2@DFI", "1@BTC"],
+        )
+        result = bridge.send()
+        assert_equal([b["transfers"] for b in result["blocks"]], [20, 4])
+
+        # EVM->DVM transfers need auth transactions and are packed 10 per block
+        bridge.add_many(
+            [(key_pair.address, self.address) for key_pair in key_pairs],
+            ["1@DFI", "1@BTC"],
+            EVM,
+            DVM,
+        )
+        result = bridge.send()
+        assert_equal([b["transfers"] for b in result["blocks"]], [10, 10, 4])
+        self.log.info(
+            "Bulk EVM->DVM transfers connected in {} ms per transfer".format(
+                result["summary"]["ms_per_transfer"].get("mean")
+            )
+        )
+
     def invalid_transfer_sc(self):
         self.rollback_to(self.start_height)
 
@@ -1271,6 +1301,9 @@ class EVMTest(DefiTestFramework):
         self.invalid_values_evm_dvm()
         self.valid_transfer_evm_dvm()
 
+        # Bulk transfers DVM<->EVM
+        self.valid_bulk_transfers()
+
         # Transfer to smart contract
         self.invalid_transfer_sc()
 
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Test pre-signed EVM transaction pipeline and local nonce tracking."""
+
+from test_framework.test_framework import DefiTestFramework
+from test_framework.authproxy import JSONRPCException
+from test_framework.evm_key_pair import EvmKeyPair, EvmKeyPool
+from test_framework.evm_tx_util import EvmTxPipeline, MAX_TXS_PER_SENDER
+from test_framework.util import assert_equal, batch_rpc
+
+SENDERS = 8
+TXS_PER_SENDER = 60
+
+
+class EVMTxPipelineTest(DefiTestFramework):
+    def set_test_params(self):
+        self.num_nodes = 1
+        self.setup_clean_chain = True
+        self.extra_args = [
+            [
+                "-dummypos=0",
+                "-txnotokens=0",
+                "-amkheight=50",
+                "-bayfrontheight=51",
+                "-dakotaheight=51",
+                "-eunosheight=80",
+                "-fortcanningheight=82",
+                "-fortcanninghillheight=84",
+                "-fortcanningroadheight=86",
+                "-fortcanningcrunchheight=88",
+                "-fortcanningspringheight=90",
+                "-fortcanninggreatworldheight=94",
+                "-fortcanningepilogueheight=96",
+                "-grandcentralheight=101",
+                "-nextnetworkupgradeheight=105",
+                "-subsidytest=1",
+                "-txindex=1",
+            ],
+        ]
+
+    def run_test(self):
+        self.node = self.nodes[0]
+        self.setup()
+        self.fund_senders()
+        self.send_bulk()
+        self.resync_after_rollback()
+        self.resync_after_rejection()
+
+    def setup(self):
+        self.address = self.node.get_genesis_keys().ownerAuthAddress
+        self.node.generate(105)
+        self.node.utxostoaccount({self.address: "201@DFI"})
+        self.node.setgov(
+            {
+                "ATTRIBUTES": {
+                    "v0/params/feature/evm": "true",
+                    "v0/params/feature/transferdomain": "true",
+                    "v0/transferdomain/dvm-evm/enabled": "true",
+                    "v0/transferdomain/dvm-evm/src-formats": ["p2pkh", "bech32"],
+                    "v0/transferdomain/dvm-evm/dest-formats": ["erc55"],
+                }
+            }
+        )
+        self.node.generate(2)
+
+        self.funder = EvmKeyPair.from_node(self.node)
+        self.node.transferdomain(
+            [
+                {
+                    "src": {"address": self.address, "amount": "100@DFI", "domain": 2},
+                    "dst": {
+                        "address": self.funder.address,
+                        "amount": "100@DFI",
+                        "domain": 3,
+                    },
+                }
+            ]
+        )
+        self.node.generate(1)
+        self.pipeline = EvmTxPipeline(self.node)
+
+    def transfer(self, to, value=1, **fees):
+        tx = {"to": to, "value": value, "gas": 21000}
+        tx.update(fees or {"gasPrice": 10_000_000_000})
+        return tx
+
+    def fund_senders(self):
+        # Deterministic senders imported into the wallet in one batch
+        self.senders = EvmKeyPool().take_imported(self.node, SENDERS)
+        for sender in self.senders:
+            assert self.node.getaddressinfo(sender.address)["ismine"]
+        value = 10 * 10**18
+        self.pipeline.send(
+            [(self.funder, self.transfer(s.address, value)) for s in self.senders]
+        )
+        self.node.generate(1)
+
+        balances = batch_rpc(
+            self.node,
+            [("eth_getBalance", s.address) for s in self.senders],
+        )
+        assert_equal([int(b, 16) for b in balances], [value] * SENDERS)
+        assert_equal(self.funder.nonces.next_nonce, SENDERS)
+
+    def send_bulk(self):
+        assert TXS_PER_SENDER <= MAX_TXS_PER_SENDER
+        # Mix legacy and EIP-1559 transactions of all senders
+        txs = []
+        for i in range(TXS_PER_SENDER):
+            for sender in self.senders:
+                if i % 2:
+                    tx = self.transfer(
+                        self.funder.address,
+                        maxFeePerGas=10_000_000_000,
+                        maxPriorityFeePerGas=1_500_000_000,
+                    )
+                else:
+                    tx = self.transfer(self.funder.address)
+                txs.append((sender, tx))
+
+        hashes = self.pipeline.send(txs)
+        self.node.generate(1)
+
+        block = self.node.eth_getBlockByNumber("latest", False)
+        assert_equal(len(block["transactions"]), len(txs))
+        receipts = batch_rpc(
+            self.node,
+            [("eth_getTransactionReceipt", tx_hash) for tx_hash in hashes],
+        )
+        assert_equal({r["status"] for r in receipts}, {"0x1"})
+
+        nonces = batch_rpc(
+            self.node,
+            [("eth_getTransactionCount", s.address) for s in self.senders],
+        )
+        assert_equal([int(n, 16) for n in nonces], [TXS_PER_SENDER] * SENDERS)
+
+    def resync_after_rollback(self):
+        sender = self.senders[0]
+        height = self.node.getblockcount()
+        self.pipeline.send([(sender, self.transfer(self.funder.address))])
+        self.node.generate(1)
+        assert_equal(sender.nonces.next_nonce, TXS_PER_SENDER + 1)
+
+        # The transaction of the disconnected block is gone, so the nonce is
+        # resynced and reused
+        self.rollback_to(height)
+        assert_equal(
+            self.node.evm.get_transaction_count(sender.address), TXS_PER_SENDER
+        )
+        self.pipeline.send([(sender, self.transfer(self.funder.address))])
+        assert_equal(sender.nonces.next_nonce, TXS_PER_SENDER + 1)
+
+        # A pending transaction is still counted
+        self.pipeline.send([(sender, self.transfer(self.funder.address))])
+        assert_equal(sender.nonces.next_nonce, TXS_PER_SENDER + 2)
+        self.node.generate(1)
+        assert_equal(
+            self.node.evm.get_transaction_count(sender.address), TXS_PER_SENDER + 2
+        )
+
+    def resync_after_rejection(self):
+        sender = self.senders[1]
+        results = self.pipeline.send(
+            [(sender, dict(self.transfer(self.funder.address), gas=20000))],
+            raise_errors=False,
+        )
+        assert isinstance(results[0], JSONRPCException)
+        assert_equal(sender.nonces.next_nonce, None)
+
+        self.pipeline.send([(sender, self.transfer(self.funder.address))])
+        self.node.generate(1)
+        assert_equal(
+            self.node.evm.get_transaction_count(sender.address), TXS_PER_SENDER + 1
+        )
+
+
+if __name__ == "__main__":
+    EVMTxPipelineTest().main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Test declarative fixture builder."""
+
+from test_framework.test_framework import DefiTestFramework
+from test_framework.fixture_util import FixtureBuilder
+from test_framework.util import assert_equal, assert_greater_than_or_equal
+
+from decimal import Decimal
+
+
+class FixtureBuilderTest(DefiTestFramework):
+    def set_test_params(self):
+        self.num_nodes = 2
+        self.setup_clean_chain = True
+        self.extra_args = [
+            [
+                "-txnotokens=0",
+                "-amkheight=1",
+                "-bayfrontheight=1",
+                "-eunosheight=1",
+                "-fortcanningheight=1",
+                "-fortcanninghillheight=1",
+            ]
+        ] * self.num_nodes
+
+    def run_test(self):
+        self.nodes[0].generate(120)
+        self.sync_blocks()
+
+        spec = {
+            "utxostoaccount": "10000@DFI",
+            "tokens": [{"symbol": "BTC", "name": "BTC token", "amount": 1000}],
+            "oracles": [
+                {"prices": {"DFI/USD": 10, "BTC/USD": 100}},
+                {"prices": {"TSLA/USD": 5}, "weightage": 5},
+            ],
+            "loan_schemes": [{"id": "LOAN001", "mincolratio": 150, "interestrate": 5}],
+            "collateral_tokens": [
+                {"token": "DFI", "factor": 1, "fixedIntervalPriceId": "DFI/USD"},
+                {"token": "BTC", "factor": 1, "fixedIntervalPriceId": "BTC/USD"},
+            ],
+            "loan_tokens": [
+                {"symbol": "TSLA", "fixedIntervalPriceId": "TSLA/USD", "interest": 1}
+            ],
+            "pools": [
+                {"tokenA": "BTC", "tokenB": "DFI", "amountA": 10, "amountB": 100}
+            ],
+            "vaults": [
+                {
+                    "loanSchemeId": "LOAN001",
+                    "collateral": ["100@DFI", "1@BTC"],
+                    "loans": ["10@TSLA"],
+                }
+            ]
+            * 3,
+        }
+
+        height = self.nodes[0].getblockcount()
+        fixture = FixtureBuilder(self, spec)
+        blocks = fixture.build()
+        assert_equal(self.nodes[0].getblockcount() - height, blocks)
+
+        # One block per dependency level, five of them, plus at most two price
+        # intervals until the fixed interval prices are live
+        self.log.info("Fixture built in {} blocks".format(blocks))
+        interval = self.nodes[0].getloaninfo()["defaults"]["fixedIntervalBlocks"]
+        assert_greater_than_or_equal(5 + 2 * interval, blocks)
+
+        # Fixture state is synced to all nodes
+        node = self.nodes[1]
+        assert_equal(len(node.listoracles()), 2)
+        assert_equal(len(node.listloanschemes()), 1)
+        assert_equal(len(node.listcollateraltokens()), 2)
+        assert_equal(len(node.listloantokens()), 1)
+
+        pool_id = fixture.pool_ids["BTC-DFI"]
+        pool = node.getpoolpair(pool_id)[pool_id]
+        assert_equal(pool["reserveA"], Decimal("10"))
+        assert_equal(pool["reserveB"], Decimal("100"))
+
+        for vault_id, owner in zip(fixture.vault_ids, fixture.vault_owners):
+            vault = node.getvault(vault_id)
+            assert_equal(vault["ownerAddress"], owner)
+            assert_equal(vault["loanSchemeId"], "LOAN001")
+            assert_equal(vault["state"], "active")
+            assert_equal(
+                vault["collateralAmounts"], ["100.00000000@DFI", "1.00000000@BTC"]
+            )
+            assert_equal(node.getaccount(owner), ["10.00000000@TSLA"])
+
+
+if __name__ == "__main__":
+    FixtureBuilderTest().main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Test settlement of many concurrent future swaps against the settlement model."""
+
+from test_framework.test_framework import DefiTestFramework
+from test_framework.fixture_util import FixtureBuilder
+from test_framework.futures_util import (
+    FuturesSettlement,
+    assert_settlement,
+    get_accounts,
+    get_active_prices,
+    get_pending_swaps,
+)
+from test_framework.util import assert_equal, batch_rpc
+
+from decimal import Decimal
+
+SWAPS_PER_KIND = 50
+
+
+class FuturesBulkSettlementTest(DefiTestFramework):
+    def set_test_params(self):
+        self.num_nodes = 1
+        self.setup_clean_chain = True
+        self.extra_args = [
+            [
+                "-txnotokens=0",
+                "-amkheight=1",
+                "-bayfrontheight=1",
+                "-eunosheight=1",
+                "-fortcanningheight=1",
+                "-fortcanninghillheight=1",
+                "-fortcanningroadheight=1",
+                "-fortcanningcrunchheight=1",
+                "-fortcanningspringheight=1",
+                "-subsidytest=1",
+            ]
+        ]
+
+    def run_test(self):
+        self.node = self.nodes[0]
+        self.node.generate(150)
+
+        self.setup_fixture()
+        self.setup_futures()
+        self.create_swaps()
+        self.check_dfip2203_settlement()
+        self.check_dfip2206f_settlement()
+
+    def setup_fixture(self):
+        self.fixture = FixtureBuilder(
+            self,
+            {
+                "utxostoaccount": "10000@DFI",
+                "oracles": [
+                    {"prices": {"DFI/USD": 1, "TSLA/USD": 870}},
+                    {"prices": {"GOOGL/USD": 2600}},
+                ],
+                "loan_tokens": [
+                    {
+                        "symbol": "DUSD",
+                        "fixedIntervalPriceId": "DUSD/USD",
+                        "amount": 1000000,
+                    },
+                    {
+                        "symbol": "TSLA",
+                        "fixedIntervalPriceId": "TSLA/USD",
+                        "interest": 1,
+                        "amount": 1000,
+                    },
+                    {
+                        "symbol": "GOOGL",
+                        "fixedIntervalPriceId": "GOOGL/USD",
+                        "interest": 1,
+                        "amount": 1000,
+                    },
+                ],
+                "live_prices": True,
+            },
+        )
+        self.fixture.build()
+        self.address = self.fixture.owner
+
+    def setup_futures(self):
+        # Offset DFI-to-DUSD settlements from dToken settlements by half a period
+        height = self.node.getblockcount()
+        start_block_dusd = height - (height % 20) + 30
+
+        self.node.setgov(
+            {
+                "ATTRIBUTES": {
+                    "v0/token/0/fixed_interval_price_id": "DFI/USD",
+                    "v0/params/dfip2203/reward_pct": "0.05",
+                    "v0/params/dfip2203/block_period": "20",
+                    "v0/params/dfip2206f/reward_pct": "0.01",
+                    "v0/params/dfip2206f/block_period": "20",
+                    "v0/params/dfip2206f/start_block": str(start_block_dusd),
+                }
+            }
+        )
+        self.node.generate(1)
+        self.node.setgov(
+            {
+                "ATTRIBUTES": {
+                    "v0/params/dfip2203/active": "true",
+                    "v0/params/dfip2206f/active": "true",
+                }
+            }
+        )
+        self.node.generate(1)
+
+        self.futures = FuturesSettlement.from_gov(self.node, "dfip2203")
+        self.futures_dusd = FuturesSettlement.from_gov(self.node, "dfip2206f")
+        assert_equal(
+            self.futures.next_settlement_block(self.node.getblockcount()),
+            self.node.getfutureswapblock(),
+        )
+
+    def create_swaps(self):
+        # Move past the DFI-to-DUSD start block
+        self.node.generate(
+            self.futures_dusd.next_settlement_block(self.node.getblockcount())
+            - self.node.getblockcount()
+        )
+
+        self.owners = batch_rpc(
+            self.node, [("getnewaddress", "", "legacy")] * (SWAPS_PER_KIND * 4)
+        )
+        tsla_owners = self.owners[:SWAPS_PER_KIND]
+        dusd_owners = self.owners[SWAPS_PER_KIND : SWAPS_PER_KIND * 2]
+        googl_owners = self.owners[SWAPS_PER_KIND * 2 : SWAPS_PER_KIND * 3]
+        dfi_owners = self.owners[SWAPS_PER_KIND * 3 :]
+
+        # Fund all owners with one transaction per token
+        batch_rpc(
+            self.node,
+            [
+                ("accounttoaccount", self.address, {a: "1@TSLA" for a in tsla_owners}),
+                (
+                    "accounttoaccount",
+                    self.address,
+                    {a: "1000@DUSD" for a in dusd_owners + googl_owners},
+                ),
+                ("accounttoaccount", self.address, {a: "10@DFI" for a in dfi_owners}),
+            ],
+        )
+        self.node.generate(1)
+
+        swaps = [("futureswap", a, "1@TSLA") for a in tsla_owners]
+        swaps += [("futureswap", a, "913.5@DUSD", "TSLA") for a in dusd_owners]
+        swaps += [("futureswap", a, "1000@DUSD", "GOOGL") for a in googl_owners]
+        swaps += [("futureswap", a, "1@DFI", "DUSD") for a in dfi_owners]
+        batch_rpc(self.node, swaps)
+        self.node.generate(1)
+
+    def check_dfip2203_settlement(self):
+        pending, pending_dusd = get_pending_swaps(self.node)
+        assert_equal(len(pending), SWAPS_PER_KIND * 3)
+        assert_equal(len(pending_dusd), SWAPS_PER_KIND)
+
+        # Remove the GOOGL oracle so that GOOGL swaps get refunded. Its price
+        # stops being live at the next price block before the settlement.
+        self.node.removeoracle(self.fixture.oracle_ids[1])
+        self.node.generate(1)
+
+        settlement_block = self.futures.next_settlement_block(self.node.getblockcount())
+        assert not self.futures_dusd.is_settlement_block(settlement_block)
+        self.node.generate(settlement_block - 1 - self.node.getblockcount())
+
+        # Snapshot the prices active at the settlement block
+        prices = get_active_prices(self.node, ["TSLA", "GOOGL"])
+        result = self.futures.settle_swaps(pending, prices)
+        assert_equal(result.swaps, SWAPS_PER_KIND * 2)
+        assert_equal(len(result.refunds), SWAPS_PER_KIND)
+
+        before = get_accounts(self.node, self.owners)
+        id_dusd = self.fixture.token_id("DUSD")
+        minted_before = Decimal(self.node.gettoken(id_dusd)[id_dusd]["minted"])
+
+        self.node.generate(1)
+        assert_equal(self.node.getblockcount(), settlement_block)
+
+        assert_settlement(self.node, result.expected_balances(before))
+        assert_equal(
+            Decimal(self.node.gettoken(id_dusd)[id_dusd]["minted"]),
+            minted_before + result.minted["DUSD"],
+        )
+        assert_equal(self.node.listpendingfutureswaps(), [])
+
+    def check_dfip2206f_settlement(self):
+        _, pending_dusd = get_pending_swaps(self.node)
+        dfi_price = get_active_prices(self.node, ["DFI"])["DFI"]
+        result = self.futures_dusd.settle_dusd_swaps(pending_dusd, dfi_price)
+        assert_equal(result.minted["DUSD"], Decimal("0.99") * SWAPS_PER_KIND)
+
+        before = get_accounts(self.node, self.owners)
+        self.node.generate(
+            self.futures_dusd.next_settlement_block(self.node.getblockcount())
+            - self.node.getblockcount()
+        )
+
+        assert_settlement(self.node, result.expected_balances(before))
+        assert_equal(self.node.listpendingdusdswaps(), [])
+
+
+if __name__ == "__main__":
+    FuturesBulkSettlementTest().main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Benchmark mass liquidation of a large vault population.
+
+Creates many vaults with randomized collateral and loan ratios, raises the
+loan token prices until every vault is liquidated and reports block connect
+times of the price update blocks and listauctions pagination latency."""
+
+from test_framework.test_framework import DefiTestFramework
+from test_framework.benchmark_util import (
+    BlockConnectTimes,
+    Stopwatch,
+    get_block_stats,
+    summarize,
+    write_results,
+)
+from test_framework.fixture_util import FixtureBuilder
+from test_framework.oracle_util import OracleSimulator, StepPrices
+from test_framework.util import assert_equal
+from test_framework.vault_util import VaultPopulation
+
+from decimal import Decimal
+
+PRICES = {"DFI": 100, "BTC": 1000, "TSLA": 100, "GOOGL": 1000}
+PRICE_STEPS = 5
+PRICE_STEP_CHANGE = Decimal("1.25")
+
+
+class LoanLiquidationBenchmark(DefiTestFramework):
+    def add_options(self, parser):
+        parser.add_argument(
+            "--vaults",
+            dest="vaults",
+            default=500,
+            type=int,
+            help="Number of vaults to create (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--seed",
+            dest="seed",
+            default=0,
+            type=int,
+            help="Seed of the vault population (default: %(default)s)",
+        )
+
+    def set_test_params(self):
+        self.num_nodes = 1
+        self.setup_clean_chain = True
+        self.rpc_timeout = 600
+        self.extra_args = [
+            [
+                "-txnotokens=0",
+                "-amkheight=1",
+                "-bayfrontheight=1",
+                "-eunosheight=1",
+                "-fortcanningheight=1",
+                "-fortcanninghillheight=1",
+                "-fortcanningroadheight=1",
+            ]
+        ]
+
+    def run_test(self):
+        self.node = self.nodes[0]
+        self.node.generate(1000)
+        self.results = {"vaults": self.options.vaults, "seed": self.options.seed}
+
+        self.setup_fixture()
+        self.create_vaults()
+        self.liquidate()
+        self.page_auctions()
+
+        write_results(self, "loan_liquidation_benchmark", self.results)
+
+    def setup_fixture(self):
+        self.fixture = FixtureBuilder(
+            self,
+            {
+                "utxostoaccount": "{}@DFI".format(self.options.vaults * 10),
+                "tokens": [
+                    {"symbol": "BTC", "name": "BTC", "amount": self.options.vaults}
+                ],
+                "oracles": [
+                    {
+                        "prices": {
+                            "{}/USD".format(symbol): price
+                            for symbol, price in PRICES.items()
+                        }
+                    }
+                ]
+                * 2,
+                "loan_schemes": [
+                    {"id": "LOAN150", "mincolratio": 150, "interestrate": 5}
+                ],
+                "collateral_tokens": [
+                    {"token": "DFI", "factor": 1, "fixedIntervalPriceId": "DFI/USD"},
+                    {"token": "BTC", "factor": 1, "fixedIntervalPriceId": "BTC/USD"},
+                ],
+                "loan_tokens": [
+                    {"symbol": "TSLA", "fixedIntervalPriceId": "TSLA/USD"},
+                    {"symbol": "GOOGL", "fixedIntervalPriceId": "GOOGL/USD"},
+                ],
+                "live_prices": True,
+            },
+        )
+        self.fixture.build()
+
+    def create_vaults(self):
+        population = VaultPopulation(
+            self.node,
+            self.fixture.owner,
+            "LOAN150",
+            ["DFI", "BTC"],
+            ["TSLA", "GOOGL"],
+            PRICES,
+            seed=self.options.seed,
+        )
+        with Stopwatch() as stopwatch:
+            population.generate(self.options.vaults)
+        self.population = population
+        self.log.info(
+            "Created {} vaults in {} blocks ({:.0f} ms)".format(
+                len(population.vaults), population.blocks_generated, stopwatch.ms
+            )
+        )
+        assert_equal(population.states(), {"active": self.options.vaults})
+        self.results["creation"] = {
+            "blocks": population.blocks_generated,
+            "ms": stopwatch.ms,
+        }
+
+    def liquidate(self):
+        # Raise loan token prices step by step, staying within the deviation
+        # that keeps prices live, until all vaults are below 150%.
+        series = {}
+        for symbol, price in PRICES.items():
+            steps = [(0, price)]
+            if symbol in ("TSLA", "GOOGL"):
+                steps += [
+                    (step, price * PRICE_STEP_CHANGE**step)
+                    for step in range(1, PRICE_STEPS + 1)
+                ]
+            series["{}/USD".format(symbol)] = StepPrices(steps)
+        simulator = OracleSimulator(self.node, self.fixture.oracle_ids, series)
+        simulator.step = 1
+
+        connect_times = BlockConnectTimes(self.node)
+        price_blocks = []
+        for _ in range(PRICE_STEPS + 2):
+            simulator.advance()
+            price_blocks.append(self.node.getblockcount())
+
+        states = self.population.states()
+        self.log.info("Vault states after price increase: {}".format(states))
+        assert_equal(states, {"inLiquidation": self.options.vaults})
+
+        times = connect_times.read()
+        price_block_times = [times[h] for h in price_blocks if h in times]
+        stats = get_block_stats(self.node, price_blocks)
+        self.results["liquidation"] = {
+            "price_blocks": [
+                {"height": s["height"], "txs": s["txs"], "ms": times.get(s["height"])}
+                for s in stats
+            ],
+            "connect_ms": summarize(list(times.values())),
+            "price_block_connect_ms": summarize(price_block_times),
+        }
+        if price_block_times:
+            self.log.info(
+                "Slowest price update block: {:.2f} ms".format(max(price_block_times))
+            )
+
+    def page_auctions(self):
+        latencies = []
+        auctions = 0
+        page = {"limit": 100}
+        while True:
+            with Stopwatch() as stopwatch:
+                result = self.node.listauctions(page)
+            latencies.append(stopwatch.ms)
+            auctions += len(result)
+            if len(result) < 100:
+                break
+            page = {
+                "start": {
+                    "vaultId": result[-1]["vaultId"],
+                    "height": result[-1]["liquidationHeight"],
+                },
+                "limit": 100,
+            }
+        assert_equal(auctions, self.options.vaults)
+        self.results["listauctions"] = {"pages": len(latencies), **summarize(latencies)}
+        self.log.info(
+            "Listed {} auctions in {} pages, median page {:.2f} ms".format(
+                auctions, len(latencies), self.results["listauctions"]["median"]
+            )
+        )
+
+
+if __name__ == "__main__":
+    LoanLiquidationBenchmark().main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Benchmark OCG voting with many masternodes and proposals."""
+
+from test_framework.test_framework import DefiTestFramework
+from test_framework.benchmark_util import Stopwatch, write_results
+from test_framework.gov_util import GovVoteLoad
+from test_framework.util import assert_equal, batch_rpc
+
+VOTING_PERIOD = 50
+NEXT_NETWORK_UPGRADE_HEIGHT = 200
+
+
+class OCGVotingLoadTest(DefiTestFramework):
+    def add_options(self, parser):
+        parser.add_argument(
+            "--masternodes",
+            dest="masternodes",
+            default=100,
+            type=int,
+            help="Number of voting masternodes (default: %(default)s)",
+        )
+        parser.add_argument(
+            "--proposals",
+            dest="proposals",
+            default=20,
+            type=int,
+            help="Number of proposals (default: %(default)s)",
+        )
+
+    def set_test_params(self):
+        self.num_nodes = 1
+        self.setup_clean_chain = True
+        self.rpc_timeout = 600
+        self.extra_args = [
+            [
+                "-jellyfish_regtest=1",
+                "-dummypos=0",
+                "-txnotokens=0",
+                "-amkheight=50",
+                "-bayfrontheight=51",
+                "-eunosheight=80",
+                "-fortcanningheight=82",
+                "-fortcanninghillheight=84",
+                "-fortcanningroadheight=86",
+                "-fortcanningcrunchheight=88",
+                "-fortcanningspringheight=90",
+                "-fortcanninggreatworldheight=94",
+                "-grandcentralheight=101",
+                f"-nextnetworkupgradeheight={NEXT_NETWORK_UPGRADE_HEIGHT}",
+                "-rpc-governance-accept-neutral=1",
+                "-simulatemainnet=1",
+            ],
+        ]
+
+    def run_test(self):
+        self.nodes[0].generate(100)
+        self.results = {
+            "masternodes": self.options.masternodes,
+            "proposals": self.options.proposals,
+        }
+
+        self.load = GovVoteLoad(self)
+        with Stopwatch() as stopwatch:
+            self.load.setup_masternodes(self.options.masternodes)
+        self.results["setup_masternodes_ms"] = stopwatch.ms
+
+        self.nodes[0].setgov(
+            {
+                "ATTRIBUTES": {
+                    "v0/params/feature/gov": "true",
+                    "v0/gov/proposals/voting_period": "{}".format(VOTING_PERIOD),
+                }
+            }
+        )
+        self.nodes[0].generate(1)
+
+        self.load.create_proposals(self.options.proposals)
+        self.cast_votes()
+        self.check_results()
+
+        write_results(self, "ocg_voting_load", self.results)
+
+    def cast_votes(self):
+        # Even proposals get a yes majority, odd ones a no majority, and every
+        # fifth masternode votes neutral.
+        masternodes = self.load.masternodes
+        votes = []
+        for i, proposal_id in enumerate(self.load.proposals):
+            for j, masternode_id in enumerate(masternodes):
+                if j % 5 == 0:
+                    vote = "neutral"
+                elif (i + (j % 4 == 0)) % 2 == 0:
+                    vote = "yes"
+                else:
+                    vote = "no"
+                votes.append((proposal_id, masternode_id, vote))
+
+        # Revote of the first masternodes replaces their earlier votes
+        votes += [
+            (proposal_id, masternode_id, "yes")
+            for proposal_id in self.load.proposals
+            for masternode_id in masternodes[:5]
+        ]
+
+        with Stopwatch() as stopwatch:
+            blocks = self.load.cast_votes(votes)
+        self.log.info(
+            "Cast {} votes in {} blocks ({:.0f} ms)".format(
+                len(votes), blocks, stopwatch.ms
+            )
+        )
+        self.results["votes"] = len(votes)
+        self.results["vote_blocks"] = blocks
+        self.results["cast_votes_ms"] = stopwatch.ms
+
+        with Stopwatch() as stopwatch:
+            index = self.load.verify_votes()
+        self.results["verify_votes_ms"] = stopwatch.ms
+        assert_equal(
+            sum(len(votes) for votes in index.values()),
+            len(masternodes) * len(self.load.proposals),
+        )
+
+    def check_results(self):
+        self.nodes[0].generate(VOTING_PERIOD * 2)
+        with Stopwatch() as stopwatch:
+            proposals = batch_rpc(
+                self.nodes[0],
+                [
+                    ("getgovproposal", proposal_id)
+                    for proposal_id in self.load.proposals
+                ],
+            )
+        self.results["getgovproposal_batch_ms"] = stopwatch.ms
+
+        for i, proposal in enumerate(proposals):
+            assert_equal(proposal["status"], "Completed" if i % 2 == 0 else "Rejected")
+
+
+if __name__ == "__main__":
+    OCGVotingLoadTest().main()
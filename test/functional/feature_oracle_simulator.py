@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Test oracle price feed simulator."""
+
+from test_framework.test_framework import DefiTestFramework
+from test_framework.fixture_util import FixtureBuilder
+from test_framework.oracle_util import (
+    OracleSimulator,
+    RandomWalkPrices,
+    ReplayPrices,
+    StepPrices,
+)
+from test_framework.util import assert_equal, batch_rpc
+
+from decimal import Decimal
+import os
+
+
+class OracleSimulatorTest(DefiTestFramework):
+    def set_test_params(self):
+        self.num_nodes = 1
+        self.setup_clean_chain = True
+        self.extra_args = [
+            [
+                "-txnotokens=0",
+                "-amkheight=1",
+                "-bayfrontheight=1",
+                "-eunosheight=1",
+                "-fortcanningheight=1",
+                "-fortcanninghillheight=1",
+            ]
+        ]
+
+    def run_test(self):
+        self.node = self.nodes[0]
+        self.node.generate(120)
+
+        self.fixture = FixtureBuilder(
+            self,
+            {
+                "utxostoaccount": "1000@DFI",
+                "oracles": [
+                    {"prices": {"DFI/USD": 1, "TSLA/USD": 100}},
+                    {"prices": {"DFI/USD": 1, "TSLA/USD": 100}},
+                    {"prices": {"GOOGL/USD": 2000}},
+                ],
+                "collateral_tokens": [
+                    {"token": "DFI", "factor": 1, "fixedIntervalPriceId": "DFI/USD"}
+                ],
+                "loan_tokens": [
+                    {"symbol": "TSLA", "fixedIntervalPriceId": "TSLA/USD"},
+                    {"symbol": "GOOGL", "fixedIntervalPriceId": "GOOGL/USD"},
+                ],
+                "live_prices": True,
+            },
+        )
+        self.fixture.build()
+
+        self.simulate_series()
+        self.replay_csv()
+
+    def assert_fixed_interval_prices(self, simulator, price_ids):
+        prices = batch_rpc(
+            self.node,
+            [("getfixedintervalprice", price_id) for price_id in price_ids],
+            independent=True,
+        )
+        active = simulator.prices(simulator.step - 2)
+        following = simulator.prices(simulator.step - 1)
+        for price_id, price in zip(price_ids, prices):
+            assert_equal(price["isLive"], True)
+            assert_equal(price["activePrice"], active[price_id])
+            assert_equal(price["nextPrice"], following[price_id])
+
+    def simulate_series(self):
+        oracle_ids = self.fixture.oracle_ids
+        simulator = OracleSimulator(
+            self.node,
+            {
+                oracle_ids[0]: ["DFI/USD", "TSLA/USD"],
+                oracle_ids[1]: ["DFI/USD", "TSLA/USD"],
+                oracle_ids[2]: ["GOOGL/USD"],
+            },
+            {
+                "DFI/USD": StepPrices([(0, 1), (3, "1.2"), (6, "0.9")]),
+                "TSLA/USD": RandomWalkPrices(100, seed=1),
+                "GOOGL/USD": RandomWalkPrices(2000, volatility="0.05", seed=2),
+            },
+        )
+        assert_equal(simulator.prices(4)["DFI/USD"], Decimal("1.2"))
+        assert_equal(simulator.prices(6)["DFI/USD"], Decimal("0.9"))
+
+        # Each step ends on a price interval boundary
+        interval = simulator.price_interval()
+        blocks = simulator.activate()
+        assert_equal(self.node.getblockcount() % interval, 0)
+        assert_equal(simulator.step, 1)
+        self.log.info("Activated first prices in {} blocks".format(blocks))
+
+        height = self.node.getblockcount()
+        blocks = simulator.advance(8)
+        assert_equal(blocks, 8 * interval)
+        assert_equal(self.node.getblockcount(), height + 8 * interval)
+        assert_equal(simulator.step, 9)
+        self.assert_fixed_interval_prices(
+            simulator, ["DFI/USD", "TSLA/USD", "GOOGL/USD"]
+        )
+
+    def replay_csv(self):
+        path = os.path.join(self.options.tmpdir, "prices.csv")
+        with open(path, "w", encoding="utf8") as f:
+            f.write("DFI/USD,TSLA/USD\n")
+            f.write("1,100\n")
+            f.write("1.1,95.5\n")
+            f.write("1.05,90.12345678\n")
+
+        series = ReplayPrices.from_csv(path)
+        assert_equal(series["TSLA/USD"].price(10), Decimal("90.12345678"))
+
+        simulator = OracleSimulator(self.node, self.fixture.oracle_ids[:2], series)
+        simulator.advance(3)
+        self.assert_fixed_interval_prices(simulator, ["DFI/USD", "TSLA/USD"])
+
+
+if __name__ == "__main__":
+    OracleSimulatorTest().main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Test blocks minted by the framework's PosMinter on a node checking PoS.
+
+Mint a chain on top of the node's tip and send it over P2P, then a longer fork
+from the middle of it that the node must reorg to. Minted counts and stake
+modifiers of the fork build on the state of its own branch."""
+
+from test_framework.mininode import P2PDataStore
+from test_framework.pos_minter import PosMinter, sign_header
+from test_framework.test_framework import DefiTestFramework
+from test_framework.util import assert_equal
+
+CHAIN_LENGTH = 500
+FORK_POINT = 250
+FORK_LENGTH = 260
+
+
+class PosMinterTest(DefiTestFramework):
+    def set_test_params(self):
+        self.num_nodes = 1
+        self.setup_clean_chain = True
+        self.extra_args = [["-dummypos=0"]]
+
+    def assert_minted_blocks(self, expected):
+        counts = {
+            mn["operatorAuthAddress"]: mn["mintedBlocks"]
+            for mn in self.nodes[0].listmasternodes({}, True).values()
+        }
+        assert_equal({address: counts[address] for address in expected}, expected)
+
+    def run_test(self):
+        node = self.nodes[0]
+        # Let the node mint a few blocks itself, so that the minter has to
+        # continue its stake modifier and minted count
+        node.generate(10)
+
+        minter = PosMinter()
+        tip = minter.sync_with(node)
+        start_height = node.getblockcount()
+        peer = node.add_p2p_connection(P2PDataStore())
+
+        self.log.info("Send a chain of %d minted blocks", CHAIN_LENGTH)
+        chain = minter.mint_chain(tip, CHAIN_LENGTH, operators=(0, 1, 2))
+        peer.send_blocks_and_test(chain, node, success=True)
+        assert_equal(node.getblockcount(), start_height + CHAIN_LENGTH)
+        block = node.getblock(chain[-1].hash)
+        assert_equal(block["minter"], minter.operators[(CHAIN_LENGTH - 1) % 3].address)
+        assert_equal(block["mintedBlocks"], chain[-1].nMintedBlocks)
+        assert_equal(int(block["stakeModifier"], 16), chain[-1].stakeModifier)
+        self.assert_minted_blocks(minter.states[chain[-1].sha256].minted)
+
+        self.log.info("Send a longer fork from block %d of the chain", FORK_POINT)
+        fork = minter.mint_chain(
+            chain[FORK_POINT - 1].sha256, FORK_LENGTH, operators=(3, 1)
+        )
+        peer.send_blocks_and_test(fork, node, success=True)
+        assert_equal(node.getblockcount(), start_height + FORK_POINT + FORK_LENGTH)
+        assert_equal(node.getblock(chain[-1].hash)["confirmations"], -1)
+        self.assert_minted_blocks(minter.states[fork[-1].sha256].minted)
+
+        self.log.info("A block with a wrong stake modifier is rejected")
+        block = minter.mint(fork[-1].sha256)
+        block.stakeModifier += 1
+        sign_header(block, minter.operators[0])
+        assert node.submitblock(block.serialize().hex()) is not None
+        assert_equal(node.getbestblockhash(), fork[-1].hash)
+
+
+if __name__ == "__main__":
+    PosMinterTest().main()
@@ -5,6 +5,7 @@
 """Encode and decode BASE58, P2PKH and P2SH addresses."""
 
 import enum
+import unittest
 
 from .script import hash256, hash160, sha256, CScript, OP_0
 from .util import hex_str_to_bytes
@@ -41,7 +42,18 @@ def byte_to_base58(b, version):
     return result
 
 
-# TODO: def base58_decode
+def base58_to_byte(s):
+    """Converts a base58-encoded string to its data and version.
+
+    Throws if the base58 checksum is invalid."""
+    n = 0
+    for c in s:
+        n = n * 58 + chars.index(c)
+    res = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    pad = len(s) - len(s.lstrip(chars[0]))
+    res = b"\x00" * pad + res
+    assert hash256(res[:-4])[:4] == res[-4:], "Invalid base58 checksum"
+    return res[1:-4], res[0]
 
 
 def keyhash_to_p2pkh(hash, main=False):
@@ -111,3 +123,23 @@ def check_script(script):
     if type(script) is bytes or type(script) is CScript:
         return script
     assert False
+
+
+class TestFrameworkAddress(unittest.TestCase):
+    def test_base58_to_byte(self):
+        for data, version in [
+            (b"", 0),
+            (b"\x00" * 20, 0),
+            (bytes(range(20)), 111),
+            (b"\xff" * 32, 239),
+        ]:
+            self.assertEqual(
+                base58_to_byte(byte_to_base58(data, version)), (data, version)
+            )
+        # A regtest WIF of a compressed key
+        data, version = base58_to_byte(
+            "cPGEaz8AGiM71NGMRybbCqFNRcuUhg3uGvyY4TFE1BZC26EW2PkC"
+        )
+        self.assertEqual((len(data), data[-1], version), (33, 1, 239))
+        with self.assertRaises(AssertionError):
+            base58_to_byte("cPGEaz8AGiM71NGMRybbCqFNRcuUhg3uGvyY4TFE1BZC26EW2PkD")
@@ -78,10 +78,13 @@ class AuthServiceProxy:
         timeout=HTTP_TIMEOUT,
         connection=None,
         ensure_ascii=True,
+        profiler=None,
     ):
         self.__service_url = service_url
         self._service_name = service_name
         self.ensure_ascii = ensure_ascii  # can be toggled on the fly by tests
+        self.profiler = profiler  # records latency and size of every call
+        self._response_bytes = 0
         self.__url = urllib.parse.urlparse(service_url)
         user = (
             None if self.__url.username is None else self.__url.username.encode("utf8")
@@ -102,13 +105,28 @@ class AuthServiceProxy:
             raise AttributeError
         if self._service_name is not None:
             name = "%s.%s" % (self._service_name, name)
-        return AuthServiceProxy(self.__service_url, name, connection=self.__conn)
+        return AuthServiceProxy(
+            self.__service_url, name, connection=self.__conn, profiler=self.profiler
+        )
 
-    def _request(self, method, path, postdata):
+    def _request(self, method, path, postdata, rpc_method=None):
         """
         Do a HTTP request, with retry if we get disconnected (e.g. due to a timeout).
         This is a workaround for https://bugs.python.org/issue3566 which is fixed in Python 3.5.
         """
+        if self.profiler is None:
+            return self._send_request(method, path, postdata)
+        start = time.perf_counter()
+        response = self._send_request(method, path, postdata)
+        self.profiler.record(
+            rpc_method or self._service_name,
+            time.perf_counter() - start,
+            len(postdata),
+            self._response_bytes,
+        )
+        return response
+
+    def _send_request(self, method, path, postdata):
         headers = {
             "Host": self.__url.hostname,
             "User-Agent": USER_AGENT,
@@ -189,8 +207,12 @@ class AuthServiceProxy:
             list(rpc_call_list), default=EncodeDecimal, ensure_ascii=self.ensure_ascii
         )
         log.debug("--> " + postdata)
+        methods = {call["method"] for call in rpc_call_list}
         response, status = self._request(
-            "POST", self.__url.path, postdata.encode("utf-8")
+            "POST",
+            self.__url.path,
+            postdata.encode("utf-8"),
+            "batch:" + (methods.pop() if len(methods) == 1 else "mixed"),
         )
         if status != HTTPStatus.OK:
             raise JSONRPCException(
@@ -231,7 +253,9 @@ class AuthServiceProxy:
                 http_response.status,
             )
 
-        responsedata = http_response.read().decode("utf8")
+        responsedata = http_response.read()
+        self._response_bytes = len(responsedata)
+        responsedata = responsedata.decode("utf8")
         response = json.loads(responsedata, parse_float=decimal.Decimal)
         elapsed = time.time() - req_start_time
         if "error" in response and response["error"] is None:
@@ -256,6 +280,7 @@ class AuthServiceProxy:
             "{}/{}".format(self.__service_url, relative_uri),
             self._service_name,
             connection=self.__conn,
+            profiler=self.profiler,
         )
 
     def _set_conn(self, connection=None):
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Helpers for benchmark style functional tests.
+
+Block connect times are read from the BENCH category of the node debug log,
+which test nodes always log with -debug."""
+
+import json
+import os
+import re
+import time
+
+from .util import batch_rpc
+
+UPDATE_TIP_RE = re.compile(r"UpdateTip: new best=\w+ height=(\d+)")
+CONNECT_BLOCK_RE = re.compile(r"- Connect block: ([\d.]+)ms")
+
+
+def debug_log_path(node):
+    return os.path.join(node.datadir, node.chain, "debug.log")
+
+
+class BlockConnectTimes:
+    """Collects the connect time of every block connected by a node after
+    this object was created, as {height: milliseconds}."""
+
+    def __init__(self, node):
+        self.path = debug_log_path(node)
+        self.offset = os.path.getsize(self.path)
+        self.height = None
+        self.times = {}
+
+    def read(self):
+        """Reads the log written since the last call and returns all times"""
+        with open(self.path, encoding="utf-8") as f:
+            f.seek(self.offset)
+            log = f.read()
+        # Only consume complete lines, the node may be mid-write
+        end = log.rfind("\n") + 1
+        self.offset += len(log[:end].encode("utf-8"))
+        for line in log[:end].splitlines():
+            match = UPDATE_TIP_RE.search(line)
+            if match:
+                self.height = int(match.group(1))
+                continue
+            match = CONNECT_BLOCK_RE.search(line)
+            if match and self.height is not None:
+                self.times[self.height] = float(match.group(1))
+        return self.times
+
+
+def get_block_stats(node, heights, stats=("height", "txs", "total_size")):
+    """Returns getblockstats of the given heights fetched in one batch"""
+    return batch_rpc(
+        node,
+        [("getblockstats", h, list(stats)) for h in heights],
+        independent=True,
+    )
+
+
+def summarize(values):
+    """Returns count, total, min, max, mean, median and p90 of a list of numbers"""
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "total": sum(values),
+        "min": values[0],
+        "max": values[-1],
+        "mean": sum(values) / len(values),
+        "median": values[len(values) // 2],
+        "p90": values[min(len(values) - 1, int(len(values) * 0.9))],
+    }
+
+
+class Stopwatch:
+    """Context manager measuring wall clock time in milliseconds"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.ms = None
+        return self
+
+    def __exit__(self, *args):
+        self.ms = (time.perf_counter() - self.start) * 1000
+
+
+def write_results(test, name, results):
+    """Writes benchmark results as JSON to the test tmpdir and returns the path"""
+    path = os.path.join(test.options.tmpdir, "{}.json".format(name))
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(results, f, indent=2, sort_keys=True, default=str)
+    test.log.info("Benchmark results written to {}".format(path))
+    return path
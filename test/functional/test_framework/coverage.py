@@ -5,13 +5,50 @@
 """Utilities for doing coverage analysis on the RPC interface.
 
 Provides a way to track which RPC commands are exercised during
-testing.
+testing. Calls are counted in memory per coverage file and written
+once at process exit as "<command> <count>" lines.
 """
 
+import atexit
 import os
+from collections import Counter
 
 REFERENCE_FILENAME = "rpc_interface.txt"
 
+# Call counts of every coverage file of this process, by file name
+_call_counts = {}
+
+
+def get_call_counts(coverage_logfile):
+    """Returns the call counter of a coverage file, which is written at exit"""
+    counts = _call_counts.get(coverage_logfile)
+    if counts is None:
+        if not _call_counts:
+            atexit.register(flush)
+        counts = _call_counts[coverage_logfile] = Counter()
+    return counts
+
+
+def flush():
+    """Writes the call counts of this process to their coverage files"""
+    for filename, counts in _call_counts.items():
+        if not counts:
+            continue
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf8") as f:
+            f.writelines("%s %d\n" % item for item in sorted(counts.items()))
+        os.replace(tmp_filename, filename)
+
+
+def read_call_counts(filename):
+    """Returns the call counts of a coverage file"""
+    counts = Counter()
+    with open(filename, "r", encoding="utf8") as f:
+        for line in f:
+            command, _, count = line.rpartition(" ")
+            counts[command] += int(count)
+    return counts
+
 
 class AuthServiceProxyWrapper:
     """
@@ -24,12 +61,15 @@ class AuthServiceProxyWrapper:
         Kwargs:
             auth_service_proxy_instance (AuthServiceProxy): the instance
                 being wrapped.
-            coverage_logfile (str): if specified, write each service_name
-                out to a file when called.
+            coverage_logfile (str): if specified, count each service_name
+                called and write the counts out to this file at exit.
 
         """
         self.auth_service_proxy_instance = auth_service_proxy_instance
         self.coverage_logfile = coverage_logfile
+        self.call_counts = (
+            get_call_counts(coverage_logfile) if coverage_logfile else None
+        )
 
     def __getattr__(self, name):
         return_val = getattr(self.auth_service_proxy_instance, name)
@@ -40,8 +80,8 @@ class AuthServiceProxyWrapper:
 
     def __call__(self, *args, **kwargs):
         """
-        Delegates to AuthServiceProxy, then writes the particular RPC method
-        called to a file.
+        Delegates to AuthServiceProxy, then counts the particular RPC method
+        called.
 
         """
         return_val = self.auth_service_proxy_instance.__call__(*args, **kwargs)
@@ -49,11 +89,8 @@ class AuthServiceProxyWrapper:
         return return_val
 
     def _log_call(self):
-        rpc_method = self.auth_service_proxy_instance._service_name
-
-        if self.coverage_logfile:
-            with open(self.coverage_logfile, "a+", encoding="utf8") as f:
-                f.write("%s\n" % rpc_method)
+        if self.call_counts is not None:
+            self.call_counts[self.auth_service_proxy_instance._service_name] += 1
 
     def __truediv__(self, relative_uri):
         return AuthServiceProxyWrapper(
@@ -69,7 +106,7 @@ def get_filename(dirname, n_node):
     """
     Get a filename unique to the test process ID and node.
 
-    This file will contain a list of RPC commands covered.
+    This file will contain the RPC commands covered with their call counts.
     """
     pid = str(os.getpid())
     return os.path.join(dirname, "coverage.pid%s.node%s.txt" % (pid, str(n_node)))
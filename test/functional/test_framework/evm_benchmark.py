@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""EVM block throughput benchmark harness.
+
+Fills blocks with a configurable mix of native transfers, SimpleStorage, Loop
+and Events contract calls, DST20 transfers and transferdomain bridges, and
+records txs per block, gas per second, block connect time and mempool
+acceptance latency of every block."""
+
+import random
+
+from .benchmark_util import BlockConnectTimes, Stopwatch, summarize
+from .evm_contract import EVMContract
+from .evm_tx_util import EvmTxPipeline, MAX_TXS_PER_SENDER
+from .transferdomain_util import DVM, EVM, dst20_address, transfer_domain_entry
+from .util import batch_rpc
+
+WORKLOADS = ("transfer", "storage", "loop", "events", "dst20")
+DEFAULT_MIX = "transfer=4,storage=2,loop=1,events=2,dst20=1"
+GAS_PRICE = 10_000_000_000
+# Gas limit of each workload. Limits count against the block gas limit when
+# transactions are selected into a block, so they are kept close to usage.
+GAS_LIMITS = {
+    "transfer": 21_000,
+    "storage": 60_000,
+    "loop": 60_000,
+    "events": 80_000,
+    "dst20": 100_000,
+}
+# DEFAULT_EVM_BLOCK_GAS_LIMIT in ffi/ffiexports.h
+BLOCK_GAS_LIMIT = 30_000_000
+
+# transfer(address,uint256) of the DST20 token contracts
+ERC20_TRANSFER_ABI = [
+    {
+        "inputs": [
+            {"name": "to", "type": "address"},
+            {"name": "amount", "type": "uint256"},
+        ],
+        "name": "transfer",
+        "outputs": [{"name": "", "type": "bool"}],
+        "stateMutability": "nonpayable",
+        "type": "function",
+    }
+]
+
+
+def parse_mix(mix):
+    """Parses "transfer=4,storage=1" into {"transfer": 4, "storage": 1}"""
+    weights = {}
+    for entry in mix.split(","):
+        name, weight = entry.split("=")
+        assert name in WORKLOADS, "Unknown workload {}".format(name)
+        weights[name] = int(weight)
+    return weights
+
+
+class EvmThroughputBenchmark:
+    """Runs throughput benchmark blocks on one node.
+
+    `owner` is a DVM address with DFI (and the DST20 token, if used) in its
+    account, which funds the senders through transferdomain. Sender key pairs
+    are limited to MAX_TXS_PER_SENDER transactions per block by the mempool,
+    so blocks of n transactions need at least n / MAX_TXS_PER_SENDER senders."""
+
+    def __init__(self, node, owner, senders, seed=0, loop_iterations=10):
+        self.node = node
+        self.w3 = node.w3
+        self.owner = owner
+        self.senders = senders
+        self.rng = random.Random(seed)
+        self.loop_iterations = loop_iterations
+        self.pipeline = EvmTxPipeline(node)
+        self.contracts = {}
+        self.dst20 = None
+
+    def transfer_domain_call(self, address, amount):
+        return (
+            "transferdomain",
+            [transfer_domain_entry(self.owner, address, amount, DVM, EVM)],
+        )
+
+    def fund_senders(self, amounts):
+        """Bridges the given amounts, e.g. ["10@DFI"], to every sender. The
+        owner authorizes each bridge, so at most 20 are sent per block to stay
+        below the mempool ancestor limit."""
+        calls = [
+            self.transfer_domain_call(sender.address, amount)
+            for sender in self.senders
+            for amount in amounts
+        ]
+        for start in range(0, len(calls), 20):
+            batch_rpc(self.node, calls[start : start + 20])
+            self.node.generate(1)
+
+    def deploy_contracts(self):
+        """Deploys the SimpleStorage, Loop and Events contracts"""
+        deployer = self.senders[0]
+        sources = {
+            "storage": ("SimpleStorage.sol", "Test"),
+            "loop": ("Loop.sol", "Loop"),
+            "events": ("Events.sol", "TestEvents"),
+        }
+        abis = {}
+        txs = []
+        for name, (file_name, contract_name) in sources.items():
+            abi, bytecode, _ = EVMContract.from_file(file_name, contract_name).compile()
+            abis[name] = abi
+            tx = {"data": "0x" + bytecode, "gas": 1_000_000, "gasPrice": GAS_PRICE}
+            txs.append((deployer, tx))
+        hashes = self.pipeline.send(txs)
+        self.node.generate(1)
+
+        receipts = batch_rpc(
+            self.node, [("eth_getTransactionReceipt", h) for h in hashes]
+        )
+        for name, receipt in zip(sources, receipts):
+            self.contracts[name] = self.w3.eth.contract(
+                address=self.w3.to_checksum_address(receipt["contractAddress"]),
+                abi=abis[name],
+            )
+
+    def set_dst20_token(self, token_id):
+        self.dst20 = self.w3.eth.contract(
+            address=self.w3.to_checksum_address(dst20_address(token_id)),
+            abi=ERC20_TRANSFER_ABI,
+        )
+
+    def build_tx(self, workload):
+        to = self.rng.choice(self.senders).address
+        if workload == "transfer":
+            return {
+                "to": to,
+                "value": 1,
+                "gas": GAS_LIMITS[workload],
+                "gasPrice": GAS_PRICE,
+            }
+        if workload == "storage":
+            contract = self.contracts["storage"]
+            data = contract.encodeABI("store", [self.rng.randrange(2**32)])
+        elif workload == "loop":
+            contract = self.contracts["loop"]
+            data = contract.encodeABI("loop", [self.loop_iterations])
+        elif workload == "events":
+            contract = self.contracts["events"]
+            data = contract.encodeABI("store", [self.rng.randrange(2**32)])
+        else:
+            contract = self.dst20
+            data = contract.encodeABI("transfer", [to, 1])
+        return {
+            "to": contract.address,
+            "data": data,
+            "gas": GAS_LIMITS[workload],
+            "gasPrice": GAS_PRICE,
+        }
+
+    def build_block(self, mix, count):
+        """Returns (key_pair, tx) pairs of one block, spreading transactions
+        over the senders round robin"""
+        assert count <= len(self.senders) * MAX_TXS_PER_SENDER
+        workloads = self.rng.choices(list(mix), weights=list(mix.values()), k=count)
+        gas = sum(GAS_LIMITS[workload] for workload in workloads)
+        assert gas <= BLOCK_GAS_LIMIT, "Block gas limit exceeded by {} txs".format(
+            count
+        )
+        return [
+            (self.senders[i % len(self.senders)], self.build_tx(workload))
+            for i, workload in enumerate(workloads)
+        ]
+
+    def run_block(self, mix, count, bridges=0):
+        """Signs, sends and mines one block. Returns its metrics."""
+        key_pair_txs = self.build_block(mix, count)
+        connect_times = BlockConnectTimes(self.node)
+
+        with Stopwatch() as sign:
+            raw_txs = self.pipeline.sign(key_pair_txs)
+        with Stopwatch() as accept:
+            results = self.pipeline.send_raw(raw_txs, raise_errors=False)
+        rejected = [r for r in results if not isinstance(r, str)]
+        if rejected:
+            for key_pair, _ in key_pair_txs:
+                key_pair.nonces.reset()
+
+        if bridges:
+            batch_rpc(
+                self.node,
+                [
+                    self.transfer_domain_call(
+                        self.rng.choice(self.senders).address, "0.001@DFI"
+                    )
+                    for _ in range(bridges)
+                ],
+            )
+
+        self.node.generate(1)
+        height = self.node.getblockcount()
+        block = self.node.eth_getBlockByNumber(hex(height), False)
+        connect_ms = connect_times.read().get(height)
+        gas_used = int(block["gasUsed"], 16)
+        # Bridges show up in the EVM block as system transactions
+        sent = {r for r in results if isinstance(r, str)}
+        evm_txs = sum(1 for tx_hash in block["transactions"] if tx_hash in sent)
+        return {
+            "height": height,
+            "sent": len(raw_txs),
+            "rejected": len(rejected),
+            "evm_txs": evm_txs,
+            "bridges": len(block["transactions"]) - evm_txs,
+            "gas_used": gas_used,
+            "connect_ms": connect_ms,
+            "gas_per_s": gas_used * 1000 / connect_ms if connect_ms else None,
+            "sign_ms": sign.ms,
+            "accept_ms": accept.ms,
+            "accept_ms_per_tx": accept.ms / len(raw_txs) if raw_txs else None,
+        }
+
+    def run(self, mix, blocks, count, bridges=0):
+        """Runs `blocks` benchmark blocks of `count` transactions each and
+        returns per block metrics with their summaries"""
+        results = [self.run_block(mix, count, bridges) for _ in range(blocks)]
+        summary = {
+            key: summarize([r[key] for r in results if r[key] is not None])
+            for key in (
+                "evm_txs",
+                "gas_used",
+                "connect_ms",
+                "gas_per_s",
+                "accept_ms_per_tx",
+            )
+        }
+        return {"blocks": results, "summary": summary}
@@ -1,11 +1,85 @@
+import copy
+import glob
+import hashlib
+import json
 import os
+import tempfile
+from collections import OrderedDict
 from typing import List, Dict
 
 from solcx import compile_standard
 
+OUTPUT_SELECTION = {"*": {"*": ["abi", "evm.bytecode", "evm.deployedBytecode"]}}
+
+
+class CompileCache:
+    """Content addressed cache of solc standard JSON output.
+
+    Entries are keyed by the hash of the compiler input and version, and kept
+    in an in-process LRU in front of one JSON file per entry on disk. Files are
+    written to a temporary file and renamed into place, so concurrent test
+    processes never see partial entries and may safely race on the same key.
+
+    The cache directory is taken from the SOLC_CACHE_DIR environment variable,
+    which the test framework sets to the solc directory of --cachedir."""
+
+    def __init__(self, cache_dir: str = None, max_entries: int = 64):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get_cache_dir(self) -> str:
+        if self.cache_dir is None:
+            return os.getenv(
+                "SOLC_CACHE_DIR",
+                os.path.join(
+                    os.path.dirname(os.path.realpath(__file__)), "../../cache/solc"
+                ),
+            )
+        return self.cache_dir
+
+    @staticmethod
+    def key(standard_input: Dict, compiler_version: str) -> str:
+        data = json.dumps(
+            {"input": standard_input, "version": compiler_version}, sort_keys=True
+        )
+        return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+    def compile(self, standard_input: Dict, compiler_version: str) -> Dict:
+        key = self.key(standard_input, compiler_version)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        path = os.path.join(self.get_cache_dir(), key[:2], key + ".json")
+        try:
+            with open(path, "r", encoding="utf8") as file:
+                output = json.load(file)
+        except (OSError, ValueError):
+            output = compile_standard(standard_input, solc_version=compiler_version)
+            self._write(path, output)
+
+        self.entries[key] = output
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return output
+
+    @staticmethod
+    def _write(path: str, output: Dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf8") as file:
+                json.dump(output, file)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
 
 class EVMContract:
     path_prefix = "../contracts"
+    compile_cache = CompileCache()
 
     def __init__(
         self,
@@ -34,21 +108,40 @@ class EVMContract:
     def from_str(sourceCode: str, contract_name: str):
         return EVMContract(sourceCode, f"{contract_name}.sol", contract_name)
 
-    def compile(self) -> (List[Dict], str):
-        compiled_sol = compile_standard(
+    @staticmethod
+    def prewarm_cache() -> List[str]:
+        """Compiles all contracts of the contracts directory into the compile
+        cache and returns the file names that failed to compile."""
+        failed = []
+        for path in sorted(
+            glob.glob(f"{os.path.dirname(__file__)}/{EVMContract.path_prefix}/*.sol")
+        ):
+            file_name = os.path.basename(path)
+            with open(path, "r", encoding="utf8") as file:
+                contract = EVMContract(file.read(), file_name, None)
+            try:
+                contract.compile_sources()
+            except Exception:
+                failed.append(file_name)
+        return failed
+
+    def compile_sources(self) -> Dict:
+        return EVMContract.compile_cache.compile(
             {
                 "language": "Solidity",
                 "sources": {self.file_name: {"content": self.code}},
-                "settings": {
-                    "outputSelection": {
-                        "*": {"*": ["abi", "evm.bytecode", "evm.deployedBytecode"]}
-                    }
-                },
+                "settings": {"outputSelection": OUTPUT_SELECTION},
             },
-            solc_version=self.compiler_version,
+            self.compiler_version,
         )
 
-        data = compiled_sol["contracts"][self.file_name][self.contract_name]
+    def compile(self) -> (List[Dict], str):
+        compiled_sol = self.compile_sources()
+
+        # Copy so that callers can't modify cached output
+        data = copy.deepcopy(
+            compiled_sol["contracts"][self.file_name][self.contract_name]
+        )
         abi = data["abi"]
         bytecode = data["evm"]["bytecode"]["object"]
         deployedBytecode = data["evm"]["deployedBytecode"]["object"]
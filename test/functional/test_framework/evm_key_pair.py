@@ -1,9 +1,56 @@
+import hashlib
+import json
+import os
+import tempfile
+
 from eth_account import Account
 
+from .util import batch_rpc
+
+
+class NonceManager:
+    """Tracks the next nonce of an address locally.
+
+    The node reports the nonce of the latest block only, so transactions still
+    in the mempool are counted here. When the chain is behind the local nonce
+    and the transaction of the chain's nonce is not pending either, the
+    transactions were dropped, e.g. by a rollback, and the nonce is resynced
+    from the node. Call reset() when sent transactions were rejected."""
+
+    def __init__(self, address: str):
+        self.address = address
+        self.next_nonce = None
+
+    def reset(self):
+        self.next_nonce = None
+
+    def reserve(self, node, count: int = 1):
+        """Returns the next `count` nonces and marks them as used"""
+        chain_nonce = int(node.eth_getTransactionCount(self.address), 16)
+        if self.next_nonce is None or (
+            chain_nonce < self.next_nonce
+            and chain_nonce not in self.pending_nonces(node)
+        ):
+            self.next_nonce = chain_nonce
+        nonces = list(range(self.next_nonce, self.next_nonce + count))
+        self.next_nonce += count
+        return nonces
+
+    def pending_nonces(self, node):
+        """Returns the nonces of the address's transactions in the mempool"""
+        return {
+            int(tx["nonce"], 16)
+            for tx in node.eth_pendingTransactions()
+            if tx["from"].lower() == self.address.lower()
+        }
+
 
 class EvmKeyPair:
-    def __init__(self, privkey: str = None, address: str = None):
-        self.privkey, self.address = EvmKeyPair.validate_key(privkey, address)
+    def __init__(self, privkey: str = None, address: str = None, validate: bool = True):
+        if validate:
+            privkey, address = EvmKeyPair.validate_key(privkey, address)
+        self.privkey, self.address = privkey, address
+        self.nonces = NonceManager(self.address)
 
     @staticmethod
     def from_node(node):
@@ -27,3 +74,87 @@ class EvmKeyPair:
             )
         else:
             return privkey, address
+
+
+class EvmKeyPool:
+    """Deterministic EVM key pairs derived from a seed.
+
+    Deriving addresses is slow, so keys of each seed are stored in the key
+    pool directory and only derived once. The directory is taken from the
+    EVM_KEY_POOL_DIR environment variable, which the test framework sets to
+    the evm_keys directory of --cachedir. take() hands out unused key pairs,
+    which import_keys() adds to a node wallet in one batch without rescan."""
+
+    def __init__(self, seed: int = 0, cache_dir: str = None):
+        self.seed = seed
+        self.cache_dir = cache_dir
+        self.keys = []
+        self.used = 0
+
+    def get_cache_dir(self) -> str:
+        if self.cache_dir is None:
+            return os.getenv(
+                "EVM_KEY_POOL_DIR",
+                os.path.join(
+                    os.path.dirname(os.path.realpath(__file__)), "../../cache/evm_keys"
+                ),
+            )
+        return self.cache_dir
+
+    def privkey(self, index: int) -> str:
+        data = "{}:{}".format(self.seed, index).encode("utf8")
+        return hashlib.sha256(data).hexdigest()
+
+    def load(self, count: int):
+        """Makes sure the first `count` keys of the seed are available"""
+        if len(self.keys) >= count:
+            return
+        path = os.path.join(self.get_cache_dir(), "{}.json".format(self.seed))
+        try:
+            with open(path, "r", encoding="utf8") as file:
+                keys = json.load(file)
+        except (OSError, ValueError):
+            keys = []
+        if len(keys) < count:
+            keys += [
+                [privkey, Account.from_key(privkey).address]
+                for privkey in map(self.privkey, range(len(keys), count))
+            ]
+            self._write(path, keys)
+        self.keys = keys
+
+    @staticmethod
+    def _write(path: str, keys):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf8") as file:
+                json.dump(keys, file)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def take(self, count: int):
+        """Returns `count` key pairs not handed out by this pool before"""
+        self.load(self.used + count)
+        keys = self.keys[self.used : self.used + count]
+        self.used += count
+        return [
+            EvmKeyPair(privkey, address, validate=False) for privkey, address in keys
+        ]
+
+    @staticmethod
+    def import_keys(node, key_pairs):
+        """Imports key pairs into the node wallet in one batch, skipping the
+        rescan as the keys are fresh"""
+        batch_rpc(
+            node,
+            [("importprivkey", key_pair.privkey, "", False) for key_pair in key_pairs],
+        )
+
+    def take_imported(self, node, count: int):
+        """Returns `count` unused key pairs imported into the node wallet"""
+        key_pairs = self.take(count)
+        self.import_keys(node, key_pairs)
+        return key_pairs
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Streaming EVM log indexer for functional testing.
+
+EvmLogIndexer follows the chain with eth_getLogs over the blocks connected
+since its last sync, decodes logs of registered ABI events once and keeps
+them indexed by address, topic and block number, so assertions on emitted
+events are dictionary lookups instead of log queries and ABI decoding."""
+
+from collections import defaultdict
+
+from eth_abi import decode
+from eth_utils import keccak
+
+from .util import batch_rpc
+
+
+def canonical_type(abi_input):
+    """Returns the canonical type of an ABI input, expanding tuples"""
+    abi_type = abi_input["type"]
+    if abi_type.startswith("tuple"):
+        components = ",".join(canonical_type(c) for c in abi_input["components"])
+        return "({}){}".format(components, abi_type[len("tuple") :])
+    return abi_type
+
+
+def is_dynamic_type(abi_type):
+    return abi_type in ("string", "bytes") or abi_type.endswith("]") or "(" in abi_type
+
+
+class EventSignature:
+    """Decoder of one ABI event. Indexed arguments of dynamic types are only
+    stored as their topic hash and are returned as such."""
+
+    def __init__(self, event_abi):
+        self.name = event_abi["name"]
+        self.inputs = event_abi["inputs"]
+        self.types = [canonical_type(i) for i in self.inputs]
+        self.signature = "{}({})".format(self.name, ",".join(self.types))
+        self.topic = "0x" + keccak(text=self.signature).hex()
+        self.data_types = [
+            abi_type
+            for abi_input, abi_type in zip(self.inputs, self.types)
+            if not abi_input["indexed"]
+        ]
+
+    def decode(self, topics, data):
+        data_values = iter(decode(self.data_types, bytes.fromhex(data[2:])))
+        indexed_topics = iter(topics[1:])
+        args = {}
+        for abi_input, abi_type in zip(self.inputs, self.types):
+            if not abi_input["indexed"]:
+                args[abi_input["name"]] = next(data_values)
+            elif is_dynamic_type(abi_type):
+                args[abi_input["name"]] = next(indexed_topics)
+            else:
+                topic = bytes.fromhex(next(indexed_topics)[2:])
+                args[abi_input["name"]] = decode([abi_type], topic)[0]
+        return args
+
+
+class IndexedLog:
+    __slots__ = (
+        "address",
+        "topics",
+        "data",
+        "block_number",
+        "block_hash",
+        "transaction_hash",
+        "log_index",
+        "event",
+        "args",
+    )
+
+    def __init__(self, log, event=None):
+        self.address = log["address"].lower()
+        self.topics = log["topics"]
+        self.data = log["data"]
+        self.block_number = int(log["blockNumber"], 16)
+        self.block_hash = log["blockHash"]
+        self.transaction_hash = log["transactionHash"]
+        self.log_index = int(log["logIndex"], 16)
+        self.event = event.name if event else None
+        self.args = event.decode(self.topics, self.data) if event else None
+
+    def __repr__(self):
+        return "IndexedLog({} {} block={} index={} args={})".format(
+            self.address, self.event, self.block_number, self.log_index, self.args
+        )
+
+
+class EvmLogIndexer:
+    """Indexes the logs of one node from `from_block` on.
+
+    sync() fetches the logs of blocks connected since the previous sync, in
+    eth_getLogs ranges of at most `max_range` blocks. A changed hash of an
+    indexed block, e.g. after rollback_to, drops the logs from that block on
+    before indexing the new ones."""
+
+    # Decoders of every ABI event seen, by signature topic
+    signatures = {}
+
+    def __init__(self, node, from_block=0, max_range=1000):
+        self.node = node
+        self.from_block = from_block
+        self.max_range = max_range
+        self.events = {}
+        self.height = from_block - 1
+        self.block_hashes = {}
+        self.clear()
+
+    def clear(self):
+        self.logs = []
+        self.by_address = defaultdict(list)
+        self.by_topic = defaultdict(list)
+        self.by_block = defaultdict(list)
+
+    def add_abi(self, abi):
+        """Registers the events of a contract ABI for decoding. Logs indexed
+        before registration stay undecoded."""
+        for entry in abi:
+            if entry["type"] != "event" or entry.get("anonymous"):
+                continue
+            event = EventSignature(entry)
+            event = EvmLogIndexer.signatures.setdefault(event.topic, event)
+            self.events[event.topic] = event
+
+    def sync(self):
+        """Indexes the logs of new blocks and returns them"""
+        tip = int(self.node.eth_blockNumber(), 16)
+        self._drop_disconnected(tip)
+        new_logs = []
+        while self.height < tip:
+            end = min(self.height + self.max_range, tip)
+            logs, block = batch_rpc(
+                self.node,
+                [
+                    (
+                        "eth_getLogs",
+                        {"fromBlock": hex(self.height + 1), "toBlock": hex(end)},
+                    ),
+                    ("eth_getBlockByNumber", hex(end), False),
+                ],
+            )
+            new_logs.extend(self._add(log) for log in logs)
+            self.block_hashes[end] = block["hash"]
+            self.height = end
+        return new_logs
+
+    def _add(self, log):
+        topic = log["topics"][0] if log["topics"] else None
+        indexed = IndexedLog(log, self.events.get(topic))
+        self.block_hashes[indexed.block_number] = indexed.block_hash
+        self._index(indexed)
+        return indexed
+
+    def _index(self, log):
+        self.logs.append(log)
+        self.by_address[log.address].append(log)
+        if log.topics:
+            self.by_topic[log.topics[0]].append(log)
+        self.by_block[log.block_number].append(log)
+
+    def _drop_disconnected(self, tip):
+        """Drops the logs of indexed blocks no longer in the active chain.
+        Blocks are only compared one by one if the last indexed block changed."""
+        if self.height < self.from_block:
+            return
+        if self.height <= tip:
+            block = self.node.eth_getBlockByNumber(hex(self.height), False)
+            if block["hash"] == self.block_hashes[self.height]:
+                return
+
+        heights = sorted(h for h in self.block_hashes if h <= tip)
+        blocks = batch_rpc(
+            self.node, [("eth_getBlockByNumber", hex(h), False) for h in heights]
+        )
+        fork = tip + 1
+        for height, block in zip(heights, blocks):
+            if block["hash"] != self.block_hashes[height]:
+                fork = height
+                break
+
+        logs = [log for log in self.logs if log.block_number < fork]
+        self.block_hashes = {
+            h: block_hash for h, block_hash in self.block_hashes.items() if h < fork
+        }
+        self.height = fork - 1
+        self.clear()
+        for log in logs:
+            self._index(log)
+
+    def get_logs(self, address=None, event=None, topic=None, block=None):
+        """Returns indexed logs matching all given filters in chain order.
+        `event` is the name of a registered event, `topic` a signature topic."""
+        if event is not None:
+            topics = [t for t, e in self.events.items() if e.name == event]
+            assert len(topics) == 1, "Unknown or ambiguous event {}".format(event)
+            topic = topics[0]
+        candidates = [self.logs]
+        if address is not None:
+            candidates.append(self.by_address.get(address.lower(), []))
+        if topic is not None:
+            candidates.append(self.by_topic.get(topic, []))
+        if block is not None:
+            candidates.append(self.by_block.get(block, []))
+        logs = min(candidates, key=len)
+        return [
+            log
+            for log in logs
+            if (address is None or log.address == address.lower())
+            and (topic is None or (log.topics and log.topics[0] == topic))
+            and (block is None or log.block_number == block)
+        ]
+
+    def get_events(self, event, address=None, block=None):
+        """Returns the decoded arguments of matching logs of `event`"""
+        return [log.args for log in self.get_logs(address, event, block=block)]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Thin EVM JSON-RPC client for functional testing.
+
+EvmRpcClient sends calls through the node's AuthServiceProxy EVM connection,
+so it shares its persistent HTTP connection and RPC coverage logging and
+avoids the web3 provider and middleware stack. Quantities are returned as
+ints, everything else as returned by the node. Tests that need contract ABIs
+use TestNode.w3, which loads web3 on first use."""
+
+import time
+
+from .authproxy import JSONRPCException
+
+
+def to_hex(value):
+    """Encodes ints as hex quantities and passes strings through"""
+    return hex(value) if isinstance(value, int) else value
+
+
+def to_block(block):
+    """Encodes a block number or passes tags like "latest" through"""
+    return to_hex(block)
+
+
+class EvmRpcClient:
+    def __init__(self, rpc):
+        self.rpc = rpc
+        self._chain_id = None
+
+    def __getattr__(self, name):
+        """Dispatches any other eth_ calls to the EVM RPC connection"""
+        return getattr(self.rpc, name)
+
+    @property
+    def chain_id(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = int(self.rpc.eth_chainId(), 16)
+        return self._chain_id
+
+    def block_number(self) -> int:
+        return int(self.rpc.eth_blockNumber(), 16)
+
+    def get_balance(self, address, block="latest") -> int:
+        return int(self.rpc.eth_getBalance(address, to_block(block)), 16)
+
+    def get_transaction_count(self, address, block="latest") -> int:
+        return int(self.rpc.eth_getTransactionCount(address, to_block(block)), 16)
+
+    def get_code(self, address, block="latest") -> str:
+        return self.rpc.eth_getCode(address, to_block(block))
+
+    def get_storage_at(self, address, slot, block="latest") -> str:
+        return self.rpc.eth_getStorageAt(address, to_hex(slot), to_block(block))
+
+    def get_block(self, block="latest", full_transactions=False) -> dict:
+        if isinstance(block, str) and len(block) == 66:
+            return self.rpc.eth_getBlockByHash(block, full_transactions)
+        return self.rpc.eth_getBlockByNumber(to_block(block), full_transactions)
+
+    def call(self, tx, block="latest") -> str:
+        """Executes a call without creating a transaction. Int fields of `tx`,
+        e.g. value or gas, are hex encoded."""
+        tx = {key: to_hex(value) for key, value in tx.items()}
+        return self.rpc.eth_call(tx, to_block(block))
+
+    def estimate_gas(self, tx) -> int:
+        tx = {key: to_hex(value) for key, value in tx.items()}
+        return int(self.rpc.eth_estimateGas(tx), 16)
+
+    def send_raw_transaction(self, raw_tx) -> str:
+        if isinstance(raw_tx, bytes):
+            raw_tx = "0x" + raw_tx.hex()
+        return self.rpc.eth_sendRawTransaction(raw_tx)
+
+    def get_transaction(self, tx_hash) -> dict:
+        return self.rpc.eth_getTransactionByHash(tx_hash)
+
+    def get_transaction_receipt(self, tx_hash) -> dict:
+        return self.rpc.eth_getTransactionReceipt(tx_hash)
+
+    def wait_for_transaction_receipt(self, tx_hash, timeout=60, poll_interval=0.05):
+        """Polls for the receipt of a transaction. The caller is expected to
+        mine the transaction, e.g. from another thread."""
+        time_end = time.time() + timeout
+        while True:
+            try:
+                receipt = self.rpc.eth_getTransactionReceipt(tx_hash)
+            except JSONRPCException:
+                receipt = None
+            if receipt is not None:
+                return receipt
+            if time.time() > time_end:
+                raise AssertionError(
+                    "No receipt of {} within {}s".format(tx_hash, timeout)
+                )
+            time.sleep(poll_interval)
+
+    def get_logs(
+        self, from_block=None, to_block=None, address=None, topics=None, block_hash=None
+    ) -> list:
+        """Returns logs matching the filter. Omitted fields are left to the
+        node defaults."""
+        log_filter = {}
+        if block_hash is not None:
+            log_filter["blockHash"] = block_hash
+        if from_block is not None:
+            log_filter["fromBlock"] = to_hex(from_block)
+        if to_block is not None:
+            log_filter["toBlock"] = to_hex(to_block)
+        if address is not None:
+            log_filter["address"] = address
+        if topics is not None:
+            log_filter["topics"] = topics
+        return self.rpc.eth_getLogs(log_filter)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""EVM state diffs for functional testing.
+
+EvmStateDiff snapshots the balance, nonce, code hash and selected storage
+slots of watched accounts in one batched request, and compares snapshots
+into a compact diff of the values that changed."""
+
+from contextlib import contextmanager
+
+from eth_utils import keccak
+
+from .util import batch_rpc
+
+FIELDS = ("balance", "nonce", "code_hash")
+
+
+def to_slot(slot):
+    return hex(slot) if isinstance(slot, int) else slot
+
+
+class EvmStateDiff:
+    """Watches accounts of one node.
+
+    Snapshots are {address: {"balance": int, "nonce": int, "code_hash": str,
+    "storage": {slot: int}}}. Diffs only contain changed values as (before,
+    after) pairs, e.g. {address: {"nonce": (1, 2), "storage": {0: (0, 10)}}},
+    and no entry for unchanged accounts."""
+
+    def __init__(self, node):
+        self.node = node
+        self.accounts = {}
+
+    def watch(self, address, slots=()):
+        """Adds an account and storage slots to the snapshots. Slots are ints
+        or 32 byte hex strings and are keyed as given."""
+        watched = self.accounts.setdefault(address, [])
+        for slot in slots:
+            if slot not in watched:
+                watched.append(slot)
+
+    def snapshot(self, block="latest"):
+        """Returns the state of the watched accounts at a block number or tag"""
+        block = hex(block) if isinstance(block, int) else block
+        calls = []
+        for address, slots in self.accounts.items():
+            calls.append(("eth_getBalance", address, block))
+            calls.append(("eth_getTransactionCount", address, block))
+            calls.append(("eth_getCode", address, block))
+            calls.extend(
+                ("eth_getStorageAt", address, to_slot(slot), block) for slot in slots
+            )
+        results = iter(batch_rpc(self.node, calls))
+
+        state = {}
+        for address, slots in self.accounts.items():
+            balance, nonce, code = next(results), next(results), next(results)
+            state[address] = {
+                "balance": int(balance, 16),
+                "nonce": int(nonce, 16),
+                "code_hash": "0x" + keccak(hexstr=code).hex(),
+                "storage": {slot: int(next(results), 16) for slot in slots},
+            }
+        return state
+
+    @staticmethod
+    def diff(before, after):
+        """Returns the changed values between two snapshots"""
+        changes = {}
+        for address, new in after.items():
+            old = before.get(address, {"storage": {}})
+            account = {
+                field: (old.get(field), new[field])
+                for field in FIELDS
+                if old.get(field) != new[field]
+            }
+            storage = {
+                slot: (old["storage"].get(slot), value)
+                for slot, value in new["storage"].items()
+                if old["storage"].get(slot) != value
+            }
+            if storage:
+                account["storage"] = storage
+            if account:
+                changes[address] = account
+        return changes
+
+    @contextmanager
+    def capture(self):
+        """Yields a dict that is filled with the diff of the state before and
+        after the with block, e.g. around sending a transaction and mining it"""
+        changes = {}
+        before = self.snapshot()
+        yield changes
+        changes.update(self.diff(before, self.snapshot()))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Pre-signed EVM transaction pipeline for functional testing.
+
+Transactions get their nonces from the local nonce manager of each key pair,
+are signed in a pool of worker processes and sent to the node in one batched
+eth_sendRawTransaction request."""
+
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from eth_account import Account
+
+from .authproxy import JSONRPCException
+from .util import batch_rpc
+
+# Below this many transactions signing in process beats worker startup
+MIN_PARALLEL_SIGN = 64
+# Mempool limit of EVM transactions per sender, MEMPOOL_MAX_ETH_TXS in validation.h
+MAX_TXS_PER_SENDER = 64
+
+
+def sign_transaction(tx, privkey):
+    return Account.sign_transaction(tx, privkey).rawTransaction.hex()
+
+
+def _sign_chunk(items):
+    return [sign_transaction(tx, privkey) for tx, privkey in items]
+
+
+def sign_transactions(items, workers=None):
+    """Signs (tx, privkey) pairs and returns the raw transactions in order.
+
+    Large batches are split in chunks signed by a process pool, as signing
+    is CPU bound pure Python code."""
+    if len(items) < MIN_PARALLEL_SIGN or workers == 1:
+        return _sign_chunk(items)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        size = -(-len(items) // workers)
+        chunks = [items[i : i + size] for i in range(0, len(items), size)]
+        return [raw for chunk in executor.map(_sign_chunk, chunks) for raw in chunk]
+
+
+class EvmTxPipeline:
+    """Builds, signs and sends EVM transactions of many key pairs.
+
+    Transactions are dicts as accepted by eth_account without a nonce, e.g.
+    {"to": address, "value": 1, "gas": 21000, "gasPrice": 10_000_000_000} or
+    with maxFeePerGas/maxPriorityFeePerGas for EIP-1559 transactions."""
+
+    def __init__(self, node, workers=None):
+        self.node = node
+        self.workers = workers
+        self.chain_id = None
+
+    def get_chain_id(self):
+        if self.chain_id is None:
+            self.chain_id = int(self.node.eth_chainId(), 16)
+        return self.chain_id
+
+    def build(self, key_pair_txs):
+        """Fills in nonce and chain id of (key_pair, tx) pairs and returns
+        (tx, privkey) pairs ready for signing. Nonces of each key pair are
+        reserved in the order of the transactions."""
+        counts = {}
+        for key_pair, _ in key_pair_txs:
+            counts[key_pair] = counts.get(key_pair, 0) + 1
+        nonces = {
+            key_pair: iter(key_pair.nonces.reserve(self.node, count))
+            for key_pair, count in counts.items()
+        }
+        chain_id = self.get_chain_id()
+        items = []
+        for key_pair, tx in key_pair_txs:
+            tx = dict(tx, nonce=next(nonces[key_pair]))
+            tx.setdefault("chainId", chain_id)
+            items.append((tx, key_pair.privkey))
+        return items
+
+    def sign(self, key_pair_txs):
+        """Returns the raw signed transactions of (key_pair, tx) pairs"""
+        return sign_transactions(self.build(key_pair_txs), self.workers)
+
+    def send_raw(self, raw_txs, raise_errors=True):
+        """Sends raw transactions in one batch and returns their hashes.
+
+        With raise_errors=False rejected transactions return their
+        JSONRPCException in place of a hash."""
+        return batch_rpc(
+            self.node,
+            [("eth_sendRawTransaction", raw_tx) for raw_tx in raw_txs],
+            raise_errors,
+        )
+
+    def send(self, key_pair_txs, raise_errors=True):
+        """Signs and sends (key_pair, tx) pairs. Key pairs with rejected
+        transactions get their nonces resynced on next use."""
+        results = self.send_raw(self.sign(key_pair_txs), raise_errors=False)
+        failed = [
+            (key_pair, result)
+            for (key_pair, _), result in zip(key_pair_txs, results)
+            if isinstance(result, JSONRPCException)
+        ]
+        for key_pair, _ in failed:
+            key_pair.nonces.reset()
+        if failed and raise_errors:
+            raise failed[0][1]
+        return results
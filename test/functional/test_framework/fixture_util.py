@@ -6,9 +6,12 @@
 """Fixture utility functions for containing common fixtures for functional testing. The fixture helper functions will
 by default always use nodes beginning from index 0 onwards."""
 
+import time
+
 from .test_framework import DefiTestFramework
 from .util import (
     assert_equal,
+    batch_rpc,
     get_id_token,
 )
 
@@ -98,3 +101,430 @@ class CommonFixture:
             test.nodes[1].minttokens("2000@" + symbolSILVER)
             test.nodes[1].generate(1)
             test.sync_blocks()
+
+
+class _FixtureStep:
+    """A single node of the fixture dependency graph.
+
+    Transaction steps return the RPC calls to submit from `calls` and receive
+    their results in `done`. Wait steps submit nothing, they only generate
+    blocks until `wait` returns."""
+
+    def __init__(self, key, deps, calls=None, done=None, wait=None):
+        self.key = key
+        self.deps = deps
+        self.calls = calls
+        self.done = done
+        self.wait = wait
+        self.level = None
+
+    @property
+    def is_wait(self):
+        return self.wait is not None
+
+
+class FixtureBuilder:
+    """Builds a DeFi fixture from a declarative spec.
+
+    All fixture transactions are sent from node 0 and authorised by its genesis
+    owner address. The builder orders the steps by their dependencies and sends
+    every independent step in one batched RPC request, so that each dependency
+    level costs a single block. Other nodes are synced once at the end.
+
+    The spec is a dict with the following optional entries:
+    {
+        "utxostoaccount": "10000@DFI",  # Converted to the owner account
+        "tokens": [{"symbol": "BTC", "name": "BTC", "amount": 1000}],
+        "oracles": [{"prices": {"DFI/USD": 10, "BTC/USD": 100}, "weightage": 10}],
+        "loan_schemes": [{"id": "LOAN001", "mincolratio": 150, "interestrate": 5}],
+        "collateral_tokens": [{"token": "DFI", "factor": 1, "fixedIntervalPriceId": "DFI/USD"}],
+        "loan_tokens": [{"symbol": "DUSD", "fixedIntervalPriceId": "DUSD/USD", "interest": 0, "amount": 10000}],
+        "pools": [{"tokenA": "DFI", "tokenB": "BTC", "commission": 0, "amountA": 100, "amountB": 10}],
+        "vaults": [{"loanSchemeId": "LOAN001", "collateral": ["100@DFI"], "loans": ["10@DUSD"]}],
+        "live_prices": True,  # Wait for live prices even if there are no vaults
+    }
+
+    After build() the created ids are available in `token_ids`, `oracle_ids`,
+    `pool_ids` and `vault_ids` (with vault owners in `vault_owners`)."""
+
+    def __init__(self, test: DefiTestFramework, spec, node_index=0):
+        self.test = test
+        self.node = test.nodes[node_index]
+        self.spec = spec
+        self.owner = self.node.get_genesis_keys().ownerAuthAddress
+        self.steps = {}
+        self.token_ids = {"DFI": "0"}
+        self.oracle_ids = [None] * len(spec.get("oracles", []))
+        self.pool_ids = {}
+        self.vault_ids = [None] * len(spec.get("vaults", []))
+        self.vault_owners = [None] * len(spec.get("vaults", []))
+        self.blocks_generated = 0
+
+    def build(self):
+        """Submits the whole fixture and returns the number of blocks it took."""
+        self._add_steps()
+        self._assign_levels()
+        max_level = max((step.level for step in self.steps.values()), default=-1)
+        for level in range(max_level + 1):
+            steps = [step for step in self.steps.values() if step.level == level]
+            for step in steps:
+                if step.is_wait:
+                    step.wait()
+            self._submit([step for step in steps if not step.is_wait])
+        if len(self.test.nodes) > 1:
+            self.test.sync_blocks()
+        return self.blocks_generated
+
+    def token_id(self, symbol):
+        """Returns the id of a token created by this fixture or already on chain."""
+        if symbol not in self.token_ids:
+            for idx, token in self.node.listtokens().items():
+                self.token_ids[token["symbol"]] = str(idx)
+        return self.token_ids[symbol]
+
+    def _generate(self, nblocks):
+        if nblocks > 0:
+            self.node.generate(nblocks)
+            self.blocks_generated += nblocks
+
+    def _submit(self, steps):
+        calls = []
+        ranges = []
+        for step in steps:
+            step_calls = step.calls()
+            ranges.append((step, len(calls), len(calls) + len(step_calls)))
+            calls.extend(step_calls)
+        if not calls:
+            return
+        results = batch_rpc(self.node, calls)
+        self._generate(1)
+        for step, start, end in ranges:
+            if step.done is not None:
+                step.done(results[start:end])
+
+    def _add(self, key, deps, calls=None, done=None, wait=None):
+        self.steps[key] = _FixtureStep(key, deps, calls, done, wait)
+
+    def _assign_levels(self):
+        def level(step):
+            if step.level is None:
+                # Waits run before the batch of their level is submitted, so
+                # steps depending on a wait share its level.
+                step.level = max(
+                    (
+                        level(self.steps[dep]) + (0 if self.steps[dep].is_wait else 1)
+                        for dep in step.deps
+                    ),
+                    default=0,
+                )
+            return step.level
+
+        for step in self.steps.values():
+            assert all(dep in self.steps for dep in step.deps), step.key
+            level(step)
+
+    def _token_deps(self, symbol):
+        """Returns the step that makes the given token exist on chain, if any."""
+        for key in ("token:" + symbol, "loantoken:" + symbol):
+            if key in self.steps:
+                return [key]
+        return []
+
+    def _funding_deps(self, symbol):
+        """Returns the steps that fund the owner account with the given token."""
+        if symbol == "DFI":
+            return ["funding"] if "funding" in self.steps else []
+        return ["mint:" + symbol] if "mint:" + symbol in self.steps else []
+
+    def _collateral_deps(self, symbol):
+        key = "collateral:" + symbol
+        return [key] if key in self.steps else []
+
+    def _price_deps(self, price_id):
+        return [
+            "prices:%d" % i
+            for i, oracle in enumerate(self.spec.get("oracles", []))
+            if price_id in oracle["prices"]
+        ]
+
+    def _add_steps(self):
+        spec = self.spec
+
+        if "utxostoaccount" in spec:
+            self._add(
+                "funding",
+                [],
+                lambda: [("utxostoaccount", {self.owner: spec["utxostoaccount"]})],
+            )
+
+        for token in spec.get("tokens", []):
+            self._add_token(token)
+
+        for i, oracle in enumerate(spec.get("oracles", [])):
+            self._add_oracle(i, oracle)
+
+        for scheme in spec.get("loan_schemes", []):
+            self._add(
+                "scheme:" + scheme["id"],
+                [],
+                lambda scheme=scheme: [
+                    (
+                        "createloanscheme",
+                        scheme["mincolratio"],
+                        scheme["interestrate"],
+                        scheme["id"],
+                    )
+                ],
+            )
+
+        for loan_token in spec.get("loan_tokens", []):
+            self._add_loan_token(loan_token)
+
+        for collateral in spec.get("collateral_tokens", []):
+            self._add_collateral_token(collateral)
+
+        price_steps = [
+            key
+            for key in self.steps
+            if key.startswith("loantoken:") or key.startswith("collateral:")
+        ]
+        if (spec.get("vaults") or spec.get("live_prices")) and price_steps:
+            self._add("live_prices", price_steps, wait=self._wait_for_live_prices)
+
+        for pool in spec.get("pools", []):
+            self._add_pool(pool)
+
+        for i, vault in enumerate(spec.get("vaults", [])):
+            self._add_vault(i, vault)
+
+    def _add_token(self, token):
+        symbol = token["symbol"]
+        self._add(
+            "token:" + symbol,
+            [],
+            lambda: [
+                (
+                    "createtoken",
+                    {
+                        "symbol": symbol,
+                        "name": token.get("name", symbol),
+                        "isDAT": token.get("isDAT", True),
+                        "collateralAddress": self.owner,
+                    },
+                )
+            ],
+        )
+        if token.get("amount"):
+            self._add(
+                "mint:" + symbol,
+                ["token:" + symbol],
+                lambda: [
+                    ("minttokens", "%s@%s" % (token["amount"], self.token_id(symbol)))
+                ],
+            )
+
+    def _add_oracle(self, i, oracle):
+        price_feeds = []
+        for price_id in oracle["prices"]:
+            token, currency = price_id.split("/")
+            price_feeds.append({"currency": currency, "token": token})
+
+        def done(results):
+            self.oracle_ids[i] = results[0]
+
+        self._add(
+            "oracle:%d" % i,
+            [],
+            lambda: [
+                (
+                    "appointoracle",
+                    self.node.getnewaddress("", "legacy"),
+                    price_feeds,
+                    oracle.get("weightage", 10),
+                )
+            ],
+            done,
+        )
+
+        def prices():
+            oracle_prices = []
+            for price_id, price in oracle["prices"].items():
+                token, currency = price_id.split("/")
+                oracle_prices.append(
+                    {"currency": currency, "tokenAmount": "%s@%s" % (price, token)}
+                )
+            return [
+                ("setoracledata", self.oracle_ids[i], int(time.time()), oracle_prices)
+            ]
+
+        self._add("prices:%d" % i, ["oracle:%d" % i], prices)
+
+    def _add_loan_token(self, loan_token):
+        symbol = loan_token["symbol"]
+        price_id = loan_token["fixedIntervalPriceId"]
+        self._add(
+            "loantoken:" + symbol,
+            self._price_deps(price_id),
+            lambda: [
+                (
+                    "setloantoken",
+                    {
+                        "symbol": symbol,
+                        "name": loan_token.get("name", symbol),
+                        "fixedIntervalPriceId": price_id,
+                        "mintable": loan_token.get("mintable", True),
+                        "interest": loan_token.get("interest", 0),
+                    },
+                )
+            ],
+        )
+        if loan_token.get("amount"):
+            self._add(
+                "mint:" + symbol,
+                ["loantoken:" + symbol],
+                lambda: [
+                    (
+                        "minttokens",
+                        "%s@%s" % (loan_token["amount"], self.token_id(symbol)),
+                    )
+                ],
+            )
+
+    def _add_collateral_token(self, collateral):
+        symbol = collateral["token"]
+        price_id = collateral["fixedIntervalPriceId"]
+        self._add(
+            "collateral:" + symbol,
+            self._token_deps(symbol) + self._price_deps(price_id),
+            lambda: [
+                (
+                    "setcollateraltoken",
+                    {
+                        "token": self.token_id(symbol),
+                        "factor": collateral.get("factor", 1),
+                        "fixedIntervalPriceId": price_id,
+                    },
+                )
+            ],
+        )
+
+    def _add_pool(self, pool):
+        token_a, token_b = pool["tokenA"], pool["tokenB"]
+        pair = "%s-%s" % (token_a, token_b)
+
+        def done(results):
+            self.pool_ids[pair] = get_id_token(self.node, pair)
+
+        self._add(
+            "pool:" + pair,
+            self._token_deps(token_a) + self._token_deps(token_b),
+            lambda: [
+                (
+                    "createpoolpair",
+                    {
+                        "tokenA": self.token_id(token_a),
+                        "tokenB": self.token_id(token_b),
+                        "commission": pool.get("commission", 0),
+                        "status": True,
+                        "ownerAddress": self.owner,
+                        "pairSymbol": pair,
+                    },
+                )
+            ],
+            done,
+        )
+        if pool.get("amountA") and pool.get("amountB"):
+            self._add(
+                "liquidity:" + pair,
+                ["pool:" + pair]
+                + self._funding_deps(token_a)
+                + self._funding_deps(token_b),
+                lambda: [
+                    (
+                        "addpoolliquidity",
+                        {
+                            self.owner: [
+                                "%s@%s" % (pool["amountA"], self.token_id(token_a)),
+                                "%s@%s" % (pool["amountB"], self.token_id(token_b)),
+                            ]
+                        },
+                        self.owner,
+                    )
+                ],
+            )
+
+    def _add_vault(self, i, vault):
+        def create():
+            owner = self.node.getnewaddress("", "legacy")
+            self.vault_owners[i] = owner
+            return [("createvault", owner, vault.get("loanSchemeId", ""))]
+
+        def done(results):
+            self.vault_ids[i] = results[0]
+
+        scheme_id = vault.get("loanSchemeId")
+        self._add(
+            "vault:%d" % i,
+            ["scheme:" + scheme_id] if scheme_id else [],
+            create,
+            done,
+        )
+
+        collateral = vault.get("collateral", [])
+        if collateral:
+            deps = ["vault:%d" % i]
+            for amount in collateral:
+                symbol = amount.split("@")[1]
+                deps += self._collateral_deps(symbol) + self._funding_deps(symbol)
+            if "live_prices" in self.steps:
+                deps.append("live_prices")
+            self._add(
+                "deposit:%d" % i,
+                deps,
+                lambda: [
+                    ("deposittovault", self.vault_ids[i], self.owner, amount)
+                    for amount in collateral
+                ],
+            )
+
+        loans = vault.get("loans", [])
+        if loans:
+            deps = ["deposit:%d" % i] if collateral else ["vault:%d" % i]
+            for amount in loans:
+                deps += self._token_deps(amount.split("@")[1])
+            self._add(
+                "loan:%d" % i,
+                deps,
+                lambda: [
+                    ("takeloan", {"vaultId": self.vault_ids[i], "amounts": loans})
+                ],
+            )
+
+    def _wait_for_live_prices(self):
+        """Generates blocks up to the fixed interval price updates that make all
+        fixture prices live. Prices without an oracle feed are not waited for."""
+        fed_prices = set()
+        for oracle in self.spec.get("oracles", []):
+            fed_prices.update(oracle["prices"])
+        price_ids = [
+            token["fixedIntervalPriceId"]
+            for token in self.spec.get("loan_tokens", [])
+            + self.spec.get("collateral_tokens", [])
+            if token["fixedIntervalPriceId"] in fed_prices
+        ]
+
+        def get_prices():
+            return batch_rpc(
+                self.node,
+                [("getfixedintervalprice", price_id) for price_id in price_ids],
+            )
+
+        # A new price becomes active one interval after it is picked up as next
+        # price, so all prices are live after at most two price blocks
+        for _ in range(2):
+            prices = get_prices()
+            if all(price["isLive"] for price in prices):
+                return
+            self._generate(prices[0]["nextPriceBlock"] - self.node.getblockcount())
+        prices = get_prices()
+        assert all(price["isLive"] for price in prices), prices
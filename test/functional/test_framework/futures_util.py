@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Model of futures swap settlement for functional testing.
+
+Mirrors the settlement of DFIP2203 (dToken <-> DUSD) and DFIP2206F (DFI to
+DUSD) future swaps done by the node at the end of each block period, so that
+expected balances of all pending swaps can be computed in one pass and checked
+against the node with a single batched request."""
+
+from decimal import Decimal
+
+from .messages import COIN
+from .util import batch_rpc
+
+DUSD_SYMBOL = "DUSD"
+
+
+def to_satoshis(amount):
+    return int(Decimal(amount) * COIN)
+
+
+def from_satoshis(amount):
+    return Decimal(amount).scaleb(-8)
+
+
+def multiply_amounts(a, b):
+    """Satoshi multiplication as done by MultiplyAmounts in amount.h"""
+    return a * b // COIN
+
+
+def divide_amounts(a, b):
+    """Satoshi division as done by DivideAmounts in amount.h"""
+    return a * COIN // b
+
+
+def parse_token_amount(token_amount):
+    """Splits an "amount@symbol" string into (Decimal amount, symbol)"""
+    amount, symbol = token_amount.split("@")
+    return Decimal(amount), symbol
+
+
+def add_balance(balances, owner, symbol, amount):
+    account = balances.setdefault(owner, {})
+    account[symbol] = account.get(symbol, Decimal(0)) + amount
+
+
+def get_accounts(node, owners):
+    """Returns the balances of all owners as {owner: {symbol: amount}}, fetched in one batch."""
+    owners = list(owners)
+    results = batch_rpc(
+        node, [("getaccount", owner) for owner in owners], independent=True
+    )
+    accounts = {}
+    for owner, amounts in zip(owners, results):
+        accounts[owner] = {}
+        for token_amount in amounts:
+            amount, symbol = parse_token_amount(token_amount)
+            accounts[owner][symbol] = amount
+    return accounts
+
+
+def get_active_prices(node, symbols, currency="USD"):
+    """Returns the active fixed interval prices of the given tokens, fetched in one batch.
+
+    Settlement uses the price active at the settlement block, so the snapshot
+    has to be taken after the last price update before that block. Tokens
+    without a live price map to None and are refunded on settlement."""
+    symbols = list(symbols)
+    requests = [
+        ("getfixedintervalprice", "{}/{}".format(symbol, currency))
+        for symbol in symbols
+    ]
+    prices = {}
+    for symbol, price in zip(symbols, batch_rpc(node, requests, independent=True)):
+        prices[symbol] = price["activePrice"] if price["isLive"] else None
+    return prices
+
+
+class SettlementResult:
+    """Outcome of a futures settlement.
+
+    payouts and refunds hold the balances credited to every owner, burned and
+    minted the totals per token symbol."""
+
+    def __init__(self):
+        self.payouts = {}
+        self.refunds = {}
+        self.burned = {}
+        self.minted = {}
+        self.swaps = 0
+
+    def pay(self, owner, source_amount, source_symbol, amount, symbol):
+        add_balance(self.payouts, owner, symbol, amount)
+        self.burned[source_symbol] = (
+            self.burned.get(source_symbol, Decimal(0)) + source_amount
+        )
+        self.minted[symbol] = self.minted.get(symbol, Decimal(0)) + amount
+        self.swaps += 1
+
+    def refund(self, owner, amount, symbol):
+        add_balance(self.refunds, owner, symbol, amount)
+
+    def expected_balances(self, before):
+        """Applies payouts and refunds to the pre-settlement balances"""
+        expected = {owner: dict(balances) for owner, balances in before.items()}
+        for credits in (self.payouts, self.refunds):
+            for owner, amounts in credits.items():
+                for symbol, amount in amounts.items():
+                    add_balance(expected, owner, symbol, amount)
+        return expected
+
+
+class FuturesSettlement:
+    """Settlement parameters of a futures program.
+
+    block_period, reward_pct and start_block match the v0/params/dfip2203 and
+    v0/params/dfip2206f attributes."""
+
+    def __init__(self, block_period, reward_pct, start_block=0):
+        self.block_period = int(block_period)
+        self.reward_pct = Decimal(reward_pct)
+        self.start_block = int(start_block)
+
+    @staticmethod
+    def from_gov(node, param="dfip2203"):
+        """Reads the settlement parameters of a futures program from the chain"""
+        attributes = node.getgov("ATTRIBUTES")["ATTRIBUTES"]
+        prefix = "v0/params/{}/".format(param)
+        return FuturesSettlement(
+            attributes[prefix + "block_period"],
+            attributes[prefix + "reward_pct"],
+            attributes.get(prefix + "start_block", 0),
+        )
+
+    def is_settlement_block(self, height):
+        return (
+            height >= self.start_block
+            and (height - self.start_block) % self.block_period == 0
+        )
+
+    def next_settlement_block(self, height):
+        """Returns the first settlement block after height"""
+        if height < self.start_block:
+            return self.start_block
+        return height + (
+            self.block_period - ((height - self.start_block) % self.block_period)
+        )
+
+    def discount_price(self, price):
+        """Price in satoshis paid out for swaps into DUSD"""
+        return multiply_amounts(to_satoshis(price), COIN - to_satoshis(self.reward_pct))
+
+    def premium_price(self, price):
+        """Price in satoshis charged for swaps out of DUSD"""
+        return multiply_amounts(to_satoshis(price), COIN + to_satoshis(self.reward_pct))
+
+    def settle_swaps(self, pending_swaps, prices, result=None):
+        """Settles DFIP2203 swaps as returned by listpendingfutureswaps.
+
+        prices maps loan token symbols to their active price, or None if the
+        price is not live. Swaps on tokens without a price are refunded."""
+        result = result or SettlementResult()
+        for swap in pending_swaps:
+            owner = swap["owner"]
+            amount, symbol = parse_token_amount(swap["source"])
+            if symbol == DUSD_SYMBOL:
+                destination = swap["destination"]
+                price = prices.get(destination)
+                if price is None:
+                    result.refund(owner, amount, symbol)
+                    continue
+                total = divide_amounts(to_satoshis(amount), self.premium_price(price))
+                result.pay(owner, amount, symbol, from_satoshis(total), destination)
+            else:
+                price = prices.get(symbol)
+                if price is None:
+                    result.refund(owner, amount, symbol)
+                    continue
+                total = multiply_amounts(
+                    to_satoshis(amount), self.discount_price(price)
+                )
+                result.pay(owner, amount, symbol, from_satoshis(total), DUSD_SYMBOL)
+        return result
+
+    def settle_dusd_swaps(self, pending_swaps, dfi_price, result=None):
+        """Settles DFIP2206F swaps as returned by listpendingdusdswaps.
+
+        All swaps are refunded if the DFI price is not live."""
+        result = result or SettlementResult()
+        for swap in pending_swaps:
+            owner, amount = swap["owner"], Decimal(swap["amount"])
+            if dfi_price is None:
+                result.refund(owner, amount, "DFI")
+                continue
+            total = multiply_amounts(
+                to_satoshis(amount), self.discount_price(dfi_price)
+            )
+            result.pay(owner, amount, "DFI", from_satoshis(total), DUSD_SYMBOL)
+        return result
+
+
+def get_pending_swaps(node):
+    """Returns all pending DFIP2203 and DFIP2206F swaps fetched in one batch"""
+    return batch_rpc(
+        node,
+        [("listpendingfutureswaps",), ("listpendingdusdswaps",)],
+        independent=True,
+    )
+
+
+def assert_settlement(node, expected):
+    """Checks the balances of all owners in expected against the node in one batch"""
+    actual = get_accounts(node, expected.keys())
+    mismatches = []
+    for owner, balances in expected.items():
+        expected_balances = {s: a for s, a in balances.items() if a != 0}
+        if actual[owner] != expected_balances:
+            mismatches.append(
+                "{}: expected {} got {}".format(owner, expected_balances, actual[owner])
+            )
+    if mismatches:
+        raise AssertionError(
+            "{} of {} accounts do not match settlement:\n{}".format(
+                len(mismatches), len(expected), "\n".join(mismatches[:20])
+            )
+        )
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""On-chain governance load generation for functional testing.
+
+Sets up many masternodes and proposals on a single node and casts votes in
+batched RPC requests. Votes are verified in a single pass over a hashed index
+of the votes listed by the node."""
+
+from .util import assert_equal, batch_rpc
+
+# Each vote spends an authorization input of the masternode owner, so votes of
+# one masternode are chained in the mempool and limited by the ancestor limit.
+MAX_VOTES_PER_MASTERNODE_PER_BLOCK = 20
+
+
+def index_votes(votes):
+    """Indexes votes as returned by listgovproposalvotes by proposal and
+    masternode: {proposalId: {masternodeId: vote}}"""
+    index = {}
+    for vote in votes:
+        index.setdefault(vote["proposalId"], {})[vote["masternodeId"]] = vote["vote"]
+    return index
+
+
+class GovVoteLoad:
+    """Generates governance load on one node of a test.
+
+    setup_masternodes() restarts the node with all operator addresses so that
+    every masternode can mint the block required for voting eligibility."""
+
+    def __init__(self, test, node_index=0):
+        self.test = test
+        self.node_index = node_index
+        self.masternodes = []
+        self.operators = []
+        self.proposals = []
+        self.expected = {}
+
+    @property
+    def node(self):
+        return self.test.nodes[self.node_index]
+
+    def setup_masternodes(self, count, chunk_size=100):
+        """Creates, enables and mints with `count` masternodes"""
+        operators = batch_rpc(self.node, [("getnewaddress", "", "legacy")] * count)
+        for start in range(0, count, chunk_size):
+            chunk = operators[start : start + chunk_size]
+            self.masternodes += batch_rpc(
+                self.node, [("createmasternode", address) for address in chunk]
+            )
+            self.node.generate(1)
+        self.operators += operators
+
+        self.node.generate(20)  # Enables all MNs
+
+        self.test.restart_node(
+            self.node_index,
+            self.node.extra_args
+            + ["-masternode_operator={}".format(address) for address in self.operators],
+        )
+
+        # Mint with every MN to meet voting eligibility criteria
+        batch_rpc(
+            self.node,
+            [("generatetoaddress", 1, address) for address in operators],
+        )
+
+    def create_proposals(self, count, cycles=1, amount=100):
+        """Creates `count` community fund proposals in one block"""
+        payout = self.node.getnewaddress()
+        proposals = batch_rpc(
+            self.node,
+            [
+                (
+                    "creategovcfp",
+                    {
+                        "title": "Load test proposal {}".format(
+                            len(self.proposals) + i
+                        ),
+                        "context": "<Git issue url>",
+                        "amount": amount,
+                        "cycles": cycles,
+                        "payoutAddress": payout,
+                    },
+                )
+                for i in range(count)
+            ],
+        )
+        self.node.generate(1)
+        self.proposals += proposals
+        return proposals
+
+    def cast_votes(self, votes):
+        """Casts (proposalId, masternodeId, vote) votes in batched requests and
+        returns the number of blocks used. Later votes of the same masternode
+        on the same proposal replace earlier ones in the expected votes."""
+        rounds = []
+        per_masternode = {}
+        for proposal_id, masternode_id, vote in votes:
+            n = per_masternode.get(masternode_id, 0)
+            per_masternode[masternode_id] = n + 1
+            round_index = n // MAX_VOTES_PER_MASTERNODE_PER_BLOCK
+            if round_index == len(rounds):
+                rounds.append([])
+            rounds[round_index].append(("votegov", proposal_id, masternode_id, vote))
+            self.expected.setdefault(proposal_id, {})[masternode_id] = vote.upper()
+
+        for calls in rounds:
+            batch_rpc(self.node, calls)
+            self.node.generate(1)
+        return len(rounds)
+
+    def list_votes(self, cycle=0):
+        """Returns the votes of all proposals of the given cycle, fetched with
+        one batched request"""
+        limit = len(self.masternodes) + 1
+        results = batch_rpc(
+            self.node,
+            [
+                ("listgovproposalvotes", proposal_id, "all", cycle, {"limit": limit})
+                for proposal_id in self.proposals
+            ],
+        )
+        return [vote for votes in results for vote in votes]
+
+    def verify_votes(self, cycle=0):
+        """Checks the votes of all proposals against the cast votes in a single
+        pass over the indexed votes"""
+        actual = index_votes(self.list_votes(cycle))
+        for proposal_id in self.proposals:
+            assert_equal(
+                actual.get(proposal_id, {}), self.expected.get(proposal_id, {})
+            )
+        return actual
@@ -7,6 +7,7 @@ WARNING: This code is slow, uses bad randomness, does not properly protect
 keys, and is trivially vulnerable to side channel attacks. Do not use for
 anything but tests."""
 import random
+import unittest
 
 
 def modinv(a, n):
@@ -419,3 +420,56 @@ class ECKey:
             + bytes([2, len(sb)])
             + sb
         )
+
+    def sign_compact(self, msg):
+        """Construct a 65-byte compact ECDSA signature with this key, from which
+        the public key can be recovered (as produced by CKey::SignCompact)."""
+        assert self.valid
+        z = int.from_bytes(msg, "big")
+        k = random.randrange(1, SECP256K1_ORDER)
+        R = SECP256K1.affine(SECP256K1.mul([(SECP256K1_G, k)]))
+        r = R[0] % SECP256K1_ORDER
+        s = (modinv(k, SECP256K1_ORDER) * (z + self.secret * r)) % SECP256K1_ORDER
+        # The recovery id selects R out of the points with an x coordinate of r
+        recid = (R[1] & 1) | (2 if R[0] >= SECP256K1_ORDER else 0)
+        if s > SECP256K1_ORDER_HALF:
+            s = SECP256K1_ORDER - s
+            recid ^= 1
+        header = 27 + recid + (4 if self.compressed else 0)
+        return bytes([header]) + r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+
+class TestFrameworkKey(unittest.TestCase):
+    def test_sign_compact(self):
+        """Compact signatures recover the public key that signed them"""
+        for compressed in [True, False]:
+            key = ECKey()
+            key.generate(compressed)
+            pubkey = key.get_pubkey()
+            for i in range(16):
+                msg = i.to_bytes(32, "big")
+                sig = key.sign_compact(msg)
+                self.assertEqual(len(sig), 65)
+                header = sig[0] - 27
+                self.assertEqual(bool(header & 4), compressed)
+                recid = header & 3
+                r = int.from_bytes(sig[1:33], "big")
+                s = int.from_bytes(sig[33:], "big")
+                self.assertLessEqual(s, SECP256K1_ORDER_HALF)
+                # Recover R from r and the recovery id, then the public key as
+                # r^-1 * (s * R - z * G)
+                R = SECP256K1.lift_x(r + (SECP256K1_ORDER if recid & 2 else 0))
+                if (R[1] & 1) != (recid & 1):
+                    R = SECP256K1.negate(R)
+                rinv = modinv(r, SECP256K1_ORDER)
+                z = int.from_bytes(msg, "big")
+                recovered = ECPubKey()
+                recovered.p = SECP256K1.mul(
+                    [
+                        (R, s * rinv % SECP256K1_ORDER),
+                        (SECP256K1_G, -z * rinv % SECP256K1_ORDER),
+                    ]
+                )
+                recovered.valid = True
+                recovered.compressed = compressed
+                self.assertEqual(recovered.get_bytes(), pubkey.get_bytes())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Incremental debug.log tailing for functional tests.
+
+A DebugLogTailer follows one node's debug.log by polling its size and only
+reading the bytes appended since the last read. Tests register a LogWatch with
+the messages they expect; each new line is matched against the patterns of
+the registered watches only, and waiting threads are woken through a
+condition variable as soon as their watch is complete. The polling thread only
+runs while there are watches registered."""
+
+import re
+import threading
+import time
+
+
+class LogWatch:
+    """Messages expected in the lines logged after the watch was created.
+
+    Patterns are plain substrings, or regular expressions with regex=True,
+    matched against each line including its trailing newline."""
+
+    def __init__(self, tailer, patterns, regex=False):
+        self.tailer = tailer
+        if regex:
+            self.pending = [(p, re.compile(p, flags=re.MULTILINE)) for p in patterns]
+        else:
+            self.pending = [(p, None) for p in patterns]
+        self.matches = {}
+        self.lines = []
+
+    @property
+    def done(self):
+        return not self.pending
+
+    def feed(self, lines):
+        self.lines.extend(lines)
+        if not self.pending:
+            return
+        for line in lines:
+            for entry in list(self.pending):
+                pattern, compiled = entry
+                if compiled.search(line) if compiled else pattern in line:
+                    self.matches[pattern] = line
+                    self.pending.remove(entry)
+
+    def wait(self, timeout):
+        """Waits until all patterns were logged, returns whether they were"""
+        return self.tailer.wait(self, timeout)
+
+    def close(self):
+        self.tailer.remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class DebugLogTailer:
+    def __init__(self, path, interval=0.05):
+        self.path = path
+        self.interval = interval
+        self.offset = self._size()
+        self.partial = b""
+        self.cond = threading.Condition()
+        self.watches = []
+        self.thread = None
+
+    def _size(self):
+        try:
+            with open(self.path, "rb") as f:
+                return f.seek(0, 2)
+        except FileNotFoundError:
+            return 0
+
+    def _read(self):
+        """Returns the complete lines appended since the last read"""
+        try:
+            with open(self.path, "rb") as f:
+                size = f.seek(0, 2)
+                if size < self.offset:
+                    # The log was truncated or replaced, start over
+                    self.offset = 0
+                    self.partial = b""
+                if size == self.offset:
+                    return []
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+        except FileNotFoundError:
+            return []
+        self.offset += len(data)
+        data = self.partial + data
+        # Only consume complete lines, the node may be mid-write
+        end = data.rfind(b"\n") + 1
+        self.partial = data[end:]
+        return data[:end].decode("utf-8", errors="replace").splitlines(keepends=True)
+
+    def poll(self):
+        """Reads new lines, feeds them to the watches and wakes up waiters"""
+        with self.cond:
+            lines = self._read()
+            if lines and self.watches:
+                for watch in self.watches:
+                    watch.feed(lines)
+                self.cond.notify_all()
+
+    def watch(self, patterns, regex=False):
+        """Returns a LogWatch for lines logged from now on"""
+        with self.cond:
+            # Skip what has been logged so far
+            self.poll()
+            watch = LogWatch(self, patterns, regex)
+            self.watches.append(watch)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="tail-" + self.path, daemon=True
+                )
+                self.thread.start()
+        return watch
+
+    def remove(self, watch):
+        with self.cond:
+            if watch in self.watches:
+                self.watches.remove(watch)
+
+    def wait(self, watch, timeout):
+        time_end = time.time() + timeout
+        with self.cond:
+            while not watch.done:
+                remaining = time_end - time.time()
+                if remaining <= 0:
+                    # Pick up anything logged since the last poll
+                    self.poll()
+                    break
+                self.cond.wait(remaining)
+        return watch.done
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.watches:
+                    self.thread = None
+                    return
+            self.poll()
+            time.sleep(self.interval)
@@ -55,6 +55,7 @@ from test_framework.messages import (
     NODE_WITNESS,
     sha256,
 )
+from test_framework.tracer import TRACER
 from test_framework.util import wait_until
 
 logger = logging.getLogger("TestFramework.mininode")
@@ -226,9 +227,10 @@ class P2PConnection(asyncio.Protocol):
 
         This method takes a P2P payload, builds the P2P header and adds
         the message to the send buffer to be sent over the socket."""
-        tmsg = self.build_message(message)
-        self._log_message("send", message)
-        return self.send_raw_message(tmsg)
+        with TRACER.span(message.command.decode("ascii"), "p2p"):
+            tmsg = self.build_message(message)
+            self._log_message("send", message)
+            return self.send_raw_message(tmsg)
 
     def send_raw_message(self, raw_message_bytes):
         if not self.is_connected:
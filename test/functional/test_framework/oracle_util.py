@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Oracle price feed simulator for functional testing.
+
+Price series are indexed by step, one step per fixed price interval. The
+simulator sends the prices of a step for all oracles and tokens in one batched
+RPC request and then moves to the next price interval boundary with a single
+generate call."""
+
+import csv
+import random
+import time
+
+from decimal import Decimal, ROUND_DOWN
+
+from .util import batch_rpc
+
+PRICE_PRECISION = Decimal("0.00000001")
+
+
+def to_price(value):
+    return Decimal(value).quantize(PRICE_PRECISION, rounding=ROUND_DOWN)
+
+
+class RandomWalkPrices:
+    """Geometric random walk starting at `start`.
+
+    Each step moves the price by a normally distributed fraction with standard
+    deviation `volatility`, capped at `max_change` so that consecutive prices
+    stay within the 30% deviation that keeps fixed interval prices live."""
+
+    def __init__(
+        self,
+        start,
+        volatility=Decimal("0.02"),
+        seed=0,
+        max_change=Decimal("0.25"),
+        floor=PRICE_PRECISION,
+    ):
+        self.volatility = float(volatility)
+        self.max_change = float(max_change)
+        self.floor = to_price(floor)
+        self.rng = random.Random(seed)
+        self.prices = [to_price(start)]
+
+    def price(self, step):
+        while len(self.prices) <= step:
+            change = self.rng.gauss(0, self.volatility)
+            change = max(-self.max_change, min(self.max_change, change))
+            price = to_price(self.prices[-1] * (1 + Decimal(change)))
+            self.prices.append(max(price, self.floor))
+        return self.prices[step]
+
+
+class StepPrices:
+    """Piecewise constant prices given as [(first_step, price), ...]"""
+
+    def __init__(self, steps):
+        self.steps = sorted((step, to_price(price)) for step, price in steps)
+        assert self.steps and self.steps[0][0] == 0, "steps must start at step 0"
+
+    def price(self, step):
+        current = self.steps[0][1]
+        for first_step, price in self.steps:
+            if first_step > step:
+                break
+            current = price
+        return current
+
+
+class ReplayPrices:
+    """Replays a recorded list of prices, holding the last one at the end."""
+
+    def __init__(self, prices):
+        self.prices = [to_price(price) for price in prices]
+        assert self.prices, "no prices to replay"
+
+    def price(self, step):
+        return self.prices[min(step, len(self.prices) - 1)]
+
+    @staticmethod
+    def from_csv(path):
+        """Loads a CSV file with one column per price id, e.g. "TSLA/USD", and
+        one row per step. Returns {price_id: ReplayPrices}."""
+        with open(path, newline="", encoding="utf8") as f:
+            rows = list(csv.DictReader(f))
+        return {
+            price_id: ReplayPrices([row[price_id] for row in rows])
+            for price_id in rows[0].keys()
+        }
+
+
+class OracleSimulator:
+    """Feeds price series to a set of oracles.
+
+    `oracles` maps each oracle id to the price ids it feeds, or is a list of
+    oracle ids that all feed every price id in `series`. `series` maps price
+    ids such as "TSLA/USD" to price series. `time_source` returns the oracle
+    timestamp and should follow the node mocktime if one is set.
+
+    Oracle prices sent at step n become the next price at the following
+    interval boundary and the active price one interval later."""
+
+    def __init__(self, node, oracles, series, time_source=time.time):
+        self.node = node
+        if not isinstance(oracles, dict):
+            oracles = {oracle_id: list(series) for oracle_id in oracles}
+        self.oracles = oracles
+        self.series = series
+        self.time_source = time_source
+        self.step = 0
+        self.interval = None
+
+    def prices(self, step=None):
+        """Returns the prices of a step, the current step by default"""
+        step = self.step if step is None else step
+        return {
+            price_id: series.price(step) for price_id, series in self.series.items()
+        }
+
+    def price_interval(self):
+        if self.interval is None:
+            self.interval = self.node.getloaninfo()["defaults"]["fixedIntervalBlocks"]
+        return self.interval
+
+    def next_price_block(self, height):
+        """Returns the first price interval boundary after height"""
+        interval = self.price_interval()
+        return height + (interval - height % interval)
+
+    def submit(self):
+        """Sends the prices of the current step for all oracles in one batch
+        and moves on to the next step. Returns the current block height."""
+        prices = self.prices()
+        timestamp = int(self.time_source())
+        calls = []
+        for oracle_id, price_ids in self.oracles.items():
+            oracle_prices = []
+            for price_id in price_ids:
+                token, currency = price_id.split("/")
+                oracle_prices.append(
+                    {
+                        "currency": currency,
+                        "tokenAmount": "%s@%s" % (prices[price_id], token),
+                    }
+                )
+            calls.append(("setoracledata", oracle_id, timestamp, oracle_prices))
+        calls.append(("getblockcount",))
+        self.step += 1
+        return batch_rpc(self.node, calls)[-1]
+
+    def advance(self, intervals=1):
+        """Runs the given number of steps. Each step submits the oracle prices
+        and generates blocks up to the next price interval boundary, which
+        picks the prices up as next fixed interval price. Returns the number
+        of blocks generated."""
+        blocks = 0
+        for _ in range(intervals):
+            height = self.submit()
+            nblocks = self.next_price_block(height) - height
+            self.node.generate(nblocks)
+            blocks += nblocks
+        return blocks
+
+    def activate(self):
+        """Advances until the prices of the current step are the active fixed
+        interval prices, which takes two price interval boundaries."""
+        step = self.step
+        blocks = self.advance()
+        self.step = step
+        blocks += self.advance()
+        self.step = step + 1
+        return blocks
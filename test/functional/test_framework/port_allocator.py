@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Port block allocation across concurrent test runs.
+
+Each test process uses a block of MAX_NODES p2p, rpc, grpc and eth rpc ports
+selected by its port seed. PortAllocator hands out seeds whose port blocks are
+free: a seed is claimed with an exclusive flock on its lock file in a directory
+shared by all test runners of the host, which is released when the seed is
+released or the process holding it exits. Seeds with ports that other
+processes listen on are skipped.
+
+flock is not available on Windows, where seeds are only kept apart within one
+PortAllocator and tests started without --portseed derive it from their pid."""
+
+import os
+import socket
+import tempfile
+
+from .util import MAX_NODES, PORT_MIN, PORT_RANGE, port_block_start
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Number of seeds with non-overlapping port blocks
+NUM_PORT_SEEDS = (PORT_RANGE - 1 - MAX_NODES) // MAX_NODES
+# p2p, rpc, grpc and eth rpc ports each have a range
+PORT_KINDS = 4
+
+
+def is_supported():
+    """Returns whether seeds can be claimed across processes"""
+    return fcntl is not None
+
+
+def default_lock_dir():
+    return os.getenv(
+        "DEFI_TEST_PORT_LOCK_DIR",
+        os.path.join(tempfile.gettempdir(), "defi_test_ports"),
+    )
+
+
+def port_is_free(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        # Ports of stopped nodes linger in TIME_WAIT, which defid can reuse
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+
+def port_block_is_free(seed):
+    start = port_block_start(seed)
+    return all(
+        port_is_free(PORT_MIN + kind * PORT_RANGE + start + n)
+        for kind in range(PORT_KINDS)
+        for n in range(MAX_NODES)
+    )
+
+
+class PortAllocator:
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir or default_lock_dir()
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self.held = {}
+        self.next_seed = 0
+
+    def acquire(self):
+        """Claims and returns the seed of a free port block"""
+        for i in range(NUM_PORT_SEEDS):
+            seed = (self.next_seed + i) % NUM_PORT_SEEDS
+            if seed in self.held:
+                continue
+            lock = None
+            if is_supported():
+                lock = open(os.path.join(self.lock_dir, "{}.lock".format(seed)), "a")
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Held by another test runner
+                    lock.close()
+                    continue
+            if not port_block_is_free(seed):
+                if lock is not None:
+                    lock.close()
+                continue
+            self.held[seed] = lock
+            # Hand out the other blocks before reusing a released one, so
+            # ports of stopped nodes have time to be closed
+            self.next_seed = seed + 1
+            return seed
+        raise RuntimeError(
+            "No free port block out of {} in {}".format(NUM_PORT_SEEDS, self.lock_dir)
+        )
+
+    def release(self, seed):
+        lock = self.held.pop(seed, None)
+        if lock is not None:
+            lock.close()
+
+    def release_all(self):
+        for seed in list(self.held):
+            self.release(seed)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Proof-of-stake block minting in Python.
+
+blocktools.create_block leaves the DeFi header fields as dummies, so blocks
+built with it are only accepted by nodes running with -dummypos. A PosMinter
+fills them like a masternode would: the header carries the height, the
+operator's minted block count and the stake modifier, which is the hash of the
+previous block's stake modifier and the operator's key id. The header is then
+signed with a compact signature of the operator key from TestNode.PRIV_KEYS,
+from which the node recovers the minter.
+
+The minter keeps the height, time, stake modifier and masternode minted
+counts of every block it knows, so chains and forks of any length can be
+built without a node and sent over P2P. On regtest the PoS kernel target is
+met by any stake, and the default coinbase of create_coinbase is valid before
+the AMK fork height; tests activating it pass their own coinbase."""
+
+import collections
+import struct
+
+from .address import base58_to_byte
+from .blocktools import add_witness_commitment, create_block, create_coinbase
+from .key import ECKey
+from .messages import hash256, ser_uint256, uint256_from_str
+from .script import hash160
+from .test_node import TestNode
+
+# Header version of blocks minted by defid
+VERSIONBITS_TOP_BITS = 0x20000000
+
+# Chain state after a block, as needed to mint its children. minted maps
+# operator addresses to the number of blocks minted by their masternode.
+MintState = collections.namedtuple(
+    "MintState", ["height", "time", "bits", "stake_modifier", "minted"]
+)
+
+
+class OperatorKey:
+    """The operator key of a masternode"""
+
+    def __init__(self, address, wif):
+        self.address = address
+        data, _ = base58_to_byte(wif)
+        self.key = ECKey()
+        self.key.set(data[:32], len(data) == 33 and data[32] == 1)
+        self.key_id = hash160(self.key.get_pubkey().get_bytes())
+
+    @classmethod
+    def from_mn_keys(cls, mn_keys):
+        return cls(mn_keys.operatorAuthAddress, mn_keys.operatorPrivKey)
+
+
+def compute_stake_modifier(prev_stake_modifier, key_id):
+    """pos::ComputeStakeModifier"""
+    return uint256_from_str(hash256(ser_uint256(prev_stake_modifier) + key_id))
+
+
+def header_hash_to_sign(header):
+    """CBlockHeader::GetHashToSign, which leaves out the signature"""
+    r = b""
+    r += struct.pack("<i", header.nVersion)
+    r += ser_uint256(header.hashPrevBlock)
+    r += ser_uint256(header.hashMerkleRoot)
+    r += struct.pack("<I", header.nTime)
+    r += struct.pack("<I", header.nBits)
+    r += struct.pack("<Q", header.nHeight)
+    r += struct.pack("<Q", header.nMintedBlocks)
+    r += ser_uint256(header.stakeModifier)
+    return hash256(r)
+
+
+def sign_header(header, operator):
+    header.sig = operator.key.sign_compact(header_hash_to_sign(header))
+    header.rehash()
+
+
+class PosMinter:
+    """Mints signed blocks on top of any block it knows.
+
+    Blocks are known once minted, or registered with add_block or sync_with.
+    The masternodes minting blocks must be active at their height, the
+    genesis masternodes of TestNode.PRIV_KEYS always are."""
+
+    def __init__(self, keys=None):
+        keys = TestNode.PRIV_KEYS if keys is None else keys
+        self.operators = [OperatorKey.from_mn_keys(k) for k in keys]
+        self.states = {}
+
+    def add_block(self, blockhash, state):
+        self.states[blockhash] = state
+
+    def sync_with(self, node):
+        """Registers the tip of node, returns its hash as an int"""
+        block = node.getblock(node.getbestblockhash())
+        counts = {
+            mn["operatorAuthAddress"]: mn["mintedBlocks"]
+            for mn in node.listmasternodes({}, True).values()
+        }
+        minted = {
+            op.address: counts[op.address]
+            for op in self.operators
+            if op.address in counts
+        }
+        tip = int(block["hash"], 16)
+        self.add_block(
+            tip,
+            MintState(
+                height=block["height"],
+                time=block["time"],
+                bits=int(block["bits"], 16),
+                stake_modifier=int(block["stakeModifier"], 16),
+                minted=minted,
+            ),
+        )
+        return tip
+
+    def mint(
+        self,
+        prev,
+        *,
+        operator=0,
+        coinbase=None,
+        txs=(),
+        ntime=None,
+        version=VERSIONBITS_TOP_BITS
+    ):
+        """Returns a block minted by the masternode of operators[operator] on
+        top of the known block prev.
+
+        The block pays coinbase, or create_coinbase of its height, and includes
+        txs, with a witness commitment if any of them has witnesses. Its time
+        defaults to a second after prev."""
+        parent = self.states[prev]
+        op = self.operators[operator]
+        height = parent.height + 1
+        if coinbase is None:
+            coinbase = create_coinbase(height)
+        block = create_block(
+            prev, coinbase, parent.time + 1 if ntime is None else ntime, version=version
+        )
+        block.nBits = parent.bits
+        block.vtx.extend(txs)
+        if any(not tx.wit.is_null() for tx in txs):
+            add_witness_commitment(block)
+        else:
+            block.hashMerkleRoot = block.calc_merkle_root()
+
+        minted = dict(parent.minted)
+        minted[op.address] = minted.get(op.address, 0) + 1
+        block.nHeight = height
+        block.nMintedBlocks = minted[op.address]
+        block.stakeModifier = compute_stake_modifier(parent.stake_modifier, op.key_id)
+        sign_header(block, op)
+
+        self.add_block(
+            block.sha256,
+            MintState(
+                height=height,
+                time=block.nTime,
+                bits=block.nBits,
+                stake_modifier=block.stakeModifier,
+                minted=minted,
+            ),
+        )
+        return block
+
+    def mint_chain(self, prev, count, *, operators=(0,), spacing=1, **kwargs):
+        """Returns count blocks on top of prev, minted in turn by operators
+        and spaced by spacing seconds. Other arguments are passed to mint."""
+        blocks = []
+        for i in range(count):
+            ntime = self.states[prev].time + spacing
+            block = self.mint(
+                prev, operator=operators[i % len(operators)], ntime=ntime, **kwargs
+            )
+            blocks.append(block)
+            prev = block.sha256
+        return blocks
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Progress reporting of a test to test_runner.py.
+
+test_runner.py passes the write end of a pipe with --progressfd. The test
+writes JSON lines to it: the phase it entered ({"phase": "run_test"}), its
+INFO and higher log messages ({"log": ...}) and, as soon as it is known, a
+failure ({"status": "failed"}), so the runner can show live progress and abort
+a --failfast run without waiting for the test to shut down."""
+
+import json
+import logging
+import os
+import select
+
+# Events must fit in PIPE_BUF for writes to be atomic. Log messages are
+# shortened to fit, other events never come close.
+MAX_EVENT_BYTES = getattr(select, "PIPE_BUF", 512)
+MAX_LOG_LENGTH = 200
+
+
+def encode_event(event):
+    return (json.dumps(event) + "\n").encode("utf-8")
+
+
+class ProgressReporter(logging.Handler):
+    def __init__(self, fd):
+        super().__init__(logging.INFO)
+        self.fd = fd
+        # Never block the test on a runner that is slow to read
+        os.set_blocking(fd, False)
+
+    def send(self, **event):
+        line = encode_event(event)
+        if len(line) > MAX_EVENT_BYTES and event.get("log"):
+            # Keep the characters of the message that fit, escaped ones take
+            # up to 12 bytes
+            room = MAX_EVENT_BYTES - len(encode_event(dict(event, log="")))
+            for end, char in enumerate(event["log"]):
+                room -= len(json.dumps(char)) - 2
+                if room < 0:
+                    break
+            event["log"] = event["log"][:end]
+            line = encode_event(event)
+        if len(line) > MAX_EVENT_BYTES:
+            return
+        try:
+            os.write(self.fd, line)
+        except OSError:
+            # The pipe is full or the runner has gone, drop the event
+            pass
+
+    def phase(self, name):
+        self.send(phase=name)
+
+    def failed(self):
+        self.send(status="failed")
+
+    def emit(self, record):
+        message = record.getMessage().split("\n", 1)[0]
+        self.send(log=message[:MAX_LOG_LENGTH], level=record.levelname)
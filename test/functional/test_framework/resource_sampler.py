@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Resource sampling of test nodes.
+
+While a node runs, a ResourceSampler thread reads /proc/<pid>/stat, status,
+io and fd at an interval and the sizes of the chain datadir's databases
+(blocks, chainstate, enhancedcs, evm, ...) every few samples. The samples are
+appended as JSON lines to node<N>.resources.jsonl next to test_framework.log.
+
+The RSS after each TestNode.generate call is recorded as well. When a node
+stops, the series are checked for steady memory growth across generate
+batches and for leaking file descriptors, and anomalies are logged as
+warnings. Sampling needs procfs and is skipped on other platforms."""
+
+import json
+import os
+import subprocess
+import threading
+import time
+import unittest
+
+# Sample the datadir sizes every this many samples, walking it is slower
+# than reading procfs
+DISK_SAMPLE_EVERY = 5
+
+# Memory growth is flagged if the RSS grew over at least this many generate
+# batches, in most of them, and by more than both limits in total
+RSS_MIN_BATCHES = 5
+RSS_GROWING_FRACTION = 0.8
+RSS_GROWTH_BYTES = 64 * 1024 * 1024
+RSS_GROWTH_FRACTION = 0.2
+
+# Open file descriptors growth flagged as a leak
+FD_GROWTH = 100
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def is_supported():
+    return os.path.isdir("/proc/self")
+
+
+def read_proc(pid):
+    """Returns cpu, memory, io and fd counts of a process from procfs, or
+    None if it has exited"""
+    proc = "/proc/{}".format(pid)
+    try:
+        with open(proc + "/stat", encoding="utf8") as f:
+            # The command name may contain spaces, fields follow its ")"
+            stat = f.read().rpartition(")")[2].split()
+        with open(proc + "/status", encoding="utf8") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        fds = len(os.listdir(proc + "/fd"))
+        sample = {
+            # utime and stime are fields 14 and 15 of stat
+            "cpu_s": (int(stat[11]) + int(stat[12])) / CLOCK_TICKS,
+            "rss": int(status["VmRSS"].split()[0]) * 1024,
+            "rss_peak": int(status["VmHWM"].split()[0]) * 1024,
+            "threads": int(status["Threads"]),
+            "fds": fds,
+        }
+    except (FileNotFoundError, ProcessLookupError, PermissionError, KeyError):
+        # Exiting and zombie processes have no memory fields left in status
+        return None
+    try:
+        with open(proc + "/io", encoding="utf8") as f:
+            io = dict(line.split(": ") for line in f)
+        sample["read_bytes"] = int(io["read_bytes"])
+        sample["write_bytes"] = int(io["write_bytes"])
+    except (PermissionError, FileNotFoundError):
+        # /proc/<pid>/io needs ptrace access, which containers may not grant
+        pass
+    return sample
+
+
+def dir_size(path):
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += dir_size(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            # Databases delete files while compacting
+            pass
+    return total
+
+
+def datadir_sizes(path):
+    """Returns the sizes of the subdirectories of a chain datadir"""
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return {}
+    return {
+        entry.name: dir_size(entry.path)
+        for entry in entries
+        if entry.is_dir(follow_symlinks=False)
+    }
+
+
+def find_anomalies(generate_rss, fds):
+    """Returns descriptions of the resource anomalies of a node run, given
+    the RSS after each generate batch and the sampled fd counts"""
+    anomalies = []
+    if len(generate_rss) > RSS_MIN_BATCHES:
+        steps = list(zip(generate_rss, generate_rss[1:]))
+        growing = sum(1 for before, after in steps if after > before)
+        growth = generate_rss[-1] - generate_rss[0]
+        if (
+            growing >= RSS_GROWING_FRACTION * len(steps)
+            and growth > RSS_GROWTH_BYTES
+            and growth > RSS_GROWTH_FRACTION * generate_rss[0]
+        ):
+            anomalies.append(
+                "RSS grew by {:.1f} MB in {} of {} generate batches ({:.1f} -> {:.1f} MB)".format(
+                    growth / 2**20,
+                    growing,
+                    len(steps),
+                    generate_rss[0] / 2**20,
+                    generate_rss[-1] / 2**20,
+                )
+            )
+    if fds and max(fds) - fds[0] > FD_GROWTH:
+        anomalies.append(
+            "Open file descriptors grew from {} to {}".format(fds[0], max(fds))
+        )
+    return anomalies
+
+
+class ResourceSampler:
+    """Samples one node process until stopped"""
+
+    def __init__(self, node, path, interval):
+        self.node = node
+        self.pid = node.process.pid
+        self.path = path
+        self.interval = interval
+        self.chain_dir = os.path.join(node.datadir, node.chain)
+        self.lock = threading.Lock()
+        self.generate_rss = []
+        self.fds = []
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="resources-node{}".format(node.index), daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _write(self, record):
+        with self.lock:
+            with open(self.path, "a", encoding="utf8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def sample(self, event=None, **extra):
+        """Records a sample, returns it or None if the node has exited"""
+        sample = read_proc(self.pid)
+        if sample is None:
+            return None
+        record = {"time": round(time.time(), 3), "pid": self.pid}
+        if event is not None:
+            record["event"] = event
+        record.update(extra)
+        record.update(sample)
+        if event is None:
+            if self.samples % DISK_SAMPLE_EVERY == 0:
+                record["datadir"] = datadir_sizes(self.chain_dir)
+            self.samples += 1
+            self.fds.append(sample["fds"])
+        self._write(record)
+        return record
+
+    def on_generate(self, blocks):
+        """Records the RSS after a batch of blocks was generated"""
+        record = self.sample("generate", blocks=blocks)
+        if record is not None:
+            self.generate_rss.append(record["rss"])
+
+    def _run(self):
+        while not self.stopped.is_set():
+            if self.sample() is None:
+                return
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        """Stops sampling and returns the anomalies found"""
+        self.stopped.set()
+        self.thread.join()
+        anomalies = find_anomalies(self.generate_rss, self.fds)
+        for anomaly in anomalies:
+            self._write({"time": round(time.time(), 3), "anomaly": anomaly})
+        return anomalies
+
+
+class TestFrameworkResourceSampler(unittest.TestCase):
+    @unittest.skipUnless(is_supported(), "needs procfs")
+    def test_read_proc(self):
+        """Running processes are sampled, exited ones return None"""
+        process = subprocess.Popen(["sleep", "60"])
+        try:
+            sample = read_proc(process.pid)
+            self.assertGreater(sample["rss"], 0)
+            self.assertGreaterEqual(sample["threads"], 1)
+            process.kill()
+            # Until it is reaped the process is a zombie without memory fields
+            stat_path = "/proc/{}/stat".format(process.pid)
+            while True:
+                with open(stat_path, encoding="utf8") as f:
+                    if f.read().rpartition(")")[2].split()[0] == "Z":
+                        break
+                time.sleep(0.01)
+            self.assertIsNone(read_proc(process.pid))
+        finally:
+            process.kill()
+            process.wait()
+        self.assertIsNone(read_proc(process.pid))
+
+    def test_find_anomalies(self):
+        """Steady growth is flagged, flat and noisy series are not"""
+        mb = 2**20
+        growing = [200 * mb + i * 20 * mb for i in range(10)]
+        flat = [200 * mb] * 10
+        noisy = [200 * mb + (i % 2) * 100 * mb for i in range(10)]
+        self.assertEqual(find_anomalies(flat, [20] * 50), [])
+        self.assertEqual(find_anomalies(noisy, []), [])
+        # Too few batches to tell
+        self.assertEqual(find_anomalies(growing[:RSS_MIN_BATCHES], []), [])
+        # Growing in every batch, but by less than the limits in total
+        self.assertEqual(find_anomalies([200 * mb + i for i in range(10)], []), [])
+
+        anomalies = find_anomalies(growing, [20] * 50)
+        self.assertEqual(len(anomalies), 1)
+        self.assertIn("RSS grew by 180.0 MB in 9 of 9 generate batches", anomalies[0])
+
+        # File descriptors are only flagged once they grew by more than FD_GROWTH
+        self.assertEqual(find_anomalies(flat, list(range(20, 20 + FD_GROWTH))), [])
+        leaking = list(range(20, 20 + 2 * FD_GROWTH))
+        self.assertEqual(
+            find_anomalies(flat, leaking),
+            ["Open file descriptors grew from 20 to {}".format(leaking[-1])],
+        )
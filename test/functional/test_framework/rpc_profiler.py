@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""RPC latency profiling for functional tests.
+
+Every AuthServiceProxy created through get_rpc_proxy records its calls in
+PROFILER: call counts, latency histograms and request/response sizes per node
+and method, and which test functions made the calls. DefiTestFramework logs a
+summary of the slowest methods at the end of each test and writes the full
+profile as JSON with --rpcprofile."""
+
+import json
+import os
+import sys
+import threading
+
+from .tracer import TRACER, now_us
+
+# Upper bounds of the latency histogram buckets in milliseconds, the last
+# bucket counts everything slower
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+FRAMEWORK_DIR = os.path.dirname(os.path.realpath(__file__))
+# Whether code files are part of the test framework, by co_filename
+_framework_files = {}
+
+
+def is_framework_file(filename):
+    result = _framework_files.get(filename)
+    if result is None:
+        result = os.path.realpath(filename).startswith(FRAMEWORK_DIR)
+        _framework_files[filename] = result
+    return result
+
+
+def find_caller():
+    """Returns "script:function" of the innermost caller outside the test
+    framework, i.e. the test function making the call"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not is_framework_file(filename):
+            return "{}:{}".format(os.path.basename(filename), frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+class MethodStats:
+    __slots__ = (
+        "count",
+        "total_ms",
+        "max_ms",
+        "buckets",
+        "sent",
+        "received",
+        "callers",
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.sent = 0
+        self.received = 0
+        self.callers = {}
+
+    def add(self, elapsed_ms, sent, received, caller):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        index = 0
+        while index < len(BUCKETS_MS) and elapsed_ms > BUCKETS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.sent += sent
+        self.received += received
+        self.callers[caller] = self.callers.get(caller, 0) + 1
+
+    def percentile_ms(self, fraction):
+        """Returns the upper bound of the bucket holding the percentile"""
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_json(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3),
+            "p50_ms": self.percentile_ms(0.5),
+            "p90_ms": self.percentile_ms(0.9),
+            "max_ms": round(self.max_ms, 3),
+            "histogram": dict(
+                zip(["<=%s" % b for b in BUCKETS_MS] + ["inf"], self.buckets)
+            ),
+            "request_bytes": self.sent,
+            "response_bytes": self.received,
+            "callers": dict(sorted(self.callers.items(), key=lambda c: -c[1])),
+        }
+
+
+class NodeProfiler:
+    """Records the calls of one node's RPC connections"""
+
+    def __init__(self, profiler, node):
+        self.profiler = profiler
+        self.node = node
+
+    def record(self, method, elapsed, sent, received):
+        self.profiler.record(self.node, method, elapsed, sent, received)
+
+
+class RpcProfiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def node(self, node):
+        return NodeProfiler(self, node)
+
+    def record(self, node, method, elapsed, sent, received):
+        """Adds a call of `elapsed` seconds with its request and response sizes"""
+        caller = find_caller()
+        with self.lock:
+            stats = self.stats.get((node, method))
+            if stats is None:
+                stats = self.stats[(node, method)] = MethodStats()
+            stats.add(elapsed * 1000, sent, received, caller)
+        if TRACER.enabled:
+            end = now_us()
+            TRACER.complete(
+                method,
+                "rpc",
+                end - elapsed * 1e6,
+                end,
+                {"node": node, "caller": caller},
+            )
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def sorted_stats(self):
+        with self.lock:
+            return sorted(self.stats.items(), key=lambda item: -item[1].total_ms)
+
+    def to_json(self):
+        return [
+            dict(node=node, method=method, **stats.to_json())
+            for (node, method), stats in self.sorted_stats()
+        ]
+
+    def write(self, path):
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def summary(self, limit=15):
+        """Returns table lines of the methods with the highest total time"""
+        lines = [
+            "{:<8} {:<32} {:>7} {:>10} {:>8} {:>8} {:>10}".format(
+                "node", "method", "calls", "total ms", "mean ms", "p90 ms", "resp kB"
+            )
+        ]
+        for (node, method), stats in self.sorted_stats()[:limit]:
+            lines.append(
+                "{:<8} {:<32} {:>7} {:>10.1f} {:>8.2f} {:>8} {:>10.1f}".format(
+                    node,
+                    method,
+                    stats.count,
+                    stats.total_ms,
+                    stats.total_ms / stats.count,
+                    stats.percentile_ms(0.9),
+                    stats.received / 1024,
+                )
+            )
+        return lines
+
+
+PROFILER = RpcProfiler()
@@ -19,9 +19,13 @@ import re
 
 from typing import List
 from .authproxy import JSONRPCException
-from . import coverage
+from . import coverage, rpc_profiler
 from .test_node import TestNode
+from .tracer import TRACE_SUFFIX, TRACER
 from .mininode import NetworkThread
+from . import port_allocator
+from .port_allocator import PortAllocator
+from .progress import ProgressReporter
 from .util import (
     MAX_NODES,
     PortSeed,
@@ -169,12 +173,27 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
             action="store_true",
             help="Print out all RPC calls as they are made",
         )
+        parser.add_argument(
+            "--rpcprofile",
+            dest="rpcprofile",
+            help="Write RPC call counts, latency histograms and sizes per node and method as JSON to this file",
+        )
+        parser.add_argument(
+            "--tracedir",
+            dest="tracedir",
+            help="Write a Chrome trace of the framework phases, P2P sends and RPC calls into this directory",
+        )
+        parser.add_argument(
+            "--progressfd",
+            dest="progressfd",
+            type=int,
+            help="Write the test phase, log messages and failure as JSON lines to this file descriptor (used by test_runner.py)",
+        )
         parser.add_argument(
             "--portseed",
             dest="port_seed",
-            default=os.getpid(),
             type=int,
-            help="The seed to use for assigning port numbers (default: current process id)",
+            help="The seed to use for assigning port numbers (default: the seed of a port block not used by other tests on this host, or the process id where port blocks cannot be locked)",
         )
         parser.add_argument(
             "--coveragedir",
@@ -202,6 +221,13 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
             action="store_true",
             help="profile running nodes with perf for the duration of the test",
         )
+        parser.add_argument(
+            "--resourceinterval",
+            dest="resource_interval",
+            default=1.0,
+            type=float,
+            help="sample the CPU, memory, IO, open files and datadir size of running nodes at this interval in seconds, 0 to disable (default: %(default)s)",
+        )
         parser.add_argument(
             "--valgrind",
             dest="valgrind",
@@ -223,11 +249,24 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
         self.add_options(parser)
         self.options = parser.parse_args()
 
+        if self.options.port_seed is None and port_allocator.is_supported():
+            # Held until the test exits
+            self.port_allocator = PortAllocator()
+            self.options.port_seed = self.port_allocator.acquire()
+        elif self.options.port_seed is None:
+            self.options.port_seed = os.getpid()
         PortSeed.n = self.options.port_seed
 
         check_json_precision()
 
         self.options.cachedir = os.path.abspath(self.options.cachedir)
+        # Share compiled EVM contracts and key pools between tests via the cache dir
+        os.environ.setdefault(
+            "SOLC_CACHE_DIR", os.path.join(self.options.cachedir, "solc")
+        )
+        os.environ.setdefault(
+            "EVM_KEY_POOL_DIR", os.path.join(self.options.cachedir, "evm_keys")
+        )
 
         config = configparser.ConfigParser()
         config.read_file(open(self.options.configfile))
@@ -259,6 +298,11 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
             self.options.tmpdir = tempfile.mkdtemp(prefix=TMPDIR_PREFIX)
         self._start_logging()
 
+        self.progress = None
+        if self.options.progressfd is not None:
+            self.progress = ProgressReporter(self.options.progressfd)
+            self.log.addHandler(self.progress)
+
         # Seed the PRNG. Note that test runs are reproducible if and only if
         # a single thread accesses the PRNG. For more information, see
         # https://docs.python.org/3/library/random.html#notes-on-reproducibility.
@@ -275,6 +319,9 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
         random.seed(seed)
         self.log.debug("PRNG seed is: {}".format(seed))
 
+        if self.options.tracedir:
+            TRACER.enable(os.path.basename(sys.argv[0]))
+
         self.log.debug("Setting up network thread")
         self.network_thread = NetworkThread()
         self.network_thread.start()
@@ -289,9 +336,12 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
                     )
                 self.skip_if_no_cli()
             self.skip_test_if_missing_module()
-            self.setup_chain()
-            self.setup_network()
-            self.run_test()
+            with self._phase("setup_chain", "setup"):
+                self.setup_chain()
+            with self._phase("setup_network", "setup"):
+                self.setup_network()
+            with self._phase("run_test", "test"):
+                self.run_test()
             success = TestStatus.PASSED
         except JSONRPCException:
             self.log.exception("JSONRPC error")
@@ -307,10 +357,19 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
         except KeyboardInterrupt:
             self.log.warning("Exiting after keyboard interrupt")
 
+        if success == TestStatus.FAILED and self.progress is not None:
+            # Let a --failfast test_runner stop before nodes are shut down
+            self.progress.failed()
+
         if success == TestStatus.FAILED and self.options.pdbonfailure:
             print("Testcase failed. Attaching python debugger. Enter ? for help")
             pdb.set_trace()
 
+        self.log_rpc_profile()
+
+        if self.progress is not None:
+            self.progress.phase("shutdown")
+
         self.log.debug("Closing down network thread")
         self.network_thread.close()
         if not self.options.noshutdown:
@@ -362,11 +421,39 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
             )
             exit_code = TEST_EXIT_FAILED
 
+        self.write_trace()
+
         logging.shutdown()
         if cleanup_tree_on_exit:
             shutil.rmtree(self.options.tmpdir)
         sys.exit(exit_code)
 
+    def log_rpc_profile(self):
+        """Logs the RPC methods taking the most time and writes the full
+        profile to --rpcprofile"""
+        log = self.log.info if self.options.rpcprofile else self.log.debug
+        log("RPC profile:\n" + "\n".join(rpc_profiler.PROFILER.summary()))
+        if self.options.rpcprofile:
+            rpc_profiler.PROFILER.write(self.options.rpcprofile)
+
+    def _phase(self, name, cat):
+        """Reports entering a phase of the test and returns its trace span"""
+        if self.progress is not None:
+            self.progress.phase(name)
+        return TRACER.span(name, cat)
+
+    def write_trace(self):
+        """Writes the recorded spans to a Chrome trace in --tracedir"""
+        if not self.options.tracedir:
+            return
+        os.makedirs(self.options.tracedir, exist_ok=True)
+        path = os.path.join(
+            self.options.tracedir,
+            "{}.{}{}".format(os.path.basename(sys.argv[0]), os.getpid(), TRACE_SUFFIX),
+        )
+        TRACER.write(path)
+        self.log.info("Trace written to {}".format(path))
+
     # Methods to override in subclass test scripts.
     def set_test_params(self):
         """Tests must this method to change default values for number of nodes, topology, etc"""
@@ -457,6 +544,7 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
 
     # rollback to block
     # nodes param is a list of node numbers to roll back ([0, 1, 2, 3...] (Default -> None -> node 0)
+    @TRACER.traced("chain")
     def rollback_to(self, block, nodes=None):
         nodes = nodes or self.nodes
         connections = {}
@@ -521,9 +609,11 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
                     use_cli=self.options.usecli,
                     start_perf=self.options.perf,
                     use_valgrind=self.options.valgrind,
+                    resource_interval=self.options.resource_interval,
                 )
             )
 
+    @TRACER.traced("node")
     def start_node(self, i, *args, **kwargs):
         """Start a defid"""
 
@@ -538,6 +628,7 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
         if self.options.coveragedir is not None:
             coverage.write_all_rpc_commands(self.options.coveragedir, node.rpc)
 
+    @TRACER.traced("node")
     def start_nodes(self, extra_args=None, *args, **kwargs):
         """Start multiple defids"""
 
@@ -563,6 +654,7 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
         self.nodes[i].stop_node(expected_stderr, wait=wait)
         self.nodes[i].wait_until_stopped()
 
+    @TRACER.traced("node")
     def stop_nodes(self, wait=0):
         """Stop multiple defid test nodes"""
         for node in self.nodes:
@@ -603,6 +695,7 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
     def sync_mempools(self, nodes=None, **kwargs):
         sync_mempools(nodes or self.nodes, **kwargs)
 
+    @TRACER.traced("sync")
     def sync_all(self, nodes=None, **kwargs):
         self.sync_blocks(nodes, **kwargs)
         self.sync_mempools(nodes, **kwargs)
@@ -646,6 +739,7 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
             rpc_handler.setLevel(logging.DEBUG)
             rpc_logger.addHandler(rpc_handler)
 
+    @TRACER.traced("setup")
     def _initialize_chain(self):
         """Initialize a pre-mined blockchain for use by the test.
 
@@ -740,6 +834,7 @@ class DefiTestFramework(metaclass=DefiTestMetaClass):
                 self.options.tmpdir, i, self.chain
             )  # Overwrite port/rpcport in defi.conf
 
+    @TRACER.traced("setup")
     def _initialize_chain_clean(self):
         """Initialize empty blockchain for use by the test.
 
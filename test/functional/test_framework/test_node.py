@@ -4,6 +4,7 @@
 # file LICENSE or http://www.opensource.org/licenses/mit-license.php.
 """Class for defid node under test"""
 
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import decimal
 import errno
@@ -21,9 +22,11 @@ import collections
 import shlex
 import sys
 
-from web3 import Web3
-
 from .authproxy import JSONRPCException
+from .evm_rpc import EvmRpcClient
+from .log_tailer import DebugLogTailer
+from .resource_sampler import ResourceSampler, is_supported as can_sample_resources
+from .tracer import TRACER
 from .util import (
     append_config,
     delete_cookie_file,
@@ -78,12 +81,15 @@ class TestNode:
         extra_args=None,
         use_cli=False,
         start_perf=False,
-        use_valgrind=False
+        use_valgrind=False,
+        resource_interval=0
     ):
         """
         Kwargs:
             start_perf (bool): If True, begin profiling the node with `perf` as soon as
                 the node starts.
+            resource_interval (float): If set, sample the node's CPU, memory, IO,
+                open fds and datadir size at this interval in seconds while it runs.
         """
 
         self.index = i
@@ -92,6 +98,8 @@ class TestNode:
         self.stdout_dir = os.path.join(self.datadir, "stdout")
         self.stderr_dir = os.path.join(self.datadir, "stderr")
         self.chain = chain
+        self.debug_log_path = os.path.join(self.datadir, self.chain, "debug.log")
+        self._debug_log = None
         self.rpchost = rpchost
         self.evm_rpchost = evm_rpchost
         self.rpc_timeout = timewait
@@ -145,6 +153,8 @@ class TestNode:
         self.cli = TestNodeCLI(defi_cli, self.datadir)
         self.use_cli = use_cli
         self.start_perf = start_perf
+        self.resource_interval = resource_interval
+        self.resources = None
 
         self.running = False
         self.process = None
@@ -162,7 +172,9 @@ class TestNode:
 
         self.p2ps = []
 
-        self.w3: Web3 = None
+        # EVM client on the evm_rpc connection, web3 is created on first use
+        self.evm = None
+        self._w3 = None
 
     MnKeys = collections.namedtuple(
         "MnKeys",
@@ -300,6 +312,7 @@ class TestNode:
     def reset_mocktime(self):
         TestNode.Mocktime = None
 
+    @TRACER.traced("chain")
     def generate(self, nblocks, maxtries=1000000, address=None):
         if address is None:
             address = self.get_genesis_keys().ownerAuthAddress
@@ -320,6 +333,8 @@ class TestNode:
                 mintedHashes.append(
                     self.getblockhash(self.getblockcount())
                 )  # always "tip" due to chain switching (possibly wrong)
+        if self.resources is not None:
+            self.resources.on_generate(minted)
         return mintedHashes
 
     def _node_msg(self, msg: str) -> str:
@@ -355,6 +370,7 @@ class TestNode:
                 assert self.rpc is not None, self._node_msg("Error: no RPC connection")
                 return getattr(self.rpc, name)
 
+    @TRACER.traced("node")
     def start(self, extra_args=None, *, cwd=None, stdout=None, stderr=None, **kwargs):
         """Start the node."""
         if extra_args is None:
@@ -394,6 +410,17 @@ class TestNode:
         if self.start_perf:
             self._start_perf()
 
+        if self.resource_interval and can_sample_resources():
+            self.resources = ResourceSampler(
+                self,
+                os.path.join(
+                    os.path.dirname(self.datadir),
+                    "node{}.resources.jsonl".format(self.index),
+                ),
+                self.resource_interval,
+            ).start()
+
+    @TRACER.traced("node")
     def wait_for_rpc_connection(self):
         """Sets up an RPC connection to the defid process. Returns False if unable to connect."""
         # Poll at a rate of four times per second
@@ -434,7 +461,8 @@ class TestNode:
                 self.evm_rpc = evm_rpc
                 self.rpc_connected = True
                 self.url = self.rpc.url
-                self.w3 = Web3(Web3.HTTPProvider(evm_rpc.url))
+                self.evm = EvmRpcClient(evm_rpc)
+                self._w3 = None
                 return
             except IOError as e:
                 if e.errno != errno.ECONNREFUSED:  # Port not yet open?
@@ -506,47 +534,76 @@ class TestNode:
         self.rpc_connected = False
         self.rpc = None
         self.evm_rpc = None
+        self.evm = None
+        self._w3 = None
+        self._stop_resource_sampler()
         self.log.debug("Node stopped")
         return True
 
+    def _stop_resource_sampler(self):
+        if self.resources is None:
+            return
+        for anomaly in self.resources.stop():
+            self.log.warning("Resource anomaly: {}".format(anomaly))
+        self.resources = None
+
     def wait_until_stopped(self, timeout=DEFID_PROC_WAIT_TIMEOUT):
         wait_until(self.is_node_stopped, timeout=timeout)
 
+    @property
+    def w3(self):
+        """Web3 instance for tests using contract ABIs. web3 is slow to import
+        and set up, so it is only loaded when first used."""
+        if self._w3 is None:
+            assert self.evm_rpc is not None, self._node_msg(
+                "Error: no EVM-RPC connection"
+            )
+            from web3 import Web3
+
+            self._w3 = Web3(Web3.HTTPProvider(self.evm_rpc.url))
+        return self._w3
+
     def get_evm_rpc(self) -> str:
         return self.evm_url
 
+    @property
+    def debug_log(self):
+        """Tailer of the node's debug.log, for waiting on log messages"""
+        if self._debug_log is None:
+            self._debug_log = DebugLogTailer(self.debug_log_path)
+        return self._debug_log
+
     @contextlib.contextmanager
     def assert_debug_log(self, expected_msgs, timeout=2):
         time_end = time.time() + timeout
-        debug_log = os.path.join(self.datadir, self.chain, "debug.log")
-        with open(debug_log, encoding="utf-8") as dl:
-            dl.seek(0, 2)
-            prev_size = dl.tell()
-        try:
+        with self.debug_log.watch(expected_msgs) as watch:
+            try:
+                yield
+            finally:
+                if not watch.wait(time_end - time.time()):
+                    print_log = " - " + "\n - ".join(
+                        line.rstrip("\n") for line in watch.lines
+                    )
+                    self._raise_assertion_error(
+                        'Expected messages "{}" does not partially match log:\n\n{}\n\n'.format(
+                            str(expected_msgs), print_log
+                        )
+                    )
+
+    @contextlib.contextmanager
+    def wait_for_debug_log(self, expected_msgs, timeout=60, regex=False):
+        """Waits after the with block until all messages were logged during
+        or after it, without the short timeout of assert_debug_log"""
+        with self.debug_log.watch(expected_msgs, regex) as watch:
             yield
-        finally:
-            while True:
-                found = True
-                with open(debug_log, encoding="utf-8") as dl:
-                    dl.seek(prev_size)
-                    log = dl.read()
-                print_log = " - " + "\n - ".join(log.splitlines())
-                for expected_msg in expected_msgs:
-                    if (
-                        re.search(re.escape(expected_msg), log, flags=re.MULTILINE)
-                        is None
-                    ):
-                        found = False
-                if found:
-                    return
-                if time.time() >= time_end:
-                    break
-                time.sleep(0.05)
-            self._raise_assertion_error(
-                'Expected messages "{}" does not partially match log:\n\n{}\n\n'.format(
-                    str(expected_msgs), print_log
+            if not watch.wait(timeout):
+                self._raise_assertion_error(
+                    "Expected messages {} not logged within {}s, missing: {}".format(
+                        str(expected_msgs),
+                        timeout,
+                        [pattern for pattern, _ in watch.pending],
+                    )
                 )
-            )
 
     @contextlib.contextmanager
     def profile_with_perf(self, profile_name):
@@ -675,6 +732,7 @@ class TestNode:
                 self.log.debug("defid failed to start: %s", e)
                 self.running = False
                 self.process = None
+                self._stop_resource_sampler()
                 # Check stderr for expected message
                 if expected_msg is not None:
                     log_stderr.seek(0)
@@ -766,6 +824,11 @@ def arg_to_cli(arg):
 class TestNodeCLI:
     """Interface to defi-cli for an individual node"""
 
+    # defi-cli runs one command per process, so independent batches run their
+    # commands concurrently in this many processes at most, shared by all nodes
+    BATCH_PROCESSES = 8
+    _batch_pool = None
+
     def __init__(self, binary, datadir):
         self.options = []
         self.binary = binary
@@ -783,14 +846,30 @@ class TestNodeCLI:
     def __getattr__(self, command):
         return TestNodeCLIAttr(self, command)
 
-    def batch(self, requests):
-        results = []
-        for request in requests:
-            try:
-                results.append(dict(result=request()))
-            except JSONRPCException as e:
-                results.append(dict(error=e))
-        return results
+    def batch(self, requests, independent=False):
+        """Runs the requests one after another, like the node runs an RPC
+        batch, and returns their results in order.
+
+        With independent=True they run concurrently instead, in no particular
+        order, for requests that do not depend on each other."""
+        if not independent or len(requests) < 2:
+            return [self._batch_request(request) for request in requests]
+        if TestNodeCLI._batch_pool is None:
+            TestNodeCLI._batch_pool = ThreadPoolExecutor(
+                self.BATCH_PROCESSES, thread_name_prefix="deficli"
+            )
+        futures = [
+            TestNodeCLI._batch_pool.submit(self._batch_request, request)
+            for request in requests
+        ]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _batch_request(request):
+        try:
+            return dict(result=request())
+        except JSONRPCException as e:
+            return dict(error=e)
 
     def send_cli(self, command=None, *args, **kwargs):
         """Run defi-cli command. Deserializes returned string as python object."""
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Time-phase tracing for functional tests.
+
+With --tracedir, DefiTestFramework records spans for its phases (node startup,
+chain initialization, generate, syncing, rollbacks, P2P sends and every RPC)
+in TRACER and writes them as a Chrome trace, which can be opened in
+chrome://tracing or https://ui.perfetto.dev. test_runner.py merges the traces
+of all tests into one timeline of the run.
+
+Timestamps are wall clock microseconds, so the traces of tests running in
+parallel line up when merged. Tracing is off by default and costs a single
+attribute check per span while disabled."""
+
+from contextlib import nullcontext
+import functools
+import json
+import os
+import threading
+import time
+
+TRACE_SUFFIX = ".trace.json"
+MERGED_TRACE = "trace.json"
+
+_disabled = nullcontext()
+
+
+def now_us():
+    return time.time() * 1e6
+
+
+class Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = now_us()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.complete(self.name, self.cat, self.start, now_us(), self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.events = []
+        self.pid = os.getpid()
+
+    def enable(self, process_name):
+        """Starts recording, naming this process's track in the timeline"""
+        self.enabled = True
+        self.pid = os.getpid()
+        self.events.append(
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": 0,
+                "args": {"name": process_name},
+            }
+        )
+
+    def span(self, name, cat="framework", **args):
+        """Returns a context manager recording the with block as a span"""
+        if not self.enabled:
+            return _disabled
+        return Span(self, name, cat, args)
+
+    def complete(self, name, cat, start, end, args=None):
+        """Records a span from start to end in microseconds"""
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round(start, 1),
+            "dur": round(end - start, 1),
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    def traced(self, cat="framework", name=None):
+        """Decorator recording each call of a function as a span"""
+
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, span_name, cat, {}):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def write(self, path):
+        with self.lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def merge_traces(tracedir):
+    """Merges the per-test traces in tracedir into one trace file and returns
+    its path, or None if there are no traces"""
+    events = []
+    for entry in sorted(os.scandir(tracedir), key=lambda e: e.name):
+        if not entry.name.endswith(TRACE_SUFFIX):
+            continue
+        with open(entry.path, encoding="utf8") as f:
+            events.extend(json.load(f)["traceEvents"])
+    if not events:
+        return None
+    path = os.path.join(tracedir, MERGED_TRACE)
+    with open(path, "w", encoding="utf8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
+
+
+TRACER = Tracer()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Bulk transferdomain helpers for functional testing.
+
+BulkBridge collects DVM<->EVM transfers of DFI and DST20 tokens, packs them
+into as few blocks as the mempool limits allow, sends each block's transfers
+in one batched request and checks the balances of both domains in bulk."""
+
+from decimal import Decimal
+
+from .benchmark_util import BlockConnectTimes, Stopwatch, summarize
+from .util import assert_equal, batch_rpc
+
+DVM = 2
+EVM = 3
+# Transfers are funded from the wallet and chain in the mempool, which limits
+# each block to DEFAULT_ANCESTOR_LIMIT (25) wallet transactions with headroom.
+MAX_WALLET_TXS_PER_BLOCK = 20
+# Mempool limit of EVM transactions per sender, MEMPOOL_MAX_ETH_TXS in validation.h
+MAX_TXS_PER_EVM_SENDER = 64
+# balanceOf(address) selector of DST20 tokens
+BALANCE_OF = "0x70a08231"
+
+
+def dst20_address(token_id):
+    return "0xff{:038x}".format(int(token_id))
+
+
+def parse_amount(amount):
+    value, symbol = amount.split("@")
+    return Decimal(value), symbol
+
+
+def transfer_domain_entry(src, dst, amount, src_domain, dst_domain):
+    return {
+        "src": {"address": src, "amount": amount, "domain": src_domain},
+        "dst": {"address": dst, "amount": amount, "domain": dst_domain},
+    }
+
+
+class BulkBridge:
+    """Packs and sends many transferdomain transfers.
+
+    A transferdomain transaction carries exactly one transfer, so packing is
+    about blocks. Transfers from EVM addresses also need an auth transaction
+    of their bech32 equivalent, so they count twice against the wallet
+    transactions of a block. Transfers of one source keep their order across
+    blocks, as EVM sources use consecutive nonces."""
+
+    def __init__(self, node, max_wallet_txs=MAX_WALLET_TXS_PER_BLOCK):
+        self.node = node
+        self.max_wallet_txs = max_wallet_txs
+        self.transfers = []
+        self.token_ids = {}
+
+    def add(self, src, dst, amount, src_domain=DVM, dst_domain=EVM):
+        assert {src_domain, dst_domain} == {DVM, EVM}
+        self.transfers.append((src, dst, amount, src_domain, dst_domain))
+
+    def add_many(self, pairs, amounts, src_domain=DVM, dst_domain=EVM):
+        """Adds a transfer of every amount for each (src, dst) pair"""
+        for src, dst in pairs:
+            for amount in amounts:
+                self.add(src, dst, amount, src_domain, dst_domain)
+
+    def plan(self):
+        """Returns the pending transfers packed into blocks"""
+        blocks = []
+        wallet_txs = []
+        evm_txs = []
+        first_block = {}
+        for transfer in self.transfers:
+            src, _, _, src_domain, _ = transfer
+            cost = 2 if src_domain == EVM else 1
+            index = first_block.get(src, 0)
+            while index < len(blocks) and (
+                wallet_txs[index] + cost > self.max_wallet_txs
+                or evm_txs[index].get(src, 0) >= MAX_TXS_PER_EVM_SENDER
+            ):
+                index += 1
+            if index == len(blocks):
+                blocks.append([])
+                wallet_txs.append(0)
+                evm_txs.append({})
+            blocks[index].append(transfer)
+            wallet_txs[index] += cost
+            if src_domain == EVM:
+                evm_txs[index][src] = evm_txs[index].get(src, 0) + 1
+            first_block[src] = index
+        return blocks
+
+    def get_token_ids(self, symbols):
+        missing = [s for s in symbols if s != "DFI" and s not in self.token_ids]
+        tokens = batch_rpc(
+            self.node, [("gettoken", s) for s in missing], independent=True
+        )
+        for symbol, token in zip(missing, tokens):
+            self.token_ids[symbol] = next(iter(token))
+        return self.token_ids
+
+    def expected_changes(self):
+        """Returns the balance change of each (domain, address, symbol) of the
+        pending transfers"""
+        changes = {}
+        for src, dst, amount, src_domain, dst_domain in self.transfers:
+            value, symbol = parse_amount(amount)
+            src_key = (src_domain, src, symbol)
+            dst_key = (dst_domain, dst, symbol)
+            changes[src_key] = changes.get(src_key, Decimal(0)) - value
+            changes[dst_key] = changes.get(dst_key, Decimal(0)) + value
+        return changes
+
+    def get_balances(self, keys):
+        """Returns balances of (domain, address, symbol) keys, fetching each
+        domain in one batch"""
+        token_ids = self.get_token_ids({symbol for _, _, symbol in keys})
+        dvm_addresses = sorted(
+            {address for domain, address, _ in keys if domain == DVM}
+        )
+        evm_keys = sorted(key for key in keys if key[0] == EVM)
+
+        accounts = batch_rpc(
+            self.node, [("getaccount", address) for address in dvm_addresses]
+        )
+        dvm = {}
+        for address, account in zip(dvm_addresses, accounts):
+            for amount in account:
+                value, symbol = parse_amount(amount)
+                dvm[(DVM, address, symbol)] = value
+
+        calls = []
+        for _, address, symbol in evm_keys:
+            if symbol == "DFI":
+                calls.append(("eth_getBalance", address, "latest"))
+            else:
+                data = BALANCE_OF + address[2:].lower().rjust(64, "0")
+                to = dst20_address(token_ids[symbol])
+                calls.append(("eth_call", {"to": to, "data": data}, "latest"))
+        results = batch_rpc(self.node, calls)
+        evm = {
+            key: Decimal(int(result, 16)) / 10**18
+            for key, result in zip(evm_keys, results)
+        }
+
+        return {key: dvm.get(key, evm.get(key, Decimal(0))) for key in keys}
+
+    def send(self):
+        """Sends the pending transfers block by block and checks the balances
+        of both domains. Returns per block metrics with their summaries."""
+        changes = self.expected_changes()
+        before = self.get_balances(changes)
+
+        blocks = []
+        for transfers in self.plan():
+            connect_times = BlockConnectTimes(self.node)
+            with Stopwatch() as accept:
+                txids = batch_rpc(
+                    self.node,
+                    [
+                        ("transferdomain", [transfer_domain_entry(*transfer)])
+                        for transfer in transfers
+                    ],
+                )
+            block_hash = self.node.generate(1)[0]
+            block = self.node.getblock(block_hash)
+            assert set(txids).issubset(block["tx"]), "Transfers missing in block"
+            connect_ms = connect_times.read().get(block["height"])
+            blocks.append(
+                {
+                    "height": block["height"],
+                    "transfers": len(transfers),
+                    "accept_ms": accept.ms,
+                    "connect_ms": connect_ms,
+                    "ms_per_transfer": (
+                        connect_ms / len(transfers) if connect_ms is not None else None
+                    ),
+                }
+            )
+
+        after = self.get_balances(changes)
+        for key, change in changes.items():
+            assert_equal((key, after[key] - before[key]), (key, change))
+        self.transfers = []
+
+        summary = {
+            key: summarize([b[key] for b in blocks if b[key] is not None])
+            for key in ("transfers", "connect_ms", "ms_per_transfer")
+        }
+        return {"blocks": blocks, "summary": summary}
@@ -16,8 +16,9 @@ import re
 from subprocess import CalledProcessError
 import time
 
-from . import coverage
+from . import coverage, rpc_profiler
 from .authproxy import AuthServiceProxy, JSONRPCException
+from .tracer import TRACER
 from io import BytesIO
 
 logger = logging.getLogger("TestFramework.utils")
@@ -248,6 +249,7 @@ def get_decimal_amount(amount):
     return Decimal(account_tmp)
 
 
+@TRACER.traced("wait")
 def wait_until(predicate, *, attempts=float("inf"), timeout=float("inf"), lock=None):
     if attempts == float("inf") and timeout == float("inf"):
         timeout = 60
@@ -377,7 +379,9 @@ def get_rpc_proxy(url, node_number, timeout=None, coveragedir=None):
     if timeout is not None:
         proxy_kwargs["timeout"] = timeout
 
-    proxy = AuthServiceProxy(url, **proxy_kwargs)
+    proxy = AuthServiceProxy(
+        url, profiler=rpc_profiler.PROFILER.node("node%d" % node_number), **proxy_kwargs
+    )
     proxy.url = url  # store URL on proxy for info
 
     coverage_logfile = (
@@ -387,28 +391,23 @@ def get_rpc_proxy(url, node_number, timeout=None, coveragedir=None):
     return coverage.AuthServiceProxyWrapper(proxy, coverage_logfile)
 
 
+def port_block_start(seed):
+    """Returns the offset of the block of MAX_NODES ports of each kind used by
+    tests with the given port seed"""
+    return (MAX_NODES * seed) % (PORT_RANGE - 1 - MAX_NODES)
+
+
 def p2p_port(n):
     assert n <= MAX_NODES
-    return PORT_MIN + n + (MAX_NODES * PortSeed.n) % (PORT_RANGE - 1 - MAX_NODES)
+    return PORT_MIN + n + port_block_start(PortSeed.n)
 
 
 def rpc_port(n):
-    return (
-        PORT_MIN
-        + PORT_RANGE
-        + n
-        + (MAX_NODES * PortSeed.n) % (PORT_RANGE - 1 - MAX_NODES)
-    )
+    return PORT_MIN + PORT_RANGE + n + port_block_start(PortSeed.n)
 
 
 def grpc_port(n):
-    return (
-        PORT_MIN
-        + PORT_RANGE
-        + PORT_RANGE
-        + n
-        + (MAX_NODES * PortSeed.n) % (PORT_RANGE - 1 - MAX_NODES)
-    )
+    return PORT_MIN + PORT_RANGE + PORT_RANGE + n + port_block_start(PortSeed.n)
 
 
 def eth_rpc_port(n):
@@ -418,7 +417,7 @@ def eth_rpc_port(n):
         + PORT_RANGE
         + PORT_RANGE
         + n
-        + (MAX_NODES * PortSeed.n) % (PORT_RANGE - 1 - MAX_NODES)
+        + port_block_start(PortSeed.n)
     )
 
 
@@ -582,6 +581,62 @@ def connect_nodes_bi(nodes, a, b):
     connect_nodes(nodes[b], a)
 
 
+def batch_rpc(node, calls, raise_errors=True, independent=False):
+    """
+    Submit a list of RPC calls to a node in a single JSON-RPC batch request.
+
+    Args:
+        node (TestNode): the node to send the batch to
+        calls (list): tuples of (method, *params), e.g. ("minttokens", "10@BTC")
+        raise_errors (bool): if False, failed calls return their JSONRPCException
+            in place of a result instead of raising it
+        independent (bool): if True, the calls do not depend on each other and
+            may run concurrently in any order with --usecli, which otherwise
+            runs them in order like the node does
+
+    Returns:
+        list. results of the calls, in the same order as `calls`.
+
+    Raises the first JSONRPCException returned by the node for any of the calls.
+    Batches made of EVM calls only are sent to the EVM RPC endpoint.
+    """
+    if not calls:
+        return []
+    evm = all(method in node.EVM_CALLS for method, *_ in calls)
+    proxy = node.evm_rpc if evm else node
+    requests = [
+        getattr(proxy, method).get_request(*params) for method, *params in calls
+    ]
+    if node.use_cli and not evm:
+        responses = proxy.batch(requests, independent=independent)
+    else:
+        responses = proxy.batch(requests)
+    if node.use_cli and not evm:
+        # TestNodeCLI.batch returns responses in order with exceptions as errors
+        results = []
+        for response in responses:
+            if "error" in response:
+                if raise_errors:
+                    raise response["error"]
+                results.append(response["error"])
+            else:
+                results.append(response["result"])
+        return results
+
+    responses_by_id = {response["id"]: response for response in responses}
+    results = []
+    for request in requests:
+        response = responses_by_id[request["id"]]
+        if response.get("error") is not None:
+            if raise_errors:
+                raise JSONRPCException(response["error"])
+            results.append(JSONRPCException(response["error"]))
+        else:
+            results.append(response["result"])
+    return results
+
+
+@TRACER.traced("sync")
 def sync_blocks(rpc_connections, *, wait=1, timeout=60):
     """
     Wait until everybody has the same tip.
@@ -603,6 +658,7 @@ def sync_blocks(rpc_connections, *, wait=1, timeout=60):
     )
 
 
+@TRACER.traced("sync")
 def sync_mempools(rpc_connections, *, wait=1, timeout=60, flush_scheduler=True):
     """
     Wait until everybody has the same transactions in their memory
@@ -705,33 +761,26 @@ def make_utxo(node, amount, confirmed=True, scriptPubKey=None):
     """
     from .script import CScript
     from .messages import COIN, CTransaction, CTxIn, COutPoint, CTxOut, ToHex
+    from .utxo_factory import UtxoFactory
 
     if not scriptPubKey:
         scriptPubKey = CScript([1])
 
     fee = 1 * COIN
-    while node.getbalance() < satoshi_round((amount + fee) / COIN):
+    funding = satoshi_round((amount + fee) / COIN)
+    while node.getbalance() < funding:
         node.generate(100)
 
-    new_addr = node.getnewaddress()
-    txid = node.sendtoaddress(new_addr, satoshi_round((amount + fee) / COIN))
-    tx1 = node.getrawtransaction(txid, 1)
-    txid = int(txid, 16)
-    i = None
-
-    for i, txout in enumerate(tx1["vout"]):
-        if txout["scriptPubKey"]["addresses"] == [new_addr]:
-            break
-    assert i is not None
+    # Fund a framework key to sign the spend locally rather than in the wallet
+    [(key, outpoint, _)] = UtxoFactory(node).fund([funding])
 
     tx2 = CTransaction()
-    tx2.vin = [CTxIn(COutPoint(txid, i))]
+    tx2.vin = [CTxIn(outpoint)]
     tx2.vout = [CTxOut(amount, scriptPubKey)]
+    key.sign(tx2)
     tx2.rehash()
 
-    signed_tx = node.signrawtransactionwithwallet(ToHex(tx2))
-
-    txid = node.sendrawtransaction(signed_tx["hex"], 0)
+    txid = node.sendrawtransaction(ToHex(tx2), 0)
 
     # If requested, ensure txouts are confirmed.
     if confirmed:
@@ -750,32 +799,23 @@ def make_utxo(node, amount, confirmed=True, scriptPubKey=None):
 def create_confirmed_utxos(fee, node, count):
     """
     Helper function to create at least "count" utxos.
-    Pass in a fee that is sufficient for relaying and mining new transactions.
+    Pass in a fee rate that is sufficient for relaying and mining new transactions.
     """
-    to_generate = int(0.5 * count) + 101
-    while to_generate > 0:
-        node.generate(min(25, to_generate))
-        to_generate -= 25
+    from .utxo_factory import UtxoFactory
+
     utxos = node.listunspent()
-    iterations = count - len(utxos)
-    addr1 = node.getnewaddress()
-    addr2 = node.getnewaddress()
-    if iterations <= 0:
+    if len(utxos) >= count:
         return utxos
-    for i in range(iterations):
-        t = utxos.pop()
-        inputs = []
-        inputs.append({"txid": t["txid"], "vout": t["vout"]})
-        outputs = {}
-        send_value = t["amount"] - fee
-        outputs[addr1] = satoshi_round(send_value / 2)
-        outputs[addr2] = satoshi_round(send_value / 2)
-        raw_tx = node.createrawtransaction(inputs, outputs)
-        signed_tx = node.signrawtransactionwithwallet(raw_tx)["hex"]
-        node.sendrawtransaction(signed_tx)
-
-    while node.getmempoolinfo()["size"] > 0:
-        node.generate(1)
+    if node.getbalance() == 0:
+        # Mature some coinbase outputs
+        node.generate(101)
+    # Split half of the balance into the missing utxos, as long as each one
+    # can pay for a 1 kB spend at 1000 times the fee rate
+    balance = node.getbalance()
+    missing = count - len(utxos)
+    amount = max(satoshi_round(balance / 2 / missing), satoshi_round(1000 * fee))
+    assert_greater_than(balance, amount * missing)
+    UtxoFactory(node).create(missing, amount, fee)
 
     utxos = node.listunspent()
     assert len(utxos) >= count
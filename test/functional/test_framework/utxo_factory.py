@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Bulk UTXO creation for functional tests.
+
+Creating UTXOs through the wallet costs a few RPC round trips and a wallet
+signing pass per transaction. A UtxoFactory instead funds framework-side keys
+with a single wallet sendmany, then builds wide fan-out transactions of up to
+FANOUT_OUTPUTS outputs each with CTransaction, signs them locally, submits
+them in one batched RPC and mines them in one block.
+
+The keys are derived from a fixed seed, so the same keys are used by every
+node and test; outputs are only ever tracked by their outpoints."""
+
+from decimal import Decimal
+from io import BytesIO
+import itertools
+import unittest
+
+from .address import base58_to_byte, key_to_p2pkh
+from .key import ECKey
+from .messages import (
+    COIN,
+    COutPoint,
+    CTransaction,
+    CTxIn,
+    CTxOut,
+    hash256,
+)
+from .script import (
+    CScript,
+    OP_CHECKSIG,
+    OP_DUP,
+    OP_EQUALVERIFY,
+    OP_HASH160,
+    SIGHASH_ALL,
+    SignatureHash,
+    hash160,
+)
+from .util import batch_rpc, hex_str_to_bytes, satoshi_round
+
+# Outputs per fan-out transaction, keeps them well below the standard size
+FANOUT_OUTPUTS = 500
+# Size of a P2PKH scriptSig: a DER signature with its hashtype and a
+# compressed public key, with their push opcodes
+P2PKH_SCRIPT_SIG_SIZE = 1 + 72 + 1 + 33
+
+
+def fee_for_size(size, fee_per_kb):
+    """Returns the fee in satoshis for a transaction size, rounded up"""
+    return -(-size * int(Decimal(fee_per_kb) * COIN) // 1000)
+
+
+class FactoryKey:
+    """A framework-side P2PKH key"""
+
+    def __init__(self, index):
+        self.key = ECKey()
+        self.key.set(hash256("utxo factory key {}".format(index).encode()), True)
+        self.pubkey = self.key.get_pubkey().get_bytes()
+        self.address = key_to_p2pkh(self.pubkey)
+        self.script_pubkey = CScript(
+            [OP_DUP, OP_HASH160, hash160(self.pubkey), OP_EQUALVERIFY, OP_CHECKSIG]
+        )
+
+    def sign(self, tx, n=0):
+        """Signs input n of tx, which spends an output of this key"""
+        sighash, err = SignatureHash(self.script_pubkey, tx, n, SIGHASH_ALL)
+        assert err is None, err
+        signature = self.key.sign_ecdsa(sighash) + bytes([SIGHASH_ALL])
+        tx.vin[n].scriptSig = CScript([signature, self.pubkey])
+
+
+class UtxoFactory:
+    def __init__(self, node):
+        self.node = node
+        self.keys = []
+
+    def key(self, index):
+        while len(self.keys) <= index:
+            self.keys.append(FactoryKey(len(self.keys)))
+        return self.keys[index]
+
+    def fund(self, amounts):
+        """Pays each amount to a separate factory key in one wallet
+        transaction. Returns the (key, outpoint, nValue) of each payment."""
+        keys = [self.key(i) for i in range(len(amounts))]
+        txid = self.node.sendmany(
+            "", {key.address: amount for key, amount in zip(keys, amounts)}
+        )
+        raw_tx = self.node.gettransaction(txid)["hex"]
+        tx = CTransaction()
+        tx.deserialize(BytesIO(hex_str_to_bytes(raw_tx)))
+        funded = []
+        for key in keys:
+            n = next(
+                n
+                for n, txout in enumerate(tx.vout)
+                if txout.scriptPubKey == key.script_pubkey
+            )
+            funded.append((key, COutPoint(int(txid, 16), n), tx.vout[n].nValue))
+        return funded
+
+    def create(self, count, amount, fee_per_kb, script_pubkey=None):
+        """Creates count confirmed outputs of amount each.
+
+        The outputs pay to script_pubkey, or to a wallet address if none is
+        given. Returns them as dicts with the txid, vout, amount and
+        scriptPubKey fields of listunspent."""
+        if script_pubkey is None:
+            address = self.node.getnewaddress()
+            script_pubkey = self.node.getaddressinfo(address)["scriptPubKey"]
+        if isinstance(script_pubkey, str):
+            script_pubkey = hex_str_to_bytes(script_pubkey)
+        value = int(Decimal(amount) * COIN)
+
+        # Plan the fan-out transactions to know the fee each one needs
+        fanouts = []
+        for start in range(0, count, FANOUT_OUTPUTS):
+            tx = CTransaction()
+            tx.vin = [CTxIn(COutPoint())]
+            tx.vout = [
+                CTxOut(value, script_pubkey)
+                for _ in range(min(FANOUT_OUTPUTS, count - start))
+            ]
+            size = len(tx.serialize()) + P2PKH_SCRIPT_SIG_SIZE
+            fanouts.append((tx, fee_for_size(size, fee_per_kb)))
+        amounts = [
+            satoshi_round(Decimal(len(tx.vout) * value + fee) / COIN)
+            for tx, fee in fanouts
+        ]
+
+        while self.node.getbalance() < sum(amounts) + 1:
+            self.node.generate(100)
+        funded = self.fund(amounts)
+        # Confirm the funding first, the fan-outs would exceed the
+        # descendant size limit of an unconfirmed parent
+        self.node.generate(1)
+
+        for (tx, _), (key, outpoint, _) in zip(fanouts, funded):
+            tx.vin[0].prevout = outpoint
+            key.sign(tx)
+            tx.rehash()
+        batch_rpc(
+            self.node,
+            [("sendrawtransaction", tx.serialize().hex(), 0) for tx, _ in fanouts],
+        )
+        self.node.generate(1)
+        mempool = set(self.node.getrawmempool())
+        assert not any(tx.hash in mempool for tx, _ in fanouts)
+
+        return [
+            {
+                "txid": tx.hash,
+                "vout": n,
+                "amount": satoshi_round(Decimal(value) / COIN),
+                "scriptPubKey": script_pubkey.hex(),
+            }
+            for tx, _ in fanouts
+            for n in range(len(tx.vout))
+        ]
+
+
+class FakeNode:
+    """The RPCs used by UtxoFactory, with a wallet of unlimited funds and a
+    mempool that is mined by generate"""
+
+    EVM_CALLS = ()
+    use_cli = False
+
+    def __init__(self):
+        self.txs = {}
+        self.mempool = set()
+        self.generated = []
+        self.batches = []
+        self.request_ids = itertools.count()
+
+    def __getattr__(self, method):
+        node = self
+
+        class Method:
+            @staticmethod
+            def get_request(*params):
+                return {
+                    "id": next(node.request_ids),
+                    "method": method,
+                    "params": params,
+                }
+
+        return Method
+
+    def getbalance(self):
+        return Decimal(1000000)
+
+    def generate(self, nblocks):
+        self.generated.append(nblocks)
+        self.mempool.clear()
+
+    def sendmany(self, _, amounts):
+        tx = CTransaction()
+        tx.vin = [CTxIn(COutPoint(1, 0))]
+        # A change output first, so that payments are looked up by script
+        tx.vout = [CTxOut(COIN, CScript([OP_CHECKSIG]))]
+        for address, amount in amounts.items():
+            key_hash, _ = base58_to_byte(address)
+            script = CScript(
+                [OP_DUP, OP_HASH160, key_hash, OP_EQUALVERIFY, OP_CHECKSIG]
+            )
+            tx.vout.append(CTxOut(int(amount * COIN), script))
+        return self.add_tx(tx)
+
+    def gettransaction(self, txid):
+        return {"hex": self.txs[txid].serialize().hex()}
+
+    def getrawmempool(self):
+        return list(self.mempool)
+
+    def batch(self, requests):
+        self.batches.append(requests)
+        responses = []
+        for request in requests:
+            assert request["method"] == "sendrawtransaction"
+            tx = CTransaction()
+            tx.deserialize(BytesIO(hex_str_to_bytes(request["params"][0])))
+            responses.append(
+                {"id": request["id"], "result": self.add_tx(tx), "error": None}
+            )
+        return responses
+
+    def add_tx(self, tx):
+        tx.rehash()
+        self.txs[tx.hash] = tx
+        self.mempool.add(tx.hash)
+        return tx.hash
+
+
+class TestFrameworkUtxoFactory(unittest.TestCase):
+    def test_create(self):
+        """Outputs are created by fan-outs sent in one batch and one block"""
+        node = FakeNode()
+        script_pubkey = CScript([OP_CHECKSIG])
+        count = 2 * FANOUT_OUTPUTS + 1
+        utxos = UtxoFactory(node).create(
+            count, Decimal("0.1"), Decimal("0.0001"), script_pubkey
+        )
+
+        self.assertEqual(len(utxos), count)
+        self.assertEqual(len({(utxo["txid"], utxo["vout"]) for utxo in utxos}), count)
+        for utxo in utxos:
+            tx = node.txs[utxo["txid"]]
+            self.assertEqual(tx.vout[utxo["vout"]].nValue, COIN // 10)
+            self.assertEqual(tx.vout[utxo["vout"]].scriptPubKey, script_pubkey)
+            self.assertEqual(utxo["amount"], Decimal("0.1"))
+
+        # Funding and fan-outs are mined in a block each
+        self.assertEqual(node.generated, [1, 1])
+        self.assertEqual(len(node.batches), 1)
+        fanouts = [node.txs[utxo["txid"]] for utxo in utxos[::FANOUT_OUTPUTS]]
+        self.assertEqual(len(node.batches[0]), len(fanouts))
+        self.assertEqual(
+            [len(tx.vout) for tx in fanouts], [FANOUT_OUTPUTS, FANOUT_OUTPUTS, 1]
+        )
+        for tx in fanouts:
+            funding = node.txs["%064x" % tx.vin[0].prevout.hash]
+            fee = funding.vout[tx.vin[0].prevout.n].nValue - sum(
+                txout.nValue for txout in tx.vout
+            )
+            self.assertGreaterEqual(
+                fee, fee_for_size(len(tx.serialize()), Decimal("0.0001"))
+            )
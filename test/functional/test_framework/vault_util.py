@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Copyright (c) DeFi Blockchain Developers
+# Distributed under the MIT software license, see the accompanying
+# file LICENSE or http://www.opensource.org/licenses/mit-license.php.
+"""Vault population generator for loan and auction stress tests.
+
+Creates large numbers of vaults with randomized collateral mixes and loan
+ratios. Every stage (funding, createvault, deposittovault, takeloan) is sent
+as one batched RPC request per chunk of vaults and confirmed in one block."""
+
+import random
+
+from decimal import Decimal, ROUND_DOWN
+
+from .util import batch_rpc
+
+AMOUNT_PRECISION = Decimal("0.00000001")
+
+
+def to_amount(value):
+    return Decimal(value).quantize(AMOUNT_PRECISION, rounding=ROUND_DOWN)
+
+
+class VaultPopulation:
+    """Generates vaults owned by fresh wallet addresses of the node.
+
+    Collateral and loan tokens must already exist with live prices, and
+    `funder` must hold enough collateral tokens in its account. `prices` maps
+    token symbols to their USD price and is used to size collateral and loans.
+
+    Vault owners are funded with a UTXO so that authorization of deposits and
+    loans does not chain through a single address, which would hit the mempool
+    ancestor limit."""
+
+    def __init__(
+        self,
+        node,
+        funder,
+        loan_scheme_id,
+        collateral_tokens,
+        loan_tokens,
+        prices,
+        seed=0,
+    ):
+        self.node = node
+        self.funder = funder
+        self.loan_scheme_id = loan_scheme_id
+        self.collateral_tokens = list(collateral_tokens)
+        self.loan_tokens = list(loan_tokens)
+        self.prices = {symbol: Decimal(price) for symbol, price in prices.items()}
+        self.rng = random.Random(seed)
+        self.vaults = []
+        self.blocks_generated = 0
+
+    def random_vault(self, collateral_value, ratio):
+        """Returns (collateral, loans) token amount lists of a random vault.
+
+        At least half of the collateral value is DFI as required for loans."""
+        value = Decimal(self.rng.uniform(*collateral_value))
+        others = [s for s in self.collateral_tokens if s != "DFI"]
+        dfi_share = Decimal(self.rng.uniform(0.5, 1)) if others else Decimal(1)
+        weights = [self.rng.random() for _ in others]
+        shares = {"DFI": dfi_share}
+        for symbol, weight in zip(others, weights):
+            shares[symbol] = (1 - dfi_share) * Decimal(weight) / Decimal(sum(weights))
+
+        collateral = []
+        for symbol, share in shares.items():
+            amount = to_amount(value * share / self.prices[symbol])
+            if amount > 0:
+                collateral.append("{}@{}".format(amount, symbol))
+
+        loan_symbol = self.rng.choice(self.loan_tokens)
+        loan_value = value * 100 / Decimal(self.rng.uniform(*ratio))
+        loans = [
+            "{}@{}".format(
+                to_amount(loan_value / self.prices[loan_symbol]), loan_symbol
+            )
+        ]
+        return collateral, loans
+
+    def generate(
+        self,
+        count,
+        collateral_value=(100, 1000),
+        ratio=(200, 400),
+        chunk_size=500,
+    ):
+        """Creates `count` vaults with collateral worth between the bounds of
+        `collateral_value` USD and a collateralization ratio between the
+        bounds of `ratio` percent. Returns the vaults created by this call as
+        dicts with vaultId, owner, collateral and loans."""
+        vaults = []
+        for start in range(0, count, chunk_size):
+            vaults += self._generate_chunk(
+                min(chunk_size, count - start), collateral_value, ratio
+            )
+        self.vaults += vaults
+        return vaults
+
+    def _generate_chunk(self, count, collateral_value, ratio):
+        owners = batch_rpc(self.node, [("getnewaddress", "", "legacy")] * count)
+        vaults = []
+        for owner in owners:
+            collateral, loans = self.random_vault(collateral_value, ratio)
+            vaults.append({"owner": owner, "collateral": collateral, "loans": loans})
+
+        # Fund owners with UTXOs and collateral tokens in one transaction each
+        batch_rpc(
+            self.node,
+            [
+                ("sendmany", "", {owner: 1 for owner in owners}),
+                (
+                    "accounttoaccount",
+                    self.funder,
+                    {vault["owner"]: vault["collateral"] for vault in vaults},
+                ),
+            ],
+        )
+        self._generate(1)
+
+        vault_ids = batch_rpc(
+            self.node,
+            [("createvault", owner, self.loan_scheme_id) for owner in owners],
+        )
+        self._generate(1)
+        for vault, vault_id in zip(vaults, vault_ids):
+            vault["vaultId"] = vault_id
+
+        deposits = []
+        for vault in vaults:
+            for amount in vault["collateral"]:
+                deposits.append(
+                    ("deposittovault", vault["vaultId"], vault["owner"], amount)
+                )
+        batch_rpc(self.node, deposits)
+        self._generate(1)
+
+        batch_rpc(
+            self.node,
+            [
+                ("takeloan", {"vaultId": vault["vaultId"], "amounts": vault["loans"]})
+                for vault in vaults
+            ],
+        )
+        self._generate(1)
+        return vaults
+
+    def _generate(self, nblocks):
+        self.node.generate(nblocks)
+        self.blocks_generated += nblocks
+
+    def states(self):
+        """Returns the number of generated vaults per vault state, fetched in
+        batches of 1000 getvault calls."""
+        states = {}
+        for start in range(0, len(self.vaults), 1000):
+            results = batch_rpc(
+                self.node,
+                [
+                    ("getvault", vault["vaultId"])
+                    for vault in self.vaults[start : start + 1000]
+                ],
+            )
+            for result in results:
+                states[result["state"]] = states.get(result["state"], 0) + 1
+        return states
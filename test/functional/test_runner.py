@@ -13,9 +13,10 @@ For a description of arguments recognized by test scripts, see
 """
 
 import argparse
-from collections import deque
+from collections import Counter, deque
 import configparser
 import datetime
+import json
 import os
 import time
 import shutil
@@ -25,6 +26,13 @@ import subprocess
 import tempfile
 import re
 import logging
+import selectors
+import unittest
+import xml.etree.ElementTree as ET
+from test_framework.coverage import read_call_counts
+from test_framework.port_allocator import PortAllocator
+from test_framework.resource_sampler import dir_size
+from test_framework.tracer import merge_traces
 from test_framework.test_framework import get_default_config_path
 
 # Formatting. Default colors to empty strings.
@@ -83,6 +91,18 @@ EXTENDED_SCRIPTS = [
     "mempool_accept.py",  # moved to ext due to heavy load for trevis
     "wallet_backup.py",  # moved to ext due to heavy load for trevis
     "feature_on_chain_government_govvar_update.py",
+    "feature_loan_liquidation_benchmark.py",
+    "feature_on_chain_government_voting_load.py",
+    "feature_evm_throughput_benchmark.py",
+]
+
+# Test framework modules with unittest tests, run before the functional tests
+TEST_FRAMEWORK_MODULES = [
+    "address",
+    "key",
+    "resource_sampler",
+    "ripemd160",
+    "utxo_factory",
 ]
 
 BASE_SCRIPTS = [
@@ -142,6 +162,7 @@ BASE_SCRIPTS = [
     "feature_setgov.py",
     "feature_rpcstats.py",
     "feature_futures.py",
+    "feature_futures_bulk_settlement.py",
     "interface_zmq.py",
     "feature_restore_utxo.py",
     "interface_defi_cli.py",
@@ -314,6 +335,7 @@ BASE_SCRIPTS = [
     "feature_evm_smart_contract.py",
     "feature_evm_transaction_replacement.py",
     "feature_evm_transferdomain.py",
+    "feature_evm_tx_pipeline.py",
     "feature_evm_vmmap_rpc.py",
     "feature_evm.py",
     "feature_loan_low_interest.py",
@@ -336,7 +358,10 @@ BASE_SCRIPTS = [
     "feature_help.py",
     "feature_shutdown.py",
     "feature_oracles.py",
+    "feature_oracle_simulator.py",
+    "feature_fixture_builder.py",
     "feature_checkpoint.py",
+    "feature_pos_minter.py",
     "rpc_getmininginfo.py",
     "feature_burn_address.py",
     "feature_eunos_balances.py",
@@ -439,6 +464,17 @@ def main():
         default=tempfile.gettempdir(),
         help="Root directory for datadirs",
     )
+    parser.add_argument(
+        "--tmpfs",
+        nargs="?",
+        const="/dev/shm",
+        help="place the datadirs on this tmpfs (default: %(const)s), instead of --tmpdirprefix. Implies a --jobdiskbudget of 1024MB",
+    )
+    parser.add_argument(
+        "--jobdiskbudget",
+        type=int,
+        help="disk space in MB a test may use for its datadirs. Tests are only started while this much space is free, and interrupted when they use more",
+    )
     parser.add_argument(
         "--failfast",
         action="store_true",
@@ -446,6 +482,36 @@ def main():
         help="stop execution after the first test failure",
     )
     parser.add_argument("--filter", help="filter scripts to run by regular expression")
+    parser.add_argument(
+        "--streamresults",
+        help="append test starts, phases and results as JSON lines to this file while the tests run",
+    )
+    parser.add_argument(
+        "--shard",
+        help="run shard K/N of the test list, split into N shards of about equal total duration",
+    )
+    parser.add_argument(
+        "--durations",
+        help="JSON file of test durations in seconds used to balance --shard. --mergeresults updates it with the merged durations",
+    )
+    parser.add_argument(
+        "--resultsfile",
+        help="write the status, duration, RPC stats and log tail of each test as JSON to this file",
+    )
+    parser.add_argument(
+        "--mergeresults",
+        nargs="+",
+        metavar="RESULTSFILE",
+        help="merge the --resultsfile outputs of shards, print the results table and exit",
+    )
+    parser.add_argument(
+        "--junitxml",
+        help="write the test results as JUnit XML to this file",
+    )
+    parser.add_argument(
+        "--tracedir",
+        help="write a Chrome trace of each test into this directory and merge them into trace.json",
+    )
 
     args, unknown_args = parser.parse_known_args()
     if not args.ansi:
@@ -455,6 +521,13 @@ def main():
         RED = ("", "")
         GREY = ("", "")
 
+    if args.mergeresults:
+        sys.exit(
+            merge_results(
+                args.mergeresults, junit_xml=args.junitxml, durations=args.durations
+            )
+        )
+
     # args to be passed on always start with two dashes; tests are the remaining unknown args
     tests = [arg for arg in unknown_args if arg[:2] != "--"]
     passon_args = [arg for arg in unknown_args if arg[:2] == "--"]
@@ -470,6 +543,12 @@ def main():
     logging_level = logging.INFO if args.quiet else logging.DEBUG
     logging.basicConfig(format="%(message)s", level=logging_level)
 
+    job_disk_budget = args.jobdiskbudget
+    if args.tmpfs:
+        args.tmpdirprefix = args.tmpfs
+        if job_disk_budget is None:
+            job_disk_budget = 1024
+
     # Create base test directory
     tmpdir = "%s/test_runner_%s" % (
         args.tmpdirprefix,
@@ -540,6 +619,20 @@ def main():
     if args.filter:
         test_list = list(filter(re.compile(args.filter).search, test_list))
 
+    if args.shard:
+        match = re.fullmatch(r"(\d+)/(\d+)", args.shard)
+        if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+            print(
+                "Invalid --shard {}, expected K/N with 1 <= K <= N".format(args.shard)
+            )
+            sys.exit(1)
+        test_list = shard_tests(
+            test_list,
+            int(match.group(1)),
+            int(match.group(2)),
+            load_durations(args.durations),
+        )
+
     if not test_list:
         print(
             "No valid test scripts specified. Check that your test is in one "
@@ -583,7 +676,13 @@ def main():
         combined_logs_len=args.combinedlogslen,
         failfast=args.failfast,
         runs_ci=args.ci,
+        tracedir=args.tracedir,
         use_term_control=args.ansi,
+        job_disk_budget=job_disk_budget,
+        results_file=args.resultsfile,
+        junit_xml=args.junitxml,
+        shard=args.shard,
+        stream_results=args.streamresults,
     )
 
 
@@ -599,7 +698,13 @@ def run_tests(
     combined_logs_len=0,
     failfast=False,
     runs_ci,
-    use_term_control
+    use_term_control,
+    tracedir=None,
+    job_disk_budget=None,
+    results_file=None,
+    junit_xml=None,
+    shard=None,
+    stream_results=None
 ):
     args = args or []
 
@@ -623,6 +728,20 @@ def run_tests(
 
     tests_dir = src_dir + "/test/functional/"
 
+    # Test Framework Tests
+    print("Running Unit Tests for Test Framework Modules")
+    test_framework_tests = unittest.TestSuite()
+    for module in TEST_FRAMEWORK_MODULES:
+        test_framework_tests.addTest(
+            unittest.TestLoader().loadTestsFromName("test_framework.{}".format(module))
+        )
+    result = unittest.TextTestRunner(verbosity=1, failfast=True).run(
+        test_framework_tests
+    )
+    if not result.wasSuccessful():
+        logging.debug("Early exiting after failure in TestFramework unit tests")
+        sys.exit(False)
+
     flags = ["--cachedir={}".format(cache_dir)] + args
 
     if enable_coverage:
@@ -632,6 +751,10 @@ def run_tests(
     else:
         coverage = None
 
+    if tracedir:
+        tracedir = os.path.abspath(tracedir)
+        flags.append("--tracedir={}".format(tracedir))
+
     if len(test_list) > 1 and jobs > 1:
         # Populate cache
         try:
@@ -653,15 +776,26 @@ def run_tests(
         flags=flags,
         timeout_duration=40 * 60 if runs_ci else float("inf"),  # in seconds
         use_term_control=use_term_control,
+        job_disk_budget=job_disk_budget,
+        rpc_profiles=results_file is not None,
+        failfast=failfast,
+        stream_results=stream_results,
     )
     start_time = time.time()
     test_results = []
+    records = []
 
     max_len_name = len(max(test_list, key=len))
     test_count = len(test_list)
     for i in range(test_count):
-        test_result, testdir, stdout, stderr = job_queue.get_next()
+        try:
+            test_result, testdir, stdout, stderr = job_queue.get_next()
+        except KeyboardInterrupt:
+            # Tests run in their own sessions and don't receive the SIGINT
+            job_queue.kill_and_join()
+            raise
         test_results.append(test_result)
+        records.append(result_record(test_result, testdir, stdout, stderr))
         done_str = "{}/{} - {}{}{}".format(
             i + 1, test_count, BOLD[1], test_result.name, BOLD[0]
         )
@@ -699,7 +833,16 @@ def run_tests(
                 logging.debug("Early exiting after test failure")
                 break
 
-    print_results(test_results, max_len_name, (int(time.time() - start_time)))
+    runtime = int(time.time() - start_time)
+    print_results(test_results, max_len_name, runtime)
+
+    if results_file:
+        with open(results_file, "w", encoding="utf8") as f:
+            json.dump(
+                {"shard": shard, "runtime": runtime, "tests": records}, f, indent=1
+            )
+    if junit_xml:
+        write_junit_xml(junit_xml, records)
 
     if coverage:
         coverage_passed = coverage.report_rpc_coverage()
@@ -709,6 +852,11 @@ def run_tests(
     else:
         coverage_passed = True
 
+    if tracedir:
+        trace = merge_traces(tracedir)
+        if trace:
+            print("Trace of the test run written to {}".format(trace))
+
     # Clear up the temp directory if all subdirectories are gone
     if not os.listdir(tmpdir):
         os.rmdir(tmpdir)
@@ -758,6 +906,111 @@ def print_results(test_results, max_len_name, runtime):
     print(results)
 
 
+def load_durations(path):
+    """Returns {test: seconds} recorded in a durations file"""
+    if not path or not os.path.isfile(path):
+        return {}
+    with open(path, encoding="utf8") as f:
+        return json.load(f)
+
+
+def shard_tests(test_list, shard, num_shards, durations):
+    """Returns the tests of shard number `shard` (1-based) out of `num_shards`.
+
+    Tests are assigned longest first to the shard with the least total
+    duration so far. Tests without a recorded duration count as the median of
+    the recorded ones. Shards only depend on the test list and durations, so
+    every machine computes the same split."""
+    known = sorted(durations[test] for test in test_list if test in durations)
+    default = known[len(known) // 2] if known else 1
+    totals = [0] * num_shards
+    shards = [[] for _ in range(num_shards)]
+    for test in sorted(test_list, key=lambda t: (-durations.get(t, default), t)):
+        index = totals.index(min(totals))
+        totals[index] += durations.get(test, default)
+        shards[index].append(test)
+    return shards[shard - 1]
+
+
+def result_record(test_result, testdir, stdout, stderr, log_tail_len=40):
+    """Returns the result of a test as a dict for --resultsfile"""
+    record = {
+        "name": test_result.name,
+        "status": test_result.status,
+        "time": test_result.time,
+    }
+    profile = testdir + ".rpc.json"
+    if os.path.isfile(profile):
+        with open(profile, encoding="utf8") as f:
+            stats = json.load(f)
+        os.remove(profile)
+        record["rpc"] = {
+            "calls": sum(s["count"] for s in stats),
+            "total_ms": round(sum(s["total_ms"] for s in stats), 3),
+            "top": [
+                {k: s[k] for k in ("node", "method", "count", "total_ms", "p90_ms")}
+                for s in stats[:10]
+            ],
+        }
+    if not test_result.was_successful:
+        lines = (stdout + stderr).splitlines()
+        record["log_tail"] = "\n".join(lines[-log_tail_len:])
+    return record
+
+
+def write_junit_xml(path, records):
+    suite = ET.Element(
+        "testsuite",
+        name="functional",
+        tests=str(len(records)),
+        failures=str(sum(r["status"] == "Failed" for r in records)),
+        skipped=str(sum(r["status"] == "Skipped" for r in records)),
+        time=str(sum(r["time"] for r in records)),
+    )
+    for record in records:
+        case = ET.SubElement(
+            suite,
+            "testcase",
+            classname="functional",
+            name=record["name"],
+            time=str(record["time"]),
+        )
+        if record["status"] == "Failed":
+            ET.SubElement(case, "failure", message="Failed").text = record.get(
+                "log_tail", ""
+            )
+        elif record["status"] == "Skipped":
+            ET.SubElement(case, "skipped")
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def merge_results(paths, *, junit_xml=None, durations=None):
+    """Prints the merged results of shards and returns the exit code"""
+    records = []
+    runtime = 0
+    for path in paths:
+        with open(path, encoding="utf8") as f:
+            shard = json.load(f)
+        records += shard["tests"]
+        # Shards run in parallel
+        runtime = max(runtime, shard["runtime"])
+
+    test_results = [TestResult(r["name"], r["status"], r["time"]) for r in records]
+    if not test_results:
+        print("No test results found")
+        return 1
+    print_results(test_results, max(len(r.name) for r in test_results), runtime)
+
+    if junit_xml:
+        write_junit_xml(junit_xml, records)
+    if durations:
+        times = load_durations(durations)
+        times.update({r["name"]: r["time"] for r in records if r["status"] == "Passed"})
+        with open(durations, "w", encoding="utf8") as f:
+            json.dump(times, f, indent=1, sort_keys=True)
+    return int(not all(r.was_successful for r in test_results))
+
+
 class TestHandler:
     """
     Trigger the test scripts passed in via the list.
@@ -772,7 +1025,11 @@ class TestHandler:
         test_list,
         flags,
         timeout_duration,
-        use_term_control
+        use_term_control,
+        job_disk_budget=None,
+        rpc_profiles=False,
+        failfast=False,
+        stream_results=None
     ):
         assert num_tests_parallel >= 1
         self.num_jobs = num_tests_parallel
@@ -784,40 +1041,144 @@ class TestHandler:
         self.num_running = 0
         self.jobs = []
         self.use_term_control = use_term_control
+        # Port blocks are claimed across all test runners on this host
+        self.port_allocator = PortAllocator()
+        self.disk_budget = job_disk_budget * 1024 * 1024 if job_disk_budget else 0
+        self.last_disk_check = time.time()
+        self.over_budget = set()
+        self.rpc_profiles = rpc_profiles
+        self.failfast = failfast
+        # Tests report their progress through a pipe each, see
+        # test_framework/progress.py. Windows cannot pass or select pipes,
+        # tests only report their result there.
+        self.use_progress = os.name == "posix"
+        self.selector = selectors.DefaultSelector()
+        self.progress = {}
+        self.stream = (
+            open(stream_results, "a", encoding="utf8") if stream_results else None
+        )
+
+    def stream_event(self, event, test, **fields):
+        if self.stream is not None:
+            self.stream.write(
+                json.dumps(
+                    dict(time=round(time.time(), 3), event=event, test=test, **fields)
+                )
+                + "\n"
+            )
+            self.stream.flush()
+
+    def read_progress(self, timeout):
+        """Waits up to timeout for progress of the running tests and returns
+        the job of a test that reported a failure, if any"""
+        failed = None
+        if not self.selector.get_map():
+            time.sleep(timeout)
+            return failed
+        for key, _ in self.selector.select(timeout):
+            job = key.data
+            state = self.progress[job[3]]
+            data = os.read(key.fd, 65536)
+            if not data:
+                self.close_progress(job[3])
+                continue
+            *lines, state["buffer"] = (state["buffer"] + data).split(b"\n")
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if "phase" in event:
+                    state["phase"] = event["phase"]
+                    self.stream_event("phase", job[0], phase=event["phase"])
+                if "log" in event:
+                    state["log"] = event["log"]
+                if event.get("status") == "failed":
+                    failed = job
+        return failed
+
+    def close_progress(self, testdir):
+        state = self.progress[testdir]
+        if state["fd"] is not None:
+            self.selector.unregister(state["fd"])
+            os.close(state["fd"])
+            state["fd"] = None
+
+    def kill_all(self):
+        """Kills the tests and their nodes, and waits until they have ended"""
+        for job in self.jobs:
+            try:
+                if self.use_progress:
+                    os.killpg(job[2].pid, signal.SIGKILL)
+                else:
+                    job[2].kill()
+            except ProcessLookupError:
+                pass
+        for job in self.jobs:
+            job[2].wait()
+
+    def has_disk_space(self):
+        if not self.disk_budget:
+            return True
+        return shutil.disk_usage(self.tmpdir).free >= self.disk_budget
 
     def get_next(self):
         while self.num_running < self.num_jobs and self.test_list:
+            if self.jobs and not self.has_disk_space():
+                # Wait for a running test to finish and free its datadirs
+                break
             # Add tests
             self.num_running += 1
             test = self.test_list.pop(0)
-            portseed = len(self.test_list)
+            portseed = self.port_allocator.acquire()
             portseed_arg = ["--portseed={}".format(portseed)]
             log_stdout = tempfile.SpooledTemporaryFile(max_size=2**16)
             log_stderr = tempfile.SpooledTemporaryFile(max_size=2**16)
             test_argv = test.split()
             testdir = "{}/{}_{}".format(
-                self.tmpdir, re.sub(".py$", "", test_argv[0]), portseed
+                self.tmpdir, re.sub(".py$", "", test_argv[0]), len(self.test_list)
             )
             tmpdir_arg = ["--tmpdir={}".format(testdir)]
-            self.jobs.append(
-                (
-                    test,
-                    time.time(),
-                    subprocess.Popen(
-                        [sys.executable, self.tests_dir + test_argv[0]]
-                        + test_argv[1:]
-                        + self.flags
-                        + portseed_arg
-                        + tmpdir_arg,
-                        universal_newlines=True,
-                        stdout=log_stdout,
-                        stderr=log_stderr,
-                    ),
-                    testdir,
-                    log_stdout,
-                    log_stderr,
+            if self.rpc_profiles:
+                # Next to the test dir, which is removed if the test passes
+                tmpdir_arg.append("--rpcprofile={}.rpc.json".format(testdir))
+            progress_args = []
+            popen_kwargs = {}
+            if self.use_progress:
+                progress_read, progress_write = os.pipe()
+                progress_args = ["--progressfd={}".format(progress_write)]
+                popen_kwargs = dict(
+                    pass_fds=(progress_write,),
+                    # In a process group with its nodes, to kill them all at once
+                    start_new_session=True,
                 )
+            job = (
+                test,
+                time.time(),
+                subprocess.Popen(
+                    [sys.executable, self.tests_dir + test_argv[0]]
+                    + test_argv[1:]
+                    + self.flags
+                    + portseed_arg
+                    + tmpdir_arg
+                    + progress_args,
+                    universal_newlines=True,
+                    stdout=log_stdout,
+                    stderr=log_stderr,
+                    **popen_kwargs
+                ),
+                testdir,
+                portseed,
+                log_stdout,
+                log_stderr,
             )
+            self.progress[testdir] = dict(fd=None, buffer=b"", phase=None, log=None)
+            if self.use_progress:
+                os.close(progress_write)
+                self.progress[testdir]["fd"] = progress_read
+                self.selector.register(progress_read, selectors.EVENT_READ, job)
+            self.jobs.append(job)
+            self.stream_event("start", test)
         if not self.jobs:
             raise IndexError("pop from empty list")
 
@@ -826,15 +1187,30 @@ class TestHandler:
             print("Remaining jobs: [{}]".format(", ".join(j[0] for j in self.jobs)))
 
         dot_count = 0
+        last_dot = time.time()
         while True:
             # Return first proc that finishes
-            time.sleep(0.5)
-            for job in self.jobs:
-                (name, start_time, proc, testdir, log_out, log_err) = job
+            failed = self.read_progress(0.5)
+            jobs = list(self.jobs)
+            if failed is not None and self.failfast:
+                # Return the failed test right away, instead of after it has
+                # shut down its nodes
+                self.kill_all()
+                jobs.remove(failed)
+                jobs.insert(0, failed)
+            check_disk = self.disk_budget and time.time() - self.last_disk_check > 10
+            if check_disk:
+                self.last_disk_check = time.time()
+            for job in jobs:
+                (name, start_time, proc, testdir, portseed, log_out, log_err) = job
                 if int(time.time() - start_time) > self.timeout_duration:
                     # Timeout individual tests if timeout is specified (to stop
                     # tests hanging and not providing useful output).
                     proc.send_signal(signal.SIGINT)
+                elif check_disk and dir_size(testdir) > self.disk_budget:
+                    # Interrupt tests using more than their share of the disk
+                    self.over_budget.add(testdir)
+                    proc.send_signal(signal.SIGINT)
                 if proc.poll() is not None:
                     log_out.seek(0), log_err.seek(0)
                     [stdout, stderr] = [
@@ -842,6 +1218,13 @@ class TestHandler:
                         for log_file in (log_out, log_err)
                     ]
                     log_out.close(), log_err.close()
+                    self.port_allocator.release(portseed)
+                    self.close_progress(testdir)
+                    progress = self.progress.pop(testdir)
+                    if testdir in self.over_budget:
+                        stderr += "Exceeded the disk budget of {} MB\n".format(
+                            self.disk_budget // (1024 * 1024)
+                        )
                     if proc.returncode == TEST_EXIT_PASSED and stderr == "":
                         status = "Passed"
                     elif proc.returncode == TEST_EXIT_SKIPPED:
@@ -854,25 +1237,37 @@ class TestHandler:
                         clearline = "\r" + (" " * dot_count) + "\r"
                         print(clearline, end="", flush=True)
                     dot_count = 0
+                    duration = int(time.time() - start_time)
+                    self.stream_event(
+                        "result",
+                        name,
+                        status=status,
+                        duration=duration,
+                        phase=progress["phase"],
+                        log=progress["log"],
+                    )
                     return (
-                        TestResult(name, status, int(time.time() - start_time)),
+                        TestResult(name, status, duration),
                         testdir,
                         stdout,
                         stderr,
                     )
-            if self.use_term_control:
-                print(".", end="", flush=True)
-            dot_count += 1
+            if time.time() - last_dot >= 0.5:
+                last_dot = time.time()
+                if self.use_term_control:
+                    print(".", end="", flush=True)
+                dot_count += 1
 
     def kill_and_join(self):
         """Send SIGKILL to all jobs and block until all have ended."""
-        procs = [i[2] for i in self.jobs]
+        self.kill_all()
 
-        for proc in procs:
-            proc.kill()
-
-        for proc in procs:
-            proc.wait()
+        for testdir in list(self.progress):
+            self.close_progress(testdir)
+        self.port_allocator.release_all()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
 
 
 class TestResult:
@@ -960,11 +1355,12 @@ class RPCCoverage:
 
     Coverage calculation works by having each test script subprocess write
     coverage files into a particular directory. These files contain the RPC
-    commands invoked during testing, as well as a complete listing of RPC
-    commands per `defi-cli help` (`rpc_interface.txt`).
+    commands invoked during testing with their call counts, as well as a
+    complete listing of RPC commands per `defi-cli help` (`rpc_interface.txt`).
 
-    After all tests complete, the commands run are combined and diff'd against
-    the complete list to calculate uncovered RPC commands.
+    After all tests complete, the call counts are summed up in a single pass
+    over the coverage files and diff'd against the complete list to calculate
+    uncovered RPC commands.
 
     See also: test/functional/test_framework/coverage.py
 
@@ -974,13 +1370,22 @@ class RPCCoverage:
         self.dir = tempfile.mkdtemp(prefix="coverage")
         self.flag = "--coveragedir=%s" % self.dir
 
-    def report_rpc_coverage(self):
+    def report_rpc_coverage(self, top=20):
         """
-        Print out RPC commands that were unexercised by tests.
+        Print out the most called RPC commands and RPC commands that were
+        unexercised by tests.
 
         """
-        uncovered = self._get_uncovered_rpc_commands()
+        all_cmds, call_counts = self._get_rpc_call_counts()
+        uncovered = all_cmds - set(call_counts)
 
+        print("Most called RPC commands:")
+        print(
+            "".join(
+                ("  %8d %s\n" % (count, command))
+                for command, count in call_counts.most_common(top)
+            )
+        )
         if uncovered:
             print("Uncovered RPC commands:")
             print("".join(("  - %s\n" % command) for command in sorted(uncovered)))
@@ -992,9 +1397,10 @@ class RPCCoverage:
     def cleanup(self):
         return shutil.rmtree(self.dir)
 
-    def _get_uncovered_rpc_commands(self):
+    def _get_rpc_call_counts(self):
         """
-        Return a set of currently untested RPC commands.
+        Return the set of all RPC commands and the call counts of the
+        commands called by the tests.
 
         """
         # This is shared from `test/functional/test-framework/coverage.py`
@@ -1002,28 +1408,20 @@ class RPCCoverage:
         coverage_file_prefix = "coverage."
 
         coverage_ref_filename = os.path.join(self.dir, reference_filename)
-        coverage_filenames = set()
-        all_cmds = set()
-        covered_cmds = set()
-
         if not os.path.isfile(coverage_ref_filename):
             raise RuntimeError("No coverage reference found")
 
         with open(coverage_ref_filename, "r", encoding="utf8") as coverage_ref_file:
-            all_cmds.update([line.strip() for line in coverage_ref_file.readlines()])
-
-        for root, _, files in os.walk(self.dir):
-            for filename in files:
-                if filename.startswith(coverage_file_prefix):
-                    coverage_filenames.add(os.path.join(root, filename))
+            all_cmds = {line.strip() for line in coverage_ref_file}
 
-        for filename in coverage_filenames:
-            with open(filename, "r", encoding="utf8") as coverage_file:
-                covered_cmds.update(
-                    [line.strip() for line in coverage_file.readlines()]
-                )
+        call_counts = Counter()
+        for entry in os.scandir(self.dir):
+            if entry.name.startswith(coverage_file_prefix) and entry.name.endswith(
+                ".txt"
+            ):
+                call_counts.update(read_call_counts(entry.path))
 
-        return all_cmds - covered_cmds
+        return all_cmds, call_counts
 
 
 if __name__ == "__main__":